@@ -3,6 +3,7 @@ __author__ = 'Philipp D. Rohde'
 
 from TravSHACL.core.GraphTraversal import GraphTraversal
 from TravSHACL.core.ShapeSchema import ShapeSchema
+from TravSHACL.core.ValidationSnapshot import ValidationSnapshot
 from TravSHACL.utils import parse_heuristics
 
 
@@ -16,16 +17,48 @@ def eval_shape_schema(args):
         schema_dir=args.d,
         schema_format='JSON' if args.json else 'SHACL',
         endpoint=args.endpoint,
-        graph_traversal=GraphTraversal.BFS if args.graphTraversal == 'BFS' else GraphTraversal.DFS,
+        graph_traversal=GraphTraversal[args.graphTraversal],
         heuristics=parse_heuristics(args.heuristics),
         use_selective_queries=args.selective,
         max_split_size=args.m,
         output_dir=args.outputDir,
         order_by_in_queries=args.orderby,
         save_outputs=args.outputs,
-        ignore_parsing_errors=args.force
+        ignore_parsing_errors=args.force,
+        endpoint_pool_size=args.poolSize,
+        query_workers=args.workers,
+        endpoint_result_format=args.resultFormat,
+        query_cache_dir=args.cacheDir,
+        query_cache_size=args.cacheSize,
+        data_version=args.dataVersion,
+        bypass_query_cache=args.bypassCache,
+        sparql_batch_size=args.sparqlBatchSize,
+        max_query_size=args.maxQuerySize,
+        query_size_unit=args.querySizeUnit,
+        probe_max_query_size=args.probeQuerySize,
+        target_page_size=args.pageSize,
+        target_pagination=args.pagination,
+        work_in_parallel=args.parallel,
+        shape_workers=args.shapeWorkers,
+        component_workers=args.componentWorkers,
+        schema_cache_dir=args.schemaCacheDir,
+        parse_workers=args.parseWorkers,
+        log_level=args.logLevel,
+        log_queries=not args.omitQueries,
+        trace_sampling=args.traceSampling,
+        report_format=args.reportFormat,
+        max_violations=args.maxViolations,
+        stop_after_shape=args.stopAfterShape,
+        endpoint_timeout=args.endpointTimeout,
+        compress_requests=args.compressRequests
     )
 
-    report = shape_schema.validate()  # run the evaluation of the SHACL constraints over the specified endpoint
+    # run the evaluation of the SHACL constraints over the specified endpoint
+    if args.added is not None or args.removed is not None:
+        report = shape_schema.validate_incremental(args.snapshot, added=args.added, removed=args.removed)
+    else:
+        report = shape_schema.validate(deadline=args.deadline)
+    if args.snapshot is not None and 'unclassified' not in report:
+        ValidationSnapshot.from_result(report).save(args.snapshot)
     if not args.outputs:
         print('Report:', report)
@@ -1,3 +1,5 @@
+from TravSHACL.core.ChangeSet import ChangeSet
 from TravSHACL.core.GraphTraversal import GraphTraversal
 from TravSHACL.core.ShapeSchema import ShapeSchema
+from TravSHACL.core.ValidationSnapshot import ValidationSnapshot
 from TravSHACL.utils import parse_heuristics
@@ -5,11 +5,12 @@ from flask import Flask, request, render_template
 
 from TravSHACL.core.GraphTraversal import GraphTraversal
 from TravSHACL.core.ShapeSchema import ShapeSchema
-from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
+from TravSHACL.sparql.ClientRegistry import ClientRegistry
 
 app = Flask(__name__)
 app.config['SCHEMA_PATH'] = os.environ.get('SCHEMA_PATH', '/path/to/your/shacl')
 app.config['ENDPOINT'] = os.environ.get('ENDPOINT', 'https://example.org/sparql')
+CLIENTS = ClientRegistry()  # connection pools shared by all requests
 
 HEURISTICS = {
     'target': True,
@@ -21,7 +22,6 @@ HEURISTICS = {
 def validation():
     if request.method == 'GET':
         return render_template('validate.jinja2', schema_path=app.config['SCHEMA_PATH'], endpoint=app.config['ENDPOINT'])
-    SPARQLEndpoint.instance = None  # Needs to be reset since it is a singleton and won't change otherwise
     schema_path = request.form.get('schemaDir', None)
     endpoint = request.form.get('external_endpoint', None)
 
@@ -35,7 +35,8 @@ def validation():
         max_split_size=256,
         output_dir=None,
         order_by_in_queries=False,
-        save_outputs=False
+        save_outputs=False,
+        client_registry=CLIENTS
     )
 
     start = time.time()
@@ -1,11 +1,20 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Philipp D. Rohde'
 
+import re
+
 from TravSHACL.constraints.Constraint import Constraint
 
+# literals, IRIs, comments, prefixed names, and variables other than $this are skipped when analyzing the query
+_QUERY_TOKENS = re.compile(r'(?P<skip>"""(?:[^\\]|\\.)*?"""|\'\'\'(?:[^\\]|\\.)*?\'\'\'|"(?:[^"\\\n]|\\.)*"|'
+                           r'\'(?:[^\'\\\n]|\\.)*\'|<[^<>"{}|^`\\\s]*>|#[^\n]*|[A-Za-z_][\w.-]*:[\w.-]*|:[\w.-]*)|'
+                           r'(?P<this>\$this\b)|(?P<var>[?$]\w+)|(?P<word>[A-Za-z_]\w*)|(?P<punct>[{}()*])')
+_AGGREGATES = {'COUNT', 'SUM', 'MIN', 'MAX', 'AVG', 'SAMPLE', 'GROUP_CONCAT', 'GROUP', 'HAVING'}
+_GROUP_KINDS = {'OPTIONAL': 'optional', 'EXISTS': 'exists', 'MINUS': 'minus', 'SERVICE': 'service'}
+
 
 class SPARQLConstraint(Constraint):
-    """This class represents max constraints, i.e., a constraint for the maximal occurrence of a path."""
+    """This class represents SPARQL constraints, i.e., a constraint defined by a SPARQL query (sh:sparql)."""
 
     def __init__(self, id_, is_pos, query: str = None):
         """
@@ -18,3 +27,110 @@ class SPARQLConstraint(Constraint):
         self.min = -1
         self.max = -1
         self.query = query
+        rewritten = _rewrite_for_batches(query) if query is not None else None
+        self.batch_query, self.batch_var = rewritten if rewritten is not None else (None, None)
+
+    def get_batch_query(self):
+        """
+        Returns the query of the constraint rewritten to evaluate several focus nodes at once.
+        The focus nodes are bound via a VALUES clause replacing the placeholder '$instances_to_add$' and
+        the focus node of each solution mapping is projected as 'batch_var'.
+
+        :return: the rewritten query or None if the rewriting might change the semantics of the constraint
+        """
+        return self.batch_query
+
+
+def _rewrite_for_batches(query):
+    """
+    Rewrites a SPARQL constraint so that $this is bound by a VALUES clause in the outermost group.
+    This is only equivalent to the substitution of $this if the query does not contain aggregates,
+    a LIMIT or OFFSET, or references to $this that are not in the scope of the VALUES clause, e.g.,
+    in sub-queries, MINUS, or in filters of nested groups.
+
+    :param query: the SELECT query of the SPARQL constraint
+    :return: tuple with the rewritten query and the variable holding the focus nodes, None if the rewriting is not safe
+    """
+    batch_var = 'trav_this'
+    while re.search(r'[?$]' + batch_var + r'\b', query):
+        batch_var += '_'
+
+    groups = []  # kinds of the groups enclosing the current token, the outermost one is the WHERE clause
+    parens = [0]  # open parentheses per group, used to distinguish expressions from triple patterns
+    last_word = None
+    previous = None  # previous token that is not skipped
+    projection = None  # index where the focus node variable is added to the projection
+    focus_projected = False  # the projection is '*' or contains $this
+    where_start = None
+    edits = []
+    for token in _QUERY_TOKENS.finditer(query):
+        kind = token.lastgroup
+        if kind == 'skip':
+            continue
+        value = token.group()
+        follows_select = not groups and previous in ('SELECT', 'DISTINCT', 'REDUCED')
+        previous = value.upper()
+        if kind == 'word':
+            word = value.upper()
+            if word in _AGGREGATES or (word in ('LIMIT', 'OFFSET') and not groups):
+                return None
+            if word in ('ASK', 'CONSTRUCT', 'DESCRIBE') and not groups:
+                return None
+            if word == 'SELECT':
+                if groups:
+                    groups[-1] = 'subquery'
+                elif projection is None:
+                    projection = token.end()
+            elif word in ('DISTINCT', 'REDUCED') and follows_select:
+                projection = token.end()
+            last_word = word
+        elif kind == 'this':
+            if groups and not _focus_node_in_scope(groups, 'expression' if parens[-1] > 0 else 'pattern'):
+                return None
+            edits.append((token.start(), token.end(), '?' + batch_var))
+            focus_projected = focus_projected or (where_start is None and parens[-1] == 0)
+        elif value == '*':
+            focus_projected = focus_projected or follows_select
+        elif value == '{':
+            if not groups:
+                if where_start is not None:
+                    return None  # e.g., a VALUES clause after the WHERE clause
+                where_start = token.end()
+                groups.append('where')
+            else:
+                groups.append(_GROUP_KINDS.get(last_word, 'group'))
+            parens.append(0)
+            last_word = None
+        elif value == '}':
+            if not groups:
+                return None
+            groups.pop()
+            parens.pop()
+            last_word = None
+        elif value == '(':
+            parens[-1] += 1
+        elif value == ')':
+            parens[-1] -= 1
+
+    if projection is None or where_start is None or groups:
+        return None
+
+    if not focus_projected:
+        edits.append((projection, projection, ' ?' + batch_var))
+    edits.append((where_start, where_start, '\nVALUES ?' + batch_var + ' { $instances_to_add$ }\n'))
+    rewritten = []
+    pos = 0
+    for start, end, replacement in sorted(edits):
+        rewritten.append(query[pos:start] + replacement)
+        pos = end
+    rewritten.append(query[pos:])
+    return ''.join(rewritten), batch_var
+
+
+def _focus_node_in_scope(groups, use):
+    """Checks whether a reference to $this would be bound by a VALUES clause at the start of the WHERE clause."""
+    if any(kind in ('subquery', 'minus', 'service') for kind in groups):
+        return False
+    if 'exists' in groups or use == 'pattern':
+        return True  # patterns are joined with the VALUES clause, EXISTS substitutes the bindings
+    return groups in (['where'], ['where', 'optional'])  # expressions are evaluated in the scope of their group
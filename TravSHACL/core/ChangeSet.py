@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import re
+
+from rdflib import Graph, URIRef
+
+from TravSHACL.core.ValidationSnapshot import ValidationSnapshot
+from TravSHACL.sparql.QueryPartitioner import QueryPartitioner
+from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
+
+_PATH_STEP = re.compile(r'(?:<[^>]*>|[^/<])+')
+
+
+class ChangeSet:
+    """Triples added to and removed from the validated graph since a previous validation. The change set determines
+       the focus nodes whose classification might have changed: the nodes occurring in a changed triple, the nodes
+       reaching such a node via the first steps of a sequence path of their constraints, and, following the shape
+       references backwards, the nodes referring to a node whose classification might have changed via the path of
+       the referencing constraint."""
+
+    def __init__(self, added: str | Graph = None, removed: str | Graph = None):
+        """
+        Creates a new change set.
+
+        :param added: triples added to the graph, as RDFLib graph or path of an N-Triples file; default: None
+        :param removed: triples removed from the graph, as RDFLib graph or path of an N-Triples file; default: None
+        """
+        self.added = self.__load(added)
+        self.removed = self.__load(removed)
+
+    @staticmethod
+    def __load(triples):
+        if triples is None:
+            return Graph()
+        if isinstance(triples, Graph):
+            return triples
+        return Graph().parse(triples, format='nt')
+
+    def __len__(self):
+        return len(self.added) + len(self.removed)
+
+    def changed_nodes(self):
+        """Returns the IRIs occurring as subject or object of an added or removed triple."""
+        nodes = set()
+        for graph in (self.added, self.removed):
+            for s, _, o in graph:
+                if isinstance(s, URIRef):
+                    nodes.add(str(s))
+                if isinstance(o, URIRef):
+                    nodes.add(str(o))
+        return nodes
+
+    def affected_focus_nodes(self, shapes_dict: dict, snapshot: ValidationSnapshot, endpoint: SPARQLEndpoint,
+                             partitioner: QueryPartitioner):
+        """
+        Determines the focus nodes to validate again per shape. The endpoint needs to hold the graph after the change,
+        the removed triples are used to find the references that no longer exist.
+        The classifications of shapes with SPARQL or 'or' constraints might depend on any triple; the same holds for
+        the shapes with targets that are not part of the snapshot. All focus nodes of these shapes and of the shapes
+        referring to them, directly or indirectly, are validated again.
+
+        :param shapes_dict: Python dictionary mapping the shape names to the shapes of the schema
+        :param snapshot: classifications of the previous validation
+        :param endpoint: SPARQL endpoint holding the graph after the change
+        :param partitioner: splits the queries with a list of focus nodes according to the maximum query size
+        :return: Python dictionary mapping the names of the shapes that can be validated incrementally to the focus
+            nodes to validate again; the shapes not included need to be validated completely
+        """
+        pending = [name for name, shape in shapes_dict.items()
+                   if shape.get_sparql_constraints() or (shape.flag and True in shape.flag) or
+                   (shape.get_target_query() is not None and name not in snapshot)]
+        unrestricted = set()
+        while pending:  # the shapes referring to a shape that is validated completely are validated completely
+            name = pending.pop()
+            if name not in unrestricted:
+                unrestricted.add(name)
+                pending.extend(shapes_dict[name].get_parent_shapes())
+        restricted = set(shapes_dict) - unrestricted
+
+        changed = self.changed_nodes()
+        affected = {name: set(changed) for name in restricted}
+        removed = SPARQLEndpoint(self.removed)
+        for name in restricted:  # a changed triple might be a later step of a path, e.g., ex:q in (ex:p ex:q)
+            shape = shapes_dict[name]
+            steps = [_PATH_STEP.findall(c.path) for c in shape.constraints if c.path is not None]
+            for prefix in sorted({'/'.join(path[:i]) for path in steps for i in range(1, len(path))}):
+                for source in (endpoint, removed):
+                    affected[name].update(self.__referring_nodes(source, partitioner, shape, prefix, changed))
+        worklist = [(name, set(nodes)) for name, nodes in affected.items()]
+        while worklist:
+            name, nodes = worklist.pop()
+            for parent in shapes_dict[name].get_parent_shapes():
+                if parent not in restricted:
+                    continue
+                parent_shape = shapes_dict[parent]
+                for c in parent_shape.constraints:
+                    if c.shapeRef != name:
+                        continue
+                    referring = set()
+                    for source in (endpoint, removed):
+                        referring.update(self.__referring_nodes(source, partitioner, parent_shape, c.path, nodes))
+                    referring.difference_update(affected[parent])
+                    if referring:
+                        affected[parent].update(referring)
+                        worklist.append((parent, referring))
+        return {name: nodes for name, nodes in affected.items() if shapes_dict[name].get_target_query() is not None}
+
+    @staticmethod
+    def __referring_nodes(source, partitioner, shape, path, nodes):
+        """Retrieves the IRIs referring to any of the nodes via the path; a path starting with '^' is inverse."""
+        if not nodes:
+            return
+        if path.startswith('^') and len(_PATH_STEP.findall(path)) == 1:
+            pattern = '?v ' + path[1:] + ' ?x .'
+        else:
+            pattern = '?x ' + path + ' ?v .'
+        template = shape.get_prefix_string() + 'SELECT DISTINCT ?x WHERE {\nVALUES ?v {$instances$}\n' + \
+            pattern + '\nFILTER(isIRI(?x))\n}'
+        for query in partitioner.partition(template, sorted('<' + node + '>' for node in nodes),
+                                           placeholder='$instances$'):
+            variables, rows = source.run_query_rows(query)
+            x = variables.index('x')
+            for row in rows:
+                yield row[x]
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+from TravSHACL.sparql.EndpointStatistics import EndpointStatistics
+
+
+class CostModel:
+    """Estimates the cost of evaluating the shapes of a shape schema based on the cardinalities of classes
+       and predicates in the SPARQL endpoint. The cost of a shape is the number of targets and triples its
+       queries are expected to retrieve, reduced by the expected selectivity of filtering the queries with
+       the targets of already evaluated neighbors."""
+
+    def __init__(self, shapes_dict: dict, statistics: EndpointStatistics, filter_threshold: int = 256):
+        """
+        Creates a new cost model for the shape schema.
+
+        :param shapes_dict: a Python dictionary holding all shapes of the shape schema
+        :param statistics: statistics of the endpoint, collected for all shapes of the schema
+        :param filter_threshold: maximum number of targets of an evaluated shape used for filtering the queries
+            of its neighbors; default: 256
+        """
+        self.shapes_dict = shapes_dict
+        self.statistics = statistics
+        self.filter_threshold = filter_threshold
+        self._query_costs = {}
+
+    def target_count(self, shape_name: str):
+        """Returns the estimated number of targets of a shape, 0 if unknown."""
+        return self.statistics.get_target_count(self.shapes_dict[shape_name]) or 0
+
+    def query_cost(self, shape_name: str):
+        """Returns the estimated number of targets and triples retrieved when evaluating a shape without filtering."""
+        if shape_name not in self._query_costs:
+            shape = self.shapes_dict[shape_name]
+            self._query_costs[shape_name] = self.target_count(shape_name) + \
+                sum(self.statistics.get_path_count(shape, c.path) or 0 for c in shape.constraints)
+        return self._query_costs[shape_name]
+
+    def filter_selectivity(self, shape_name: str, evaluated):
+        """
+        Estimates the fraction of the answers of a shape that is retrieved when its queries are filtered
+        with the targets of an evaluated shape referenced by it.
+
+        :param shape_name: the name of the shape to be evaluated
+        :param evaluated: names of the shapes that are evaluated before
+        :return: the expected selectivity between 0 and 1, 1 if no filtering is expected
+        """
+        targets = max(1, self.target_count(shape_name))
+        selectivity = 1.0
+        for ref in self.shapes_dict[shape_name].referencedShapes:
+            if ref in evaluated:
+                ref_targets = self.target_count(ref)
+                if 0 < ref_targets <= self.filter_threshold:
+                    selectivity = min(selectivity, ref_targets / targets)
+        return selectivity
+
+    def cost(self, shape_name: str, evaluated):
+        """Returns the estimated cost of evaluating a shape after the given shapes were evaluated."""
+        return self.query_cost(shape_name) * self.filter_selectivity(shape_name, evaluated)
+
+    def get_starting_point(self, candidates=None):
+        """
+        Returns the shape with a target definition that is the cheapest to evaluate.
+
+        :param candidates: names of the shapes to choose from, all shapes if None; default: None
+        :return: the name of the cheapest shape, shapes without target are only chosen if there is no other shape
+        """
+        candidates = list(self.shapes_dict.keys()) if candidates is None else list(candidates)
+        with_target = [name for name in candidates if self.shapes_dict[name].get_target_query() is not None]
+        return min(with_target or candidates, key=lambda name: self.query_cost(name))
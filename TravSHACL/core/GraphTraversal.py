@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Philipp D. Rohde'
 
+from collections import deque
 from enum import Enum
 
 
@@ -8,60 +9,106 @@ class GraphTraversal(Enum):
     """This enum is used to specify the algorithm used for graph traversal."""
     BFS = 'Breadth-first search'
     DFS = 'Depth-first search'
+    COST = 'Cost-based search'
 
-    def traverse_graph(self, dependencies, reversed_dependencies, starting_point, one_component=False):
-        nodes = list(dependencies.keys())
+    def traverse_graph(self, dependencies, reversed_dependencies, starting_point, one_component=False, cost_model=None):
         visited = []
-        if self == GraphTraversal.DFS:
-            while len(nodes) > 0:
-                self._dfs(visited, dependencies, reversed_dependencies, starting_point)
-                if one_component:  # only one connected component allowed, so drop the other nodes
-                    nodes = []
-                else:
-                    [nodes.remove(v) for v in visited if v in nodes]
-                    starting_point = nodes[0] if len(nodes) > 0 else None
-        elif self == GraphTraversal.BFS:
-            while len(nodes) > 0:
-                self._bfs(visited, dependencies, reversed_dependencies, starting_point)
-                if one_component:  # only one connected component allowed, so drop the other nodes
-                    nodes = []
-                else:
-                    [nodes.remove(v) for v in visited if v in nodes]
-                    starting_point = nodes[0] if len(nodes) > 0 else None
+        if self == GraphTraversal.COST:
+            if cost_model is None:
+                raise ValueError('The cost-based graph traversal requires a cost model.')
+            self._cost_based(visited, dependencies, reversed_dependencies, starting_point, cost_model, one_component)
+            return visited
+
+        seen = set()  # same nodes as in visited for constant time lookups
+        edges = self._edges(dependencies, reversed_dependencies) if self == GraphTraversal.BFS else None
+        nodes = iter(dependencies.keys())
+        starting_point = starting_point if len(dependencies) > 0 else None
+        while starting_point is not None:
+            if self == GraphTraversal.DFS:
+                self._dfs(visited, seen, dependencies, reversed_dependencies, starting_point)
+            else:
+                self._bfs(visited, seen, edges, starting_point)
+            if one_component:  # only one connected component allowed, so drop the other nodes
+                break
+            # continue with the first node (in the order of the shapes) of the next connected component
+            starting_point = next((n for n in nodes if n not in seen), None)
         return visited
 
-    def _dfs(self, visited, dependencies, reversed_dependencies, node):
+    @staticmethod
+    def _dfs(visited, seen, dependencies, reversed_dependencies, node):
         """Implementation of depth-first search with the ability to go back
-        if the algorithm is in a sink but there are still unvisited nodes."""
+        if the algorithm is in a sink but there are still unvisited nodes.
+        The recursion is simulated with a stack of generators, one per (recursive) call, in order to
+        not hit the recursion limit for large shape schemas; the visiting order is the same."""
         # TODO: rearrange the graph (do not prioritize dependencies, i.e., use edges = dep + rev_dep)?
-        if node not in visited:
-            visited.append(node)
-            for neighbour in dependencies[node]:
-                self._dfs(visited, dependencies, reversed_dependencies, neighbour)
-            if sorted(visited) != sorted(dependencies.keys()):
-                for neighbour in reversed_dependencies[node]:
-                    self._dfs(visited, dependencies, reversed_dependencies, neighbour)
-        elif node in visited and sorted(visited) != sorted(dependencies.keys()):
-            for neighbour in dependencies[node]:
-                if neighbour not in visited:
-                    self._dfs(visited, dependencies, reversed_dependencies, neighbour)
-            for neighbour in reversed_dependencies[node]:
-                if neighbour not in visited:
-                    self._dfs(visited, dependencies, reversed_dependencies, neighbour)
+        total = len(dependencies)
+        skipped = ({}, {})  # per node, the length of the prefix of its neighbours that is already visited
+
+        def unvisited(node_, neighbours, skipped_):
+            while True:
+                i = skipped_.get(node_, 0)
+                while i < len(neighbours) and neighbours[i] in seen:
+                    i += 1
+                skipped_[node_] = i
+                if i == len(neighbours):
+                    return
+                yield neighbours[i]
 
-    def _bfs(self, visited, dependencies, reversed_dependencies, node):
+        def neighbours_to_visit(node_):
+            if node_ not in seen:
+                seen.add(node_)
+                visited.append(node_)
+                yield from dependencies[node_]
+                if len(seen) != total:
+                    yield from reversed_dependencies[node_]
+            elif len(seen) != total:
+                # an already visited node is passed through to its unvisited neighbours
+                yield from unvisited(node_, dependencies[node_], skipped[0])
+                yield from unvisited(node_, reversed_dependencies[node_], skipped[1])
+
+        stack = [neighbours_to_visit(node)]
+        while stack:
+            neighbour = next(stack[-1], None)
+            if neighbour is None:
+                stack.pop()
+            else:
+                stack.append(neighbours_to_visit(neighbour))
+
+    @staticmethod
+    def _bfs(visited, seen, edges, node):
         """Implementation of breadth-first search.
         Rearranges the graph, i.e., dependencies are not prioritized."""
-        edges = self._edges(dependencies, reversed_dependencies)
-        queue = [node]
+        queue = deque([node])
         visited.append(node)
+        seen.add(node)
         while queue:
-            node = queue.pop(0)
+            node = queue.popleft()
             for neighbour in edges[node]:
-                if neighbour not in visited:
+                if neighbour not in seen:
                     visited.append(neighbour)
+                    seen.add(neighbour)
                     queue.append(neighbour)
 
+    def _cost_based(self, visited, dependencies, reversed_dependencies, node, cost_model, one_component):
+        """Greedy traversal that continues with the cheapest neighbor of the visited nodes according to the cost model.
+        The costs are re-estimated after each step since evaluated neighbors can be used for filtering."""
+        edges = self._edges(dependencies, reversed_dependencies)
+        order = {n: i for i, n in enumerate(dependencies.keys())}  # ties are broken by the order of the shapes
+        evaluated = set()
+        frontier = set()
+        while node is not None:
+            visited.append(node)
+            evaluated.add(node)
+            frontier.discard(node)
+            frontier.update(n for n in edges[node] if n not in evaluated)
+            if frontier:
+                node = min(frontier, key=lambda n: (cost_model.cost(n, evaluated), order[n]))
+            elif not one_component and len(evaluated) < len(order):
+                # continue with the cheapest node of the next connected component
+                node = cost_model.get_starting_point([n for n in order if n not in evaluated])
+            else:
+                node = None
+
     @staticmethod
     def _edges(dependencies, reversed_dependencies):
         edges = {}
@@ -70,3 +117,31 @@ class GraphTraversal(Enum):
             edges[k].extend(dependencies[k])
             edges[k].extend(reversed_dependencies[k])
         return edges
+
+
+def connected_components(dependencies, reversed_dependencies):
+    """
+    Computes the connected components of the shape network, ignoring the direction of the shape references.
+
+    :param dependencies: Python dictionary holding the names of the shapes referenced by each shape
+    :param reversed_dependencies: Python dictionary holding the names of the shapes referring to each shape
+    :return: list of the connected components, each as a list of shape names in the order of the shapes;
+        the components are ordered by their first shape
+    """
+    component_of = {}
+    components = []
+    for node in dependencies.keys():
+        if node in component_of:
+            continue
+        component_of[node] = len(components)
+        queue = deque([node])
+        while queue:
+            current = queue.popleft()
+            for neighbour in dependencies[current] + reversed_dependencies[current]:
+                if neighbour not in component_of:
+                    component_of[neighbour] = len(components)
+                    queue.append(neighbour)
+        components.append([])
+    for node in dependencies.keys():
+        components[component_of[node]].append(node)
+    return components
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import hashlib
+import importlib.metadata
+import json
+import os
+import pickle
+import sys
+import uuid
+
+ENTRY_SUFFIX = '.schema.pickle'
+FORMAT_VERSION = 1  # to be increased whenever the internal representation of the shapes changes
+
+
+def _package_version():
+    """Returns the version of Trav-SHACL, preferring the VERSION file of a source checkout over the installed package."""
+    version_file = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'VERSION')
+    try:
+        with open(version_file, 'r', encoding='utf-8') as file:
+            return file.read().strip()
+    except OSError:
+        pass
+    try:
+        return importlib.metadata.version('TravSHACL')
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+PACKAGE_VERSION = _package_version()  # compiled schemas of other versions of Trav-SHACL are not used
+
+
+class SchemaCache:
+    """Persistent on-disk cache of compiled shape schemas. A compiled schema holds the parsed shapes including their
+       constraints, rule patterns, and generated SPARQL queries. It is identified by a hash of the shape files and
+       all options affecting the parsing, hence, a changed file or option results in a new entry.
+       The compiled schemas are stored as Python pickles and loading a pickle can execute arbitrary code,
+       hence, the cache directory must not be writable by untrusted users."""
+
+    def __init__(self, cache_dir: str):
+        """
+        Creates a new schema cache backed by the given directory.
+
+        :param cache_dir: directory where the compiled schemas are stored; it is created if it does not exist
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(files: list, options: dict):
+        """
+        Computes the key of a compiled schema. The key also depends on the versions of Trav-SHACL and Python.
+
+        :param files: paths of the files the shape schema is parsed from
+        :param options: Python dictionary with all options used for parsing the shapes, the values need to be
+            serializable as JSON
+        :return: the key of the cache entry
+        """
+        digest = hashlib.sha256()
+        versions = [FORMAT_VERSION, PACKAGE_VERSION, sys.version_info[:2]]
+        digest.update(json.dumps(versions + [options], sort_keys=True).encode('utf-8'))
+        for path in sorted(files):
+            digest.update(b'\0' + os.path.basename(path).encode('utf-8') + b'\0')
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+        return digest.hexdigest()
+
+    def load(self, key: str):
+        """
+        Loads a compiled schema.
+
+        :param key: the key of the cache entry
+        :return: the list of shapes, None if there is no valid entry for the key
+        """
+        try:
+            with open(self.__path(key), 'rb') as file:
+                return pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            self.__discard(key)  # corrupted or outdated entry
+            return None
+
+    def store(self, key: str, shapes: list):
+        """
+        Stores a compiled schema. The entry is written to a temporary file first, so that concurrent
+        processes never read an incomplete entry.
+
+        :param key: the key of the cache entry
+        :param shapes: the list of shapes with their constraint queries computed
+        """
+        path = self.__path(key)
+        tmp_path = path + '.' + uuid.uuid4().hex + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as file:
+                pickle.dump(shapes, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except (OSError, pickle.PicklingError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __path(self, key):
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def __discard(self, key):
+        try:
+            os.remove(self.__path(key))
+        except OSError:
+            pass
@@ -139,7 +139,9 @@ class Shape:
                     self.queriesFilters[ref] = ref_dict
 
     def compute_constraint_queries(self):
-        """Computes all constraint queries for the shape."""
+        """Computes all constraint queries for the shape unless they are already computed, e.g., in a compiled schema."""
+        if self.maxQueries is not None:
+            return
         min_constraints = [c for c in self.constraints if c.min != -1 and c.options is None]
         max_constraints = [c for c in self.constraints if c.max != -1]
 
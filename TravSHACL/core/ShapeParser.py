@@ -4,11 +4,14 @@ __author__ = 'Monica Figuera and Philipp D. Rohde'
 import json
 import logging
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from urllib.parse import urlparse
 
 import collections
+import itertools
 import rdflib.term
-from rdflib import Graph
+from rdflib import Graph, Namespace, RDF, URIRef
 from itertools import islice
 
 from TravSHACL.constraints.SPARQLConstraint import SPARQLConstraint
@@ -22,23 +25,36 @@ QUERY_TARGET_QUERY = '''SELECT ?query WHERE {{
       <http://www.w3.org/ns/shacl#targetQuery> ?query .
 }}'''
 
+SH = Namespace('http://www.w3.org/ns/shacl#')
+
 log = logging.getLogger(__name__)
 
 
 class ShapeParser:
     """Used for parsing shape definitions from files to the internal representation."""
 
-    def __init__(self, ignore_errors=False):
+    def __init__(self, ignore_errors=False, use_index=True, parse_workers=1):
         """Initialize the shape parser.
 
         :param ignore_errors: whether to ignore parsing errors, i.e., logging a warning instead of throwing an exception
+        :param use_index: whether SHACL shapes graphs are read with triple pattern lookups, i.e., using the indexes
+            of the graph, instead of SPARQL queries per shape and constraint; both result in the same shapes
+        :param parse_workers: maximum number of worker processes parsing the files of a directory at the same time,
+            1 parses the files one after another in this process
         """
+        if parse_workers <= 0:
+            raise ValueError('The number of workers needs to be positive.')
         self.ignore_errors = ignore_errors
+        self.use_index = use_index
+        self.parse_workers = parse_workers
+        self.parse_times = {}
 
     def parse_shapes_from_dir(self, path, shape_format, use_selective_queries, max_split_size, order_by_in_queries):
         """
         Parses all files of a certain file extension in the directory.
-        It assumes that each file represents one SHACL shape.
+        It assumes that each file represents one SHACL shape. The files might be parsed in worker processes,
+        the shapes are returned in the order of the files in any case. The time needed for parsing each
+        file is kept in 'parse_times'.
 
         :param path: the path to the directory that stores the shapes files
         :param shape_format: the representation format of the shape definitions
@@ -47,7 +63,62 @@ class ShapeParser:
         :param order_by_in_queries: indicates whether to use the ORDER BY clause
         :return: list of Shapes parsed from the files
         """
-        file_extension = self.get_file_extension(shape_format)
+        files_abs_paths = self.get_shape_files(path, shape_format)
+        if shape_format not in ('JSON', 'SHACL'):
+            print('Unexpected format: ' + shape_format)
+            return
+
+        args = (shape_format, use_selective_queries, max_split_size, order_by_in_queries)
+        if self.parse_workers > 1 and len(files_abs_paths) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.parse_workers, len(files_abs_paths))) as executor:
+                results = list(executor.map(_parse_file, itertools.repeat(self), files_abs_paths,
+                                            itertools.repeat(args)))
+        else:
+            results = [_parse_file(self, p, args) for p in files_abs_paths]
+
+        shapes = []
+        self.parse_times = {}
+        for p, (file_shapes, ms) in zip(files_abs_paths, results):
+            shapes.extend(file_shapes)
+            self.parse_times[p] = ms
+            log.debug('Parsed %s in %.1f ms', p, ms)
+        return shapes
+
+    def parse_file(self, path, shape_format, use_selective_queries, max_split_size, order_by_in_queries):
+        """
+        Parses a particular file of the given format.
+
+        :param path: the path to the shapes file
+        :param shape_format: the representation format of the shape definitions
+        :param use_selective_queries: indicates whether selective queries are used
+        :param max_split_size: maximum number of instances per query
+        :param order_by_in_queries: indicates whether to use the ORDER BY clause
+        :return: list of Shapes parsed from the file
+        """
+        if shape_format == 'JSON':
+            return [self.parse_json(
+                path=path,
+                use_selective_queries=use_selective_queries,
+                max_split_size=max_split_size,
+                order_by_in_queries=order_by_in_queries
+            )]
+        return self.parse_ttl(
+            shapes_graph=Graph().parse(path),
+            use_selective_queries=use_selective_queries,
+            max_split_size=max_split_size,
+            order_by_in_queries=order_by_in_queries
+        )
+
+    @classmethod
+    def get_shape_files(cls, path, shape_format):
+        """
+        Lists all files of the file extension of the shape format in the directory and its subdirectories.
+
+        :param path: the path to the directory that stores the shapes files
+        :param shape_format: the representation format of the shape definitions
+        :return: sorted list of the paths of the shapes files, i.e., independent of the order of the file system
+        """
+        file_extension = cls.get_file_extension(shape_format)
         files_abs_paths = []
 
         # r=root, f=files, ignoring subdirectories
@@ -59,25 +130,7 @@ class ShapeParser:
 
         if not files_abs_paths:
             raise FileNotFoundError(path + ' does not contain any shapes of the format ' + shape_format)
-
-        if shape_format == 'JSON':
-            return [self.parse_json(
-                path=p,
-                use_selective_queries=use_selective_queries,
-                max_split_size=max_split_size,
-                order_by_in_queries=order_by_in_queries
-            ) for p in files_abs_paths]
-        if shape_format == 'SHACL':
-            shapes = []
-            [shapes.extend(self.parse_ttl(
-                shapes_graph=Graph().parse(p),
-                use_selective_queries=use_selective_queries,
-                max_split_size=max_split_size,
-                order_by_in_queries=order_by_in_queries
-            )) for p in files_abs_paths]
-            return shapes
-        else:
-            print('Unexpected format: ' + shape_format)
+        return sorted(files_abs_paths)
 
     @staticmethod
     def get_file_extension(shape_format):
@@ -142,7 +195,10 @@ class ShapeParser:
         queries = self.get_QUERY()
         shapes = []
 
-        names = [str(row[0]) for row in shapes_graph.query(queries[0])]
+        if self.use_index:
+            names = self.get_shape_names_indexed(shapes_graph)
+        else:
+            names = [str(row[0]) for row in shapes_graph.query(queries[0])]
 
         for name in names:
             id_ = name + '_d1'  # str(i + 1) but there is only one set of conjunctions
@@ -150,7 +206,10 @@ class ShapeParser:
             # to get the target_ref and target_type
             target_def = None
             target_type = None
-            if len(shapes_graph.query(queries[1].format(shape=name))) != 0:
+            target_query = None
+            if self.use_index:
+                target_def, target_type, target_query = self.get_target_indexed(shapes_graph, name)
+            elif len(shapes_graph.query(queries[1].format(shape=name))) != 0:
                 for res in shapes_graph.query(queries[1].format(shape=name)):
                     target_def = str(res[0])
                     target_type = 'class'
@@ -161,17 +220,21 @@ class ShapeParser:
                     target_type = 'node'
                     break
 
-            target_query = None
             if target_def is not None and target_type == 'class':
-                for res in shapes_graph.query(QUERY_TARGET_QUERY.format(shape=name)):
-                    target_query = str(res[0])
+                if not self.use_index:
+                    for res in shapes_graph.query(QUERY_TARGET_QUERY.format(shape=name)):
+                        target_query = str(res[0])
                 if target_query is None:
                     target_query = 'SELECT ?x WHERE { ?x a <' + target_def + '> }'  # come up with a query for this
                     if urlparse(target_def).netloc != '':  # if the target node is a url, add '<>' to it
                         target_def = '<' + target_def + '>'
 
-            cons_dict = self.parse_all_const(shapes_graph, name=name, target_def=target_def, target_type=target_type,
-                                             query=queries)
+            if self.use_index:
+                cons_dict = self.parse_all_const_indexed(shapes_graph, name=name, target_def=target_def,
+                                                         target_type=target_type)
+            else:
+                cons_dict = self.parse_all_const(shapes_graph, name=name, target_def=target_def,
+                                                 target_type=target_type, query=queries)
             const_array = list(cons_dict.values())  # change the format to an array
 
             #valid_flag = [entry['flag'] for entry in const_array if entry['flag']]
@@ -355,9 +418,9 @@ class ShapeParser:
 
         if filename.query(query[8].format(shape=name)):
             for constraint in filename.query(query[8].format(shape=name)):
-                constraint_id = filename.items(constraint[0])
+                constraint_id = constraint[0]
                 dict_or = collections.defaultdict(list)
-                for item in constraint_id:
+                for item in filename.items(constraint_id):
                     for detail in filename.query(query[4].format(constraint=item.toPython())):
                         dict_3 = [str(detail['p']), str(detail['o'])]
                         dict_or[str(item)].append(dict_3.copy())
@@ -376,6 +439,21 @@ class ShapeParser:
         :return: all constraints belonging to the shape
         """
         cons_dict = self.get_res(filename, name, query)
+        sparql_constraints = [(str(result['constraint'].toPython()), result['query'].toPython())
+                              for result in filename.query(query[7].format(shape=name))]
+        return self.constraint_dicts(cons_dict, sparql_constraints, name, target_def, target_type)
+
+    def constraint_dicts(self, cons_dict, sparql_constraints, name, target_def, target_type):
+        """
+        Converts the details of the constraints of a shape into one dictionary per constraint.
+
+        :param cons_dict: the details of the property and 'or' constraints as returned by get_res
+        :param sparql_constraints: list of tuples with the name and the SELECT query of each SPARQL constraint
+        :param name: name of the shape
+        :param target_def: target definition of the shape
+        :param target_type: indicates the target type of the shape, e.g., class or node
+        :return: all constraints belonging to the shape
+        """
         trav_dict = {}
         exp_dict = {}
 
@@ -384,9 +462,9 @@ class ShapeParser:
         trav_dict['target_type'] = target_type
 
         # SPARQL constraints first
-        for result in filename.query(query[7].format(shape=name)):
-            trav_dict['sparql'] = result['query'].toPython()
-            exp_dict[str(result['constraint'].toPython())] = trav_dict.copy()
+        for constraint_name, sparql in sparql_constraints:
+            trav_dict['sparql'] = sparql
+            exp_dict[constraint_name] = trav_dict.copy()
 
         for item in self.chunks({i: j for i, j in cons_dict.items()}, 1):
             for dk, dv in item.items():
@@ -403,7 +481,7 @@ class ShapeParser:
                     trav_dict['flag'] = False
                     trav_dict['sparql'] = None
 
-                    if "Graph.items" not in dk:
+                    if not any(isinstance(detail, dict) for detail in dv):  # the options of 'or' are dictionaries
                         for i in dv:
                             if 'path' in str(i[0]).lower():
                                 trav_dict['path'] = str(i[1])
@@ -444,6 +522,113 @@ class ShapeParser:
                 exp_dict[str(dk)] = trav_dict.copy()
         return exp_dict
 
+    @staticmethod
+    def get_shape_names_indexed(shapes_graph):
+        """Returns the names of all node shapes in the shapes graph, in the same order as the SPARQL-based parser."""
+        return list(dict.fromkeys(str(shape) for shape in shapes_graph.subjects(RDF.type, SH.NodeShape)))
+
+    @staticmethod
+    def get_target_indexed(shapes_graph, name):
+        """
+        Looks up the target of a shape.
+
+        :param shapes_graph: RDFlib graph containing the shapes
+        :param name: name of the shape
+        :return: tuple with the target definition, the target type, and the target query given in the shapes graph
+        """
+        shape = URIRef(name)
+        target = next(shapes_graph.objects(shape, SH.targetClass), None)
+        if target is not None:
+            target_query = None
+            for query in shapes_graph.objects(shape, SH.targetQuery):
+                target_query = str(query)
+            return str(target), 'class', target_query
+        target = next(shapes_graph.objects(shape, SH.targetNode), None)
+        if target is not None:
+            return str(target), 'node', None
+        return None, None, None
+
+    @staticmethod
+    def get_constraint_details_indexed(shapes_graph, constraint):
+        """
+        Looks up the predicates and objects describing a constraint. Inverse paths are returned as '^' followed by
+        the predicate, sequence paths as the predicates in angle brackets separated by '/'.
+
+        :param shapes_graph: RDFlib graph containing the shapes
+        :param constraint: the node of the constraint in the shapes graph
+        :return: list of tuples with the predicate and the object, blank nodes in the objects are not resolved
+        """
+        details = [(p, o) for p, o in shapes_graph.predicate_objects(constraint)
+                   if p != SH.path or not isinstance(o, rdflib.term.BNode)]
+        paths = list(shapes_graph.objects(constraint, SH.path))
+        details.extend((SH.path, '^' + str(o)) for path in paths for o in shapes_graph.objects(path, SH.inversePath))
+
+        sequence = []
+        for path in paths:
+            visited = set()
+            nodes = [path]
+            while nodes:  # all nodes reachable via rdf:rest*, the head of the list first
+                node = nodes.pop(0)
+                if node in visited:
+                    continue
+                visited.add(node)
+                sequence.extend('<' + str(o) + '>' for o in shapes_graph.objects(node, RDF.first))
+                nodes.extend(shapes_graph.objects(node, RDF.rest))
+        if sequence:
+            details.append((SH.path, '/'.join(sequence)))
+        return details
+
+    def get_res_indexed(self, shapes_graph, name):
+        """
+        Looks up the details of the property and 'or' constraints of a shape, equivalent to get_res.
+
+        :param shapes_graph: RDFlib graph containing the shapes
+        :param name: name of the shape
+        :return: the details per constraint
+        """
+        shape = URIRef(name)
+        exp_dict = collections.defaultdict(list)
+        for constraint in shapes_graph.objects(shape, SH.property):
+            for p, o in self.get_constraint_details_indexed(shapes_graph, constraint):
+                if isinstance(o, rdflib.term.BNode):
+                    shape_refs = list(shapes_graph.objects(o, SH.node))
+                    values = list(shapes_graph.objects(o, SH.value)) if not shape_refs else []
+                    if shape_refs:
+                        exp_dict[str(constraint)].append([p, str(shape_refs[-1])])
+                    elif values:
+                        exp_dict[str(constraint)].append([p, ['value', str(values[-1])]])
+                    elif self.ignore_errors:
+                        log.warning('There was an unsupported constraint, skipping it...')
+                    else:
+                        raise NotImplementedError('It seems you are using an unsupported feature. Please, check your shape schema.')
+                else:
+                    exp_dict[str(constraint)].append([str(p), str(o)])
+
+        for or_list in shapes_graph.objects(shape, SH['or']):
+            dict_or = collections.defaultdict(list)
+            for item in shapes_graph.items(or_list):
+                for p, o in self.get_constraint_details_indexed(shapes_graph, item):
+                    dict_or[str(item)].append([str(p), str(o)])
+            exp_dict[str(or_list)].append(dict_or.copy())
+        return exp_dict
+
+    def parse_all_const_indexed(self, shapes_graph, name, target_def, target_type):
+        """
+        Parses all constraints of a shape with triple pattern lookups, equivalent to parse_all_const.
+
+        :param shapes_graph: RDFlib graph containing the shapes
+        :param name: name of the shape
+        :param target_def: target definition of the shape
+        :param target_type: indicates the target type of the shape, e.g., class or node
+        :return: all constraints belonging to the shape
+        """
+        shape = URIRef(name)
+        sparql_constraints = [(str(constraint.toPython()), query.toPython())
+                              for constraint in shapes_graph.objects(shape, SH.sparql)
+                              for query in shapes_graph.objects(constraint, SH.select)]
+        return self.constraint_dicts(self.get_res_indexed(shapes_graph, name), sparql_constraints,
+                                     name, target_def, target_type)
+
     def parse_constraints(self, array, target_def, constraints_id):
         """
         Parses all constraints of a shape.
@@ -553,3 +738,10 @@ class ShapeParser:
             raise NotImplementedError('It seems you are using an unsupported feature. Please, check your shape schema.')
         log.warning('There was an unsupported constraint, skipping it...')
         return []
+
+
+def _parse_file(parser, path, args):
+    """Parses a shapes file and measures the time needed in milliseconds."""
+    start = time.perf_counter()
+    shapes = parser.parse_file(path, *args)
+    return shapes, (time.perf_counter() - start) * 1000.0
@@ -3,15 +3,33 @@ from __future__ import annotations  # required for typing in older versions of P
 
 __author__ = 'Philipp D. Rohde and Monica Figuera'
 
+import os
+import queue
+import threading
+import time
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 
 from rdflib import Graph
 
-from TravSHACL.core.GraphTraversal import GraphTraversal
+from TravSHACL.core.ChangeSet import ChangeSet
+from TravSHACL.core.CostModel import CostModel
+from TravSHACL.core.GraphTraversal import GraphTraversal, connected_components
+from TravSHACL.core.SchemaCache import SchemaCache
 from TravSHACL.core.ShapeParser import ShapeParser
+from TravSHACL.core.ValidationSnapshot import ValidationSnapshot
+from TravSHACL.rule_based_validation.ShapeScheduler import ShapeScheduler
 from TravSHACL.rule_based_validation.Validation import Validation
+from TravSHACL.sparql.ClientRegistry import ClientRegistry
+from TravSHACL.sparql.EndpointStatistics import EndpointStatistics
+from TravSHACL.sparql.QueryCache import QueryCache
+from TravSHACL.sparql.QueryPaginator import QueryPaginator
+from TravSHACL.sparql.QueryPartitioner import QueryPartitioner
 from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
-from TravSHACL.utils import parse_heuristics
+from TravSHACL.utils import fileManagement, parse_heuristics
+from TravSHACL.utils.ReportWriter import REPORT_FILES, ReportWriter
+from TravSHACL.utils.ValidationLog import LEVELS as LOG_LEVELS
+from TravSHACL.utils.ValidationStats import ValidationStats
 
 
 class ShapeSchema:
@@ -22,7 +40,15 @@ class ShapeSchema:
                  graph_traversal: GraphTraversal = GraphTraversal.DFS, heuristics: dict = parse_heuristics("TARGET IN BIG"),
                  use_selective_queries: bool = True, max_split_size: int = 256, output_dir: str = None,
                  order_by_in_queries: bool = False, save_outputs: bool = False, work_in_parallel: bool = False,
-                 ignore_parsing_errors: bool = False):
+                 ignore_parsing_errors: bool = False, endpoint_pool_size: int = 4, query_workers: int = 4,
+                 endpoint_result_format: str = 'json', query_cache_dir: str = None, query_cache_size: int = 256,
+                 data_version: str = None, bypass_query_cache: bool = False, client_registry: ClientRegistry = None,
+                 sparql_batch_size: int = 100, max_query_size: int = 8192, query_size_unit: str = 'chars',
+                 probe_max_query_size: bool = False, target_page_size: int = 0, target_pagination: str = 'keyset',
+                 shape_workers: int = 4, component_workers: int = 1, schema_cache_dir: str = None,
+                 parse_workers: int = 1, log_level: str = 'INFO', log_queries: bool = True, trace_sampling: int = 1,
+                 report_format: str = 'ttl', max_violations: int = 0, stop_after_shape: str = None,
+                 endpoint_timeout: float = None, compress_requests: bool = False):
         """
         Creates a new shape schema instance.
 
@@ -32,34 +58,137 @@ class ShapeSchema:
         :param endpoint: URL for the SPARQL endpoint (or an RDFLib graph) to be evaluated against
         :param endpoint_user: username to connect to a private SPARQL endpoint; default: None
         :param endpoint_password: password to connect to a private SPARQL endpoint; default: None
-        :param graph_traversal: graph traversal algorithm used for determining the evaluation order; default: DFS
+        :param graph_traversal: graph traversal algorithm used for determining the evaluation order; COST collects
+            statistics from the endpoint and orders the shapes by their estimated cost, the heuristics are not
+            used in that case; default: DFS
         :param heuristics: Python dictionary holding the heuristics used for determining the seed shape;
             default is equivalent to `TARGET IN BIG`
         :param use_selective_queries: indicates whether selective queries are used; default: True
-        :param max_split_size: maximum number of instances per query; default: 256
+        :param max_split_size: maximum number of instances used for filtering a query; default: 256
         :param output_dir: output directory for log files; default: None
         :param order_by_in_queries: indicates whether to use the ORDER BY clause; default: False
         :param save_outputs: indicates whether target classifications will be saved to the output path; default: False
-        :param work_in_parallel: indicates whether parallelization will be used; not yet implemented; default: False
+        :param work_in_parallel: indicates whether the queries of upcoming shapes that do not depend on the shapes
+            still to be evaluated are sent while the current shape is evaluated; the shapes are still validated
+            in the evaluation order, i.e., the result does not change; only SPARQL endpoints accessed via a URL
+            are queried in parallel; default: False
         :param ignore_parsing_errors: whether to ignore parsing errors; default: False
+        :param endpoint_pool_size: number of persistent HTTP connections kept open to the SPARQL endpoint,
+            0 disables connection pooling; default: 4
+        :param query_workers: maximum number of partitions of a query sent to the endpoint at the same time,
+            1 evaluates the partitions one after another; default: 4
+        :param endpoint_result_format: serialization requested for the results of the SPARQL endpoint,
+            one of 'json', 'tsv', or 'csv'; the results are parsed while they are received; default: 'json'
+        :param query_cache_dir: directory of the on-disk cache for query results, None disables the cache;
+            only SPARQL endpoints accessed via a URL are cached; default: None
+        :param query_cache_size: maximum size of the query cache in megabytes; default: 256
+        :param data_version: token identifying the version of the data in the SPARQL endpoint,
+            cached results of another version are not used; default: None
+        :param bypass_query_cache: indicates whether cached results are ignored, the cache is refreshed
+            with the new results; default: False
+        :param client_registry: registry of HTTP connection pools shared with other shape schemas, e.g., when
+            running several validations in one process; None means that the schema uses its own connections;
+            the worker processes of 'component_workers' cannot use the connections of the registry, instead,
+            each worker process shares its connections among the components it validates; default: None
+        :param sparql_batch_size: maximum number of focus nodes checked by one query of a SPARQL constraint,
+            1 sends one query per focus node; constraints that cannot be rewritten safely, e.g., because of
+            aggregates, are always checked per focus node; default: 100
+        :param max_query_size: maximum size of a query sent to the SPARQL endpoint, queries with a list of instances,
+            e.g., in a VALUES clause, are split accordingly; default: 8192
+        :param query_size_unit: unit of the maximum query size, either 'chars' or 'bytes'; default: 'chars'
+        :param probe_max_query_size: indicates whether the maximum query size accepted by the SPARQL endpoint is
+            determined by sending test queries, 'max_query_size' is used as upper bound; default: False
+        :param target_page_size: number of targets retrieved per query, i.e., target queries are paginated
+            in order to not be truncated by endpoints capping the number of results; 0 disables the pagination;
+            default: 0
+        :param target_pagination: pagination mode for the target queries, 'keyset' or 'offset'; default: 'keyset'
+        :param shape_workers: maximum number of queries of upcoming shapes sent at the same time if
+            'work_in_parallel' is set; default: 4
+        :param component_workers: maximum number of worker processes validating the connected components of the
+            shape network at the same time, each with its own connection to the endpoint; the merged statistics,
+            validation report, and target classifications are saved to the output directory, the validation log
+            and traces of each component to its subdirectory 'component<i>'; 1 validates all components one after
+            another in this process; default: 1
+        :param schema_cache_dir: directory of the on-disk cache for compiled shape schemas, i.e., the parsed shapes
+            including their generated queries; a compiled schema is only used if neither the shape files nor the
+            parsing options nor the version of Trav-SHACL changed; shape schemas given as RDFLib graph are not
+            cached; the compiled schemas are stored as Python pickles, i.e., loading them can execute arbitrary
+            code, hence, the directory must not be writable by untrusted users; None disables the cache;
+            default: None
+        :param parse_workers: maximum number of worker processes parsing the shape files at the same time,
+            the shapes are merged in the order of the files; the time needed per file is saved to the output
+            directory; 1 parses the files one after another in this process; default: 1
+        :param log_level: minimum level of the events recorded in the validation log in the output directory,
+            'DEBUG', 'INFO', or 'OFF'; default: 'INFO'
+        :param log_queries: indicates whether the validation log includes the query strings; default: True
+        :param trace_sampling: records the trace of every n-th target classification in the output directory,
+            1 records all classifications, 0 disables the traces; default: 1
+        :param report_format: format of the validation report saved to the output directory, 'ttl' (Turtle),
+            'nt' (N-Triples), 'ndjson' (one JSON object per violation), or 'csv.gz' (gzip-compressed CSV);
+            default: 'ttl'
+        :param max_violations: stops the validation as soon as this number of violations is found, the output
+            then lists the targets that remain unclassified; 0 validates the entire shape schema; default: 0
+        :param stop_after_shape: name of a shape, stops the validation as soon as all targets of this shape are
+            classified, the output then lists the targets that remain unclassified; default: None
+        :param endpoint_timeout: timeout of the requests to the SPARQL endpoint in seconds, None means no timeout;
+            default: None
+        :param compress_requests: indicates whether the queries are sent gzip-compressed to the SPARQL endpoint,
+            only supported with connection pooling; default: False
         """
+        if log_level not in LOG_LEVELS:
+            raise ValueError('Unknown log level: ' + str(log_level) + ', expected one of ' + ', '.join(LOG_LEVELS) + '.')
+        if report_format not in REPORT_FILES:
+            raise ValueError('Unknown report format: ' + str(report_format) + ', expected one of ' +
+                             ', '.join(REPORT_FILES) + '.')
+        if trace_sampling < 0:
+            raise ValueError('The trace sampling needs to be positive or 0.')
+        if max_violations < 0:
+            raise ValueError('The maximum number of violations needs to be positive or 0.')
         if schema_format == 'JSON':
             warnings.warn(
                 'The JSON format for shape schemas is deprecated and will be removed in a future version.',
                 DeprecationWarning, 2
             )
+        parser = ShapeParser(ignore_errors=ignore_parsing_errors, parse_workers=parse_workers)
         if isinstance(schema_dir, Graph):
-            self.shapes = ShapeParser(ignore_errors=ignore_parsing_errors).parse_ttl(
+            self.shapes = parser.parse_ttl(
                 schema_dir, use_selective_queries, max_split_size, order_by_in_queries
             )
+        elif schema_cache_dir is not None:
+            self.shapes = self.__load_compiled_shapes(SchemaCache(schema_cache_dir), parser, schema_dir,
+                                                      schema_format, ignore_parsing_errors, use_selective_queries,
+                                                      max_split_size, order_by_in_queries)
         else:
-            self.shapes = ShapeParser(ignore_errors=ignore_parsing_errors).parse_shapes_from_dir(
+            self.shapes = parser.parse_shapes_from_dir(
                 schema_dir, schema_format, use_selective_queries, max_split_size, order_by_in_queries
             )
+        self.parseTimes = parser.parse_times
         self.shapesDict = {shape.get_id(): shape for shape in self.shapes}  # TODO: use only the dict?
-        self.endpoint = SPARQLEndpoint(endpoint, endpoint_user, endpoint_password)
+        if stop_after_shape is not None and stop_after_shape not in self.shapesDict:
+            raise ValueError('Unknown shape: ' + str(stop_after_shape) + '.')
+        query_cache = None
+        if query_cache_dir is not None:
+            query_cache = QueryCache(query_cache_dir, query_cache_size, data_version, bypass_query_cache)
+        # connections and caches cannot be shared with worker processes, hence, they are created again per process
+        self.endpointConfig = {
+            'endpoint': endpoint,
+            'user': endpoint_user,
+            'pwd': endpoint_password,
+            'pool_size': endpoint_pool_size,
+            'result_format': endpoint_result_format,
+            'timeout': endpoint_timeout,
+            'compress_requests': compress_requests
+        }
+        self.endpoint = SPARQLEndpoint(**self.endpointConfig, cache=query_cache, registry=client_registry)
+        self.sharedConnections = client_registry is not None
+        self.queryCacheConfig = None if query_cache_dir is None else \
+            (query_cache_dir, query_cache_size, data_version, bypass_query_cache)
         self.graphTraversal = graph_traversal
-        self.parallel = work_in_parallel  # TODO: no parallelization implemented yet
+        self.endpointStatistics = EndpointStatistics(self.endpoint, workers=query_workers)
+        self.costModel = None
+        self.parallel = work_in_parallel
+        self.shapeWorkers = shape_workers
+        self.componentWorkers = component_workers
         self.dependencies, self.reverse_dependencies = self.compute_edges()
         self.compute_in_and_outdegree()
         self.heuristics = heuristics
@@ -67,46 +196,95 @@ class ShapeSchema:
         self.selectivityEnabled = use_selective_queries
         self.saveStats = output_dir is not None
         self.saveTargetsToFile = save_outputs
+        self.logLevel = log_level
+        self.logQueries = log_queries
+        self.traceSampling = trace_sampling
+        self.reportFormat = report_format
+        self.maxViolations = max_violations
+        self.stopAfterShape = stop_after_shape
+        self.queryWorkers = query_workers
+        self.sparqlBatchSize = sparql_batch_size
+        self.queryPartitioner = QueryPartitioner(max_query_size, query_size_unit)
+        if probe_max_query_size:
+            self.queryPartitioner = self.queryPartitioner.probe(self.endpoint)
+        self.targetPaginator = QueryPaginator(target_page_size, target_pagination) if target_page_size > 0 else None
         self.set_parent_shapes()
+        if self.saveStats and self.parseTimes:
+            self.write_parse_times()
 
-    def get_starting_point(self):
+    @staticmethod
+    def __load_compiled_shapes(schema_cache, parser, schema_dir, schema_format, ignore_parsing_errors,
+                               use_selective_queries, max_split_size, order_by_in_queries):
+        """
+        Loads the compiled shapes from the schema cache. If the shape files or the options changed, the shapes are
+        parsed, their constraint queries are computed, and the compiled shapes are added to the cache.
+
+        :return: list of the shapes with their constraint queries computed
+        """
+        key = schema_cache.key(parser.get_shape_files(schema_dir, schema_format), {
+            'schema_format': schema_format,
+            'ignore_parsing_errors': ignore_parsing_errors,
+            'use_selective_queries': use_selective_queries,
+            'max_split_size': max_split_size,
+            'order_by_in_queries': order_by_in_queries
+        })
+        shapes = schema_cache.load(key)
+        if shapes is None:
+            shapes = parser.parse_shapes_from_dir(schema_dir, schema_format, use_selective_queries,
+                                                  max_split_size, order_by_in_queries)
+            for s in shapes:
+                s.compute_constraint_queries()
+            schema_cache.store(key, shapes)
+        return shapes
+
+    def write_parse_times(self):
+        """Saves the time needed for parsing each shape file to 'parse_times.csv' in the output directory."""
+        parse_times = fileManagement.open_file(self.outputDirName, 'parse_times.csv')
+        parse_times.write('File,Time\n')
+        for path, ms in self.parseTimes.items():
+            parse_times.write(path + ',' + str(ms) + '\n')
+        fileManagement.close_file(parse_times)
+
+    def get_starting_point(self, shapes=None):
         """
         Use heuristics to determine the first shape for evaluation of the constraints.
         There might be several shapes that are equally suited, in this case all of them are returned.
 
+        :param shapes: list of the shapes to choose from, all shapes of the schema if None; default: None
         :return: list of possible starting points based on the heuristics
         """
+        shapes = self.shapes if shapes is None else shapes
         possible_starting_points = []
 
         # heuristic 1: target definition available
         if self.heuristics['target']:
-            for s in self.shapes:
+            for s in shapes:
                 if s.targetDef is not None:
                     possible_starting_points.append(s)
 
         # heuristic 2: in- and outdegree
         if self.heuristics['degree'] == 'in':
             # prioritize indegree
-            possible_starting_points = possible_starting_points if possible_starting_points else self.shapes
+            possible_starting_points = possible_starting_points if possible_starting_points else shapes
             possible_starting_points = self.__indegree(possible_starting_points)
         elif self.heuristics['degree'] == 'out':
             # prioritize outdegree
-            possible_starting_points = possible_starting_points if possible_starting_points else self.shapes
+            possible_starting_points = possible_starting_points if possible_starting_points else shapes
             possible_starting_points = self.__outdegree(possible_starting_points)
         elif self.heuristics['degree'] == 'inout':
             # prioritize indegree and further filter by outdegree
-            possible_starting_points = possible_starting_points if possible_starting_points else self.shapes
+            possible_starting_points = possible_starting_points if possible_starting_points else shapes
             possible_starting_points = self.__indegree(possible_starting_points)
             possible_starting_points = self.__outdegree(possible_starting_points)
         elif self.heuristics['degree'] == 'outin':
             # prioritize outdegree and further filter by indegree
-            possible_starting_points = possible_starting_points if possible_starting_points else self.shapes
+            possible_starting_points = possible_starting_points if possible_starting_points else shapes
             possible_starting_points = self.__outdegree(possible_starting_points)
             possible_starting_points = self.__indegree(possible_starting_points)
 
         # heuristic 3: number of properties
         if self.heuristics['properties'] == 'small':
-            possible_starting_points = possible_starting_points if possible_starting_points else self.shapes
+            possible_starting_points = possible_starting_points if possible_starting_points else shapes
             if len(possible_starting_points) > 1:
                 min_con = min([s.get_number_constraints() for s in possible_starting_points])
                 tmp = []
@@ -158,30 +336,243 @@ class ShapeSchema:
             for child_name in child_shapes:
                 self.shapesDict[child_name].add_parent_shape(shape_name)
 
-    def validate(self):
-        """Executes the validation of the shape network."""
-        start = self.get_starting_point()
-        node_order = self.graphTraversal.traverse_graph(self.dependencies, self.reverse_dependencies, start[0])  # TODO: deal with more than one possible starting point
+    def validate(self, on_event=None, deadline: float = None):
+        """
+        Executes the validation of the shape network.
+
+        :param on_event: function called with a ValidationEvent (shape, focus_node, result, classified_by) for each
+            target as soon as it is classified, i.e., while the validation is still running; the connected
+            components are validated in this process in that case; default: None
+        :param deadline: time budget of the validation in seconds; once it is used up, no further queries are sent
+            and the result contains the targets classified so far, the others are listed as unclassified;
+            None for no time limit; default: None
+        :return: dictionary containing shape names and their respective (in)validated targets
+        """
+        return self.__validate(on_event, True, self.__deadline(deadline))
+
+    def iter_validate(self, buffer_size: int = 1024, deadline: float = None):
+        """
+        Executes the validation of the shape network and yields the classifications as soon as they are found.
+        The validation runs in a background thread; it is paused while 'buffer_size' events are not consumed
+        and stopped if the iteration is not continued. The result dictionary is not collected.
+
+        :param buffer_size: maximum number of events waiting to be consumed; default: 1024
+        :param deadline: time budget of the validation in seconds, no further queries are sent once it is used up;
+            None for no time limit; default: None
+        :return: generator over ValidationEvent tuples (shape, focus_node, result, classified_by), where result
+            is either 'valid' or 'violated' and classified_by is None for targets valid after the validation
+        """
+        deadline = self.__deadline(deadline)
+        events = queue.Queue(maxsize=buffer_size)
+        stopped = threading.Event()
+        done = object()
+
+        def publish(event):
+            while not stopped.is_set():
+                try:
+                    events.put(event, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            raise _ValidationStopped()
+
+        def run():
+            result = done
+            try:
+                self.__validate(publish, False, deadline)
+            except _ValidationStopped:
+                return
+            except BaseException as e:
+                result = e
+            try:
+                publish(result)
+            except _ValidationStopped:
+                pass
+
+        thread = threading.Thread(target=run, name='TravSHACL-validation', daemon=True)
+        thread.start()
+        try:
+            while True:
+                event = events.get()
+                if event is done:
+                    return
+                if isinstance(event, BaseException):
+                    raise event
+                yield event
+        finally:
+            stopped.set()
+            thread.join()
+
+    def validate_incremental(self, snapshot: ValidationSnapshot | str, added: str | Graph = None,
+                             removed: str | Graph = None):
+        """
+        Validates the shape network again after the graph changed, reusing the classifications of a previous validation.
+        Only the focus nodes whose classification might have changed are validated again, i.e., the nodes occurring in
+        the added or removed triples and the nodes referring to them via a constraint path or shape references
+        (see ChangeSet).
+        The endpoint needs to hold the graph after the change. Selective queries, the parallel evaluation of shapes,
+        and early termination are not used; the files saved to the output directory only cover the focus nodes
+        validated again.
+
+        :param snapshot: ValidationSnapshot of the previous validation or the path of its file
+        :param added: triples added to the graph, as RDFLib graph or path of an N-Triples file; default: None
+        :param removed: triples removed from the graph, as RDFLib graph or path of an N-Triples file; default: None
+        :return: dictionary containing shape names and their respective (in)validated targets, the targets not
+            validated again are listed with the shape they belong to
+        """
+        if not isinstance(snapshot, ValidationSnapshot):
+            snapshot = ValidationSnapshot.load(snapshot)
+        focus_nodes = ChangeSet(added, removed).affected_focus_nodes(self.shapesDict, snapshot, self.endpoint,
+                                                                     self.queryPartitioner)
+        # the classifications of the other targets are only needed if they are referred to
+        known_targets = {name: (snapshot.valid(name) - nodes, snapshot.violated(name) - nodes)
+                         for name, nodes in focus_nodes.items() if self.shapesDict[name].get_parent_shapes()}
+        result = snapshot.complete(self.__validate(None, True, None, (focus_nodes, known_targets)), focus_nodes)
+        for name, nodes in focus_nodes.items():
+            targets = self.shapesDict[name].targets
+            targets['valid'].update('<' + node + '>' for node in snapshot.valid(name) - nodes)
+            targets['violated'].update('<' + node + '>' for node in snapshot.violated(name) - nodes)
+        return result
+
+    @staticmethod
+    def __deadline(time_budget):
+        """Returns the point in time (see time.monotonic) the given time budget in seconds is used up."""
+        if time_budget is None:
+            return None
+        if time_budget < 0:
+            raise ValueError('The deadline needs to be positive or 0.')
+        return time.monotonic() + time_budget
+
+    def __cost_model(self):
+        """Returns the cost model of the shape schema; the endpoint statistics are only collected on first use."""
+        if self.costModel is None:
+            self.endpointStatistics.collect(self.shapes)
+            self.costModel = CostModel(self.shapesDict, self.endpointStatistics)
+        return self.costModel
+
+    def __validate(self, on_event, collect_output, deadline, incremental=None):
+        cost_model = self.__cost_model() if self.graphTraversal == GraphTraversal.COST else None
+
+        # stopping early requires the classifications of all shapes in one process
+        early_termination = self.maxViolations > 0 or self.stopAfterShape is not None or deadline is not None
+        components = connected_components(self.dependencies, self.reverse_dependencies) \
+            if self.componentWorkers > 1 and on_event is None and not early_termination and incremental is None \
+            else []
+        if len(components) > 1:
+            return self.__validate_components(components, cost_model)
+
+        if cost_model is not None:
+            start = [cost_model.get_starting_point()]
+        else:
+            start = self.get_starting_point()
+        # TODO: deal with more than one possible starting point
+        node_order = self.graphTraversal.traverse_graph(self.dependencies, self.reverse_dependencies, start[0],
+                                                        cost_model=cost_model)
 
         for s in self.shapes:
             s.compute_constraint_queries()
 
-        target_shapes = [s for name, s in self.shapesDict.items()
-                         if self.shapesDict[name].get_target_query() is not None]
-        target_shape_predicates = [s.get_id() for s in target_shapes]
-
-        return Validation(
-            self.endpoint,
-            node_order,
-            self.shapesDict,
-            target_shape_predicates,
-            self.selectivityEnabled,
-            self.outputDirName,
-            self.saveStats,
-            self.saveTargetsToFile
-        ).exec()
+        focus_nodes, known_targets = incremental if incremental is not None else (None, None)
+        return Validation(self.endpoint, **self.__validation_options(node_order, self.shapesDict, self.outputDirName,
+                                                                     incremental is not None),
+                          deadline=deadline, on_event=on_event, collect_output=collect_output,
+                          focus_nodes=focus_nodes, known_targets=known_targets).exec()
         # return 'Go to log files in {} folder to see report'.format(self.outputDirName)
 
+    def __validate_components(self, components, cost_model):
+        """
+        Validates each connected component of the shape network in its own worker process.
+        Since the components do not share any shapes, the outputs of the components are merged per shape.
+        The merged statistics, validation report, and target classifications are saved to the output directory,
+        the validation log and the traces of each component are saved to a subdirectory of the output directory.
+
+        :param components: list of the connected components, each as a list of shape names
+        :param cost_model: cost model used by the cost-based graph traversal, None otherwise
+        :return: dictionary containing shape names and their respective (in)validated targets
+        """
+        jobs = []
+        for i, component in enumerate(components):
+            if cost_model is not None:
+                start = cost_model.get_starting_point(component)
+            else:
+                start = self.get_starting_point([self.shapesDict[name] for name in component])[0]
+            node_order = self.graphTraversal.traverse_graph({name: self.dependencies[name] for name in component},
+                                                            {name: self.reverse_dependencies[name] for name in component},
+                                                            start, cost_model=cost_model)
+            output_dir = os.path.join(self.outputDirName, 'component' + str(i + 1)) \
+                if self.outputDirName is not None else None
+            jobs.append((node_order, {name: self.shapesDict[name] for name in component}, output_dir))
+
+        for s in self.shapes:
+            s.compute_constraint_queries()
+
+        start = time.time() * 1000.0
+        with ProcessPoolExecutor(max_workers=min(self.componentWorkers, len(jobs))) as executor:
+            futures = [executor.submit(_validate_component, self.endpointConfig, self.queryCacheConfig,
+                                       self.sharedConnections, self.__validation_options(*job)) for job in jobs]
+            outputs = [future.result() for future in futures]
+
+        output = {}
+        unbound = set()
+        stats = ValidationStats()
+        for component_output, component_stats in outputs:
+            unbound.update(component_output.pop('unbound')['valid_instances'])
+            output.update(component_output)
+            stats.merge(component_stats)
+        stats.record_total_time(round(time.time() * 1000.0 - start))
+        output = {name: output[name] for name in self.shapesDict}
+        for result in output.values():  # the worker processes registered the targets in their copies of the shapes
+            for t in result['valid_instances']:
+                self.shapesDict[t[0]].targets['valid'].add('<' + t[1] + '>')
+            for t in result['invalid_instances']:
+                self.shapesDict[t[0]].targets['violated'].add('<' + t[1] + '>')
+        output['unbound'] = {'valid_instances': unbound}
+        self.__save_component_outputs(output, stats)
+        return output
+
+    def __save_component_outputs(self, output, stats):
+        """Saves the merged outputs of the connected components like a validation in a single process does."""
+        all_valid_targets = set().union(*(result['valid_instances'] for result in output.values()))
+        all_invalid_targets = set().union(*(result.get('invalid_instances', ()) for result in output.values()))
+        if self.saveTargetsToFile:
+            Validation.write_targets_to_file(self.outputDirName, all_valid_targets, all_invalid_targets)
+        if self.saveStats:
+            stats.record_number_of_targets(len(all_valid_targets), len(all_invalid_targets))
+            stats_file = fileManagement.open_file(self.outputDirName, 'stats.txt')
+            stats.write_all_stats(stats_file)
+            fileManagement.close_file(stats_file)
+            ReportWriter(self.reportFormat).write(self.outputDirName,
+                                                  (violation[:2] for violation in all_invalid_targets))
+
+    def __validation_options(self, node_order, shapes_dict, output_dir, incremental=False):
+        """
+        Returns the keyword arguments of the validation process, except the endpoint, for the given shapes.
+        An incremental validation only classifies some of the targets, hence, the options relying on the
+        classifications of all targets, i.e., selective queries and early termination, are disabled.
+        """
+        scheduler = ShapeScheduler(node_order, self.dependencies, self.selectivityEnabled, self.shapeWorkers) \
+            if self.parallel and not incremental else None
+        return {
+            'node_order': node_order,
+            'shapes_dict': shapes_dict,
+            'target_shape_predicates': [name for name, s in shapes_dict.items() if s.get_target_query() is not None],
+            'use_selective_queries': self.selectivityEnabled and not incremental,
+            'output_dir_name': output_dir,
+            'save_stats': self.saveStats,
+            'save_targets_to_file': self.saveTargetsToFile,
+            'query_workers': self.queryWorkers,
+            'sparql_batch_size': self.sparqlBatchSize,
+            'query_partitioner': self.queryPartitioner,
+            'target_paginator': self.targetPaginator,
+            'shape_scheduler': scheduler,
+            'log_level': self.logLevel,
+            'log_queries': self.logQueries,
+            'trace_sampling': self.traceSampling,
+            'report_format': self.reportFormat,
+            'max_violations': 0 if incremental else self.maxViolations,
+            'stop_after_shape': None if incremental else self.stopAfterShape
+        }
+
     def compute_in_and_outdegree(self):
         """Computes the in- and outdegree of each shape."""
         for s in self.shapes:
@@ -203,3 +594,29 @@ class ShapeSchema:
                 for ref in refs:
                     reverse_dependencies[ref].append(name)
         return dependencies, reverse_dependencies
+
+
+class _ValidationStopped(Exception):
+    """Raised in the validation thread of ShapeSchema.iter_validate() when the iteration was stopped."""
+
+
+_worker_registry = None  # connections shared by the components validated in the same worker process
+
+
+def _validate_component(endpoint_config, query_cache_config, shared_connections, validation_options):
+    """
+    Validates a connected component of the shape network in a worker process with its own endpoint connection.
+    The connections of a client registry cannot be passed to another process, instead, the components validated
+    by the same worker process share the connections of a registry of the worker process.
+    """
+    global _worker_registry
+    if shared_connections and _worker_registry is None:
+        _worker_registry = ClientRegistry()
+    query_cache = QueryCache(*query_cache_config) if query_cache_config is not None else None
+    endpoint = SPARQLEndpoint(**endpoint_config, cache=query_cache,
+                              registry=_worker_registry if shared_connections else None)
+    try:
+        validation = Validation(endpoint, **validation_options)
+        return validation.exec(), validation.stats
+    finally:
+        endpoint.close()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import json
+import os
+import uuid
+
+FORMAT_VERSION = 1  # to be increased whenever the structure of the snapshot file changes
+
+
+class ValidationSnapshot:
+    """Classifications of the focus nodes of a complete validation run, i.e., the valid and violated focus nodes per
+       shape. A snapshot is the starting point of an incremental validation (see ShapeSchema.validate_incremental);
+       it is only meaningful for the shape schema it was created with."""
+
+    def __init__(self, shapes: dict = None):
+        """
+        Creates a new snapshot.
+
+        :param shapes: Python dictionary mapping the shape names to a dictionary with the sets of 'valid' and
+            'violated' focus nodes; default: None (empty snapshot)
+        """
+        self.shapes = shapes if shapes is not None else {}
+
+    def __contains__(self, shape_name: str):
+        return shape_name in self.shapes
+
+    def valid(self, shape_name: str):
+        """Returns the valid focus nodes of a shape."""
+        return self.shapes[shape_name]['valid']
+
+    def violated(self, shape_name: str):
+        """Returns the violated focus nodes of a shape."""
+        return self.shapes[shape_name]['violated']
+
+    @staticmethod
+    def from_result(result: dict):
+        """
+        Creates a snapshot from the result of a validation.
+
+        :param result: dictionary returned by ShapeSchema.validate() or ShapeSchema.validate_incremental()
+        :return: the snapshot of the classifications
+        """
+        if 'unclassified' in result:
+            raise ValueError('A snapshot requires a complete validation, the result has unclassified targets.')
+        shapes = {name: {'valid': set(), 'violated': set()} for name in result if name != 'unbound'}
+        for name, value in result.items():
+            for target in value['valid_instances']:
+                shapes.setdefault(target[0], {'valid': set(), 'violated': set()})['valid'].add(target[1])
+            for target in value.get('invalid_instances', ()):
+                shapes.setdefault(target[0], {'valid': set(), 'violated': set()})['violated'].add(target[1])
+        return ValidationSnapshot(shapes)
+
+    @staticmethod
+    def load(path: str):
+        """
+        Loads a snapshot saved with save().
+
+        :param path: path of the snapshot file
+        :return: the snapshot
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            content = json.load(file)
+        if content.get('format') != FORMAT_VERSION:
+            raise ValueError('Unsupported snapshot format: ' + str(content.get('format')) + '.')
+        return ValidationSnapshot({name: {'valid': set(nodes['valid']), 'violated': set(nodes['violated'])}
+                                   for name, nodes in content['shapes'].items()})
+
+    def save(self, path: str):
+        """
+        Saves the snapshot as JSON. The file is written to a temporary file first, so that the previous snapshot
+        is only replaced by a complete one.
+
+        :param path: path of the snapshot file
+        """
+        content = {
+            'format': FORMAT_VERSION,
+            'shapes': {name: {'valid': sorted(nodes['valid']), 'violated': sorted(nodes['violated'])}
+                       for name, nodes in self.shapes.items()}
+        }
+        tmp_path = path + '.' + uuid.uuid4().hex + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(content, file)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def complete(self, result: dict, focus_nodes: dict):
+        """
+        Completes the result of an incremental validation with the stored classifications of the focus nodes that
+        were not validated again.
+
+        :param result: dictionary returned by the validation restricted to the focus nodes
+        :param focus_nodes: Python dictionary mapping the shape names to the focus nodes validated again; all focus
+            nodes of the other shapes were validated again
+        :return: the completed result
+        """
+        for name, nodes in focus_nodes.items():
+            result[name]['valid_instances'].update((name, node, True) for node in self.valid(name) - nodes)
+            result[name]['invalid_instances'].update((name, node, True) for node in self.violated(name) - nodes)
+        return result
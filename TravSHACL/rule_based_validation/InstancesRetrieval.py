@@ -1,100 +1,312 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Monica Figuera'
 
-import math
+import queue
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 
 from SPARQLWrapper import SPARQLWrapper
 
+from TravSHACL.sparql.QueryPaginator import QueryPaginator
+from TravSHACL.sparql.QueryPartitioner import QueryPartitioner
 from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
 from TravSHACL.sparql.QueryGenerator import get_target_node_statement
 from TravSHACL.constraints.MinOnlyConstraint import MinOnlyConstraint
 from TravSHACL.constraints.MaxOnlyConstraint import MaxOnlyConstraint
+from TravSHACL.utils.ValidationLog import ValidationLog
+
+# group pattern of a (sub-)query projecting the focus node ?x, the focus nodes are bound at its beginning
+_FOCUS_NODE_GROUP = re.compile(r'SELECT\s+(?:DISTINCT\s+|REDUCED\s+)?(?:[^{(]*?\?x\b|\*)[^{(]*?WHERE\s*\{',
+                               re.IGNORECASE)
+
+_ROWS_PER_CHUNK = 256  # solution mappings handed over from a query worker at once
+_CHUNKS_PER_PARTITION = 4  # chunks of a partition buffered while the validation is not reading it
+_PREFETCH_MAX_ROWS = 100000  # prefetched answers with more solution mappings are dropped, the query is sent again
+_END = object()
 
 
 class InstancesRetrieval:
     """This class is responsible for retrieving the instances from a SPARQL endpoint."""
 
-    def __init__(self, endpoint:  SPARQLEndpoint, shapes_dict, stats):
+    def __init__(self, endpoint:  SPARQLEndpoint, shapes_dict, stats, query_workers=4, sparql_batch_size=100,
+                 query_partitioner: QueryPartitioner = None, target_paginator: QueryPaginator = None,
+                 prefetch_workers=0, log: ValidationLog = None, deadline: float = None, focus_nodes: dict = None):
         """
         Creates a new instance for the data retrieval.
 
         :param endpoint: SPARQL endpoint to collect the data from
         :param shapes_dict: a Python dictionary holding all shapes of the shape schema
         :param stats: instance of ValidationStats to keep the statistics up-to-date
+        :param query_workers: maximum number of queries sent to the endpoint at the same time; default: 4
+        :param sparql_batch_size: maximum number of instances checked by one query of a SPARQL constraint; default: 100
+        :param query_partitioner: splits queries with a list of instances so that the query size accepted by the
+            endpoint is not exceeded, None uses the default maximum query size; default: None
+        :param target_paginator: retrieves the answers of target queries page by page, None retrieves
+            them with a single query; default: None
+        :param prefetch_workers: maximum number of queries of upcoming shapes sent to the endpoint in the background,
+            0 disables prefetching; only SPARQL endpoints accessed via a URL are prefetched; default: 0
+        :param log: ValidationLog the executed queries are recorded in, None disables the log; default: None
+        :param deadline: point in time (see time.monotonic) after which no further queries are sent and no answers
+            of constraint queries are awaited, None for no time limit; default: None
+        :param focus_nodes: Python dictionary mapping shape names to the IRIs of the focus nodes the target and
+            constraint queries of the shape are restricted to; the queries of the other shapes are not restricted;
+            default: None
         """
         self.endpoint = endpoint
         self.shapes_dict = shapes_dict
         self.stats = stats
+        self.log = log if log is not None else ValidationLog()
+        self.sparql_batch_size = sparql_batch_size
+        self.partitioner = query_partitioner if query_partitioner is not None else QueryPartitioner()
+        self.paginator = target_paginator
+        self.executor = ThreadPoolExecutor(max_workers=query_workers) if query_workers > 1 else None
+        self.prefetch_executor = None
+        if prefetch_workers > 0 and self.endpoint.get_endpoint_type() == SPARQLWrapper:
+            self.prefetch_executor = ThreadPoolExecutor(max_workers=prefetch_workers)
+        self.prefetched = {}  # query string -> future holding the projected variables and all solution mappings
+        self.prefetched_by_shape = {}
+        self.deadline = deadline
+        self.focus_nodes = {} if focus_nodes is None else \
+            {name: sorted('<' + node + '>' for node in nodes) for name, nodes in focus_nodes.items()}
+
+    def close(self, wait=True):
+        """
+        Shuts down the worker pools used for sending concurrent queries.
+
+        :param wait: indicates whether the queries already sent are awaited; default: True
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
+        if self.prefetch_executor is not None:
+            self.prefetch_executor.shutdown(wait=wait, cancel_futures=True)
+            self.prefetch_executor = None
+        self.prefetched.clear()
+        self.prefetched_by_shape.clear()
+
+    def prefetch(self, shape_id, query_strings, paginated=False):
+        """
+        Sends queries expected for an upcoming shape in the background. The answers are only used if exactly
+        the same query is executed later on; otherwise, they are dropped once the shape is evaluated.
+        Since the answers are kept in memory until they are used, answers with more than 100,000 solution
+        mappings are not kept; the query is sent again when it is executed.
+
+        :param shape_id: name of the shape the queries belong to
+        :param query_strings: iterable over the query strings to be sent
+        :param paginated: indicates whether the queries retrieve targets, i.e., whether they are paginated if enabled
+        """
+        if self.prefetch_executor is None:
+            return
+        run_query = self.__run_target_query if paginated else self.endpoint.run_query_rows
+        for query_str in query_strings:
+            if query_str not in self.prefetched:
+                self.prefetched[query_str] = self.prefetch_executor.submit(self.__materialized_query, run_query, query_str)
+                self.prefetched_by_shape.setdefault(shape_id, []).append(query_str)
+
+    def discard_prefetched(self, shape_id):
+        """Drops the prefetched answers of a shape that were not used."""
+        for query_str in self.prefetched_by_shape.pop(shape_id, []):
+            future = self.prefetched.pop(query_str, None)
+            if future is not None:
+                future.cancel()
+
+    @staticmethod
+    def __materialized_query(run_query, query_str):
+        """Executes a query and collects its answers, None if there are too many of them to be kept."""
+        variables, rows = run_query(query_str)
+        collected = list(islice(rows, _PREFETCH_MAX_ROWS + 1))
+        _close(rows)
+        if len(collected) > _PREFETCH_MAX_ROWS:
+            return None
+        return variables, collected
+
+    def __query_rows(self, query_str, paginated=False):
+        """Executes a query unless its answers were prefetched."""
+        future = self.prefetched.pop(query_str, None)
+        if future is not None:
+            prefetched = future.result()
+            if prefetched is not None:
+                return prefetched[0], iter(prefetched[1])
+        return self.__run_target_query(query_str) if paginated else self.endpoint.run_query_rows(query_str)
 
     def run_constraint_query(self, q, query_str):
         """
-        Retrieves answers from the SPARQL endpoint.
+        Retrieves answers from the SPARQL endpoint. The answers are streamed, i.e., the statistics
+        of the query are recorded as soon as all solution mappings are consumed.
 
         :param q: Query object representing the SPARQL query to answer
         :param query_str: possibly rewritten query string, e.g., a partition of the original query
-        :return: answer set bindings for the constraint query
+        :return: the projected variables and a generator over the solution mappings of the constraint query
         """
-        self.stats.update_log(''.join(['\n\nEvaluating query ', q.get_id(), ':\n', query_str]))
-
         start = time.time()*1000.0
-        bindings = self.endpoint.run_query(query_str)['results']['bindings']
-        end = time.time()*1000.0
+        variables, rows = self.__query_rows(query_str)
+        return variables, self.__recorded_rows(q, query_str, rows, start)
+
+    def run_constraint_queries(self, q, query_strings):
+        """
+        Retrieves the answers of all partitions of a constraint query from the SPARQL endpoint.
+        If a worker pool is available, the partitions are sent at the same time and each partition is returned
+        as soon as its answers start to arrive. The answers are streamed from the workers in chunks; a worker
+        waits while the validation has not read the chunks of its partition yet, hence, at most a few chunks
+        per worker are held in memory. If a deadline is set, the queries are always sent via the worker pool
+        and no further answers are returned once the deadline passed.
+
+        :param q: Query object representing the SPARQL query to answer
+        :param query_strings: iterable over the (possibly partitioned) query strings belonging to the query
+        :return: generator yielding the projected variables and the solution mappings per partition
+        """
+        query_strings = iter(query_strings)
+        first = next(query_strings, None)
+        second = next(query_strings, None)
+        if self.executor is None or (second is None and self.deadline is None):
+            for query_str in chain((first, second), query_strings):
+                if query_str is not None:
+                    yield self.run_constraint_query(q, query_str)
+            return
 
-        self.stats.update_log(''.join(['\nelapsed: ', str(end - start), ' ms\n']))
+        ready = queue.Queue()  # partitions whose answers started to arrive
+        partitions = [_StreamedPartition(query_str, ready)
+                      for query_str in chain((first, second), query_strings) if query_str is not None]
+        futures = [self.executor.submit(self.__stream_partition, partition) for partition in partitions]
+        try:
+            for _ in partitions:
+                try:
+                    partition = ready.get(timeout=_remaining_time(self.deadline))
+                except queue.Empty:
+                    return  # the deadline passed, the answers of the remaining partitions are not awaited
+                if partition.error is not None:
+                    raise partition.error
+                yield partition.variables, self.__recorded_rows(q, partition.query_str,
+                                                                partition.rows(self.deadline), partition.start)
+        finally:
+            for partition in partitions:
+                partition.closed.set()
+            for future in futures:
+                future.cancel()
+
+    def __recorded_rows(self, q, query_str, rows, start):
+        """Passes the solution mappings of a streamed query through and records the query once they are consumed."""
+        count = 0
+        for row in rows:
+            count += 1
+            yield row
+        self.__record_constraint_query(q, query_str, count, start, time.time()*1000.0)
+
+    def __stream_partition(self, partition):
+        """Executes a partition in a worker thread and hands its solution mappings over in chunks."""
+        partition.start = time.time()*1000.0
+        try:
+            variables, rows = self.__query_rows(partition.query_str)
+        except BaseException as e:
+            partition.fail(e)
+            return
+        try:
+            partition.begin(variables)
+            while True:
+                chunk = list(islice(rows, _ROWS_PER_CHUNK))
+                if not chunk:
+                    partition.put(_END)
+                    return
+                if not partition.put(chunk):
+                    return  # the partition is no longer read
+        except BaseException as e:
+            partition.put(e)
+        finally:
+            _close(rows)
+
+    def __record_constraint_query(self, q, query_str, sol_mappings, start, end):
+        """Updates the log and statistics after the evaluation of a constraint query."""
+        self.log.query('constraint_query', query_str, id=q.get_id(), elapsed=end - start,
+                       solution_mappings=sol_mappings)
         self.stats.record_query_exec_time(end - start)
         self.stats.record_query()
-        self.stats.update_log(''.join(['\nNumber of solution mappings: ', str(len(bindings)), '\n']))
-        self.stats.record_number_of_sol_mappings(len(bindings))
-        return bindings
+        self.stats.record_number_of_sol_mappings(sol_mappings)
 
-    def execute_sparql_constraint(self, constraint_id, query_str, instance_list):
+    def execute_sparql_constraint(self, constraint_id, query_str, instance_list, batch_query=None, batch_var=None):
         """
         Retrieves all the violations of a SPARQL constraint from the endpoint.
+        If a batch query is given, the instances are checked in batches, otherwise one query per instance is sent.
 
         :param constraint_id: the ID of the SPARQL constraint
         :param query_str: the SPARQL query belonging to the constraint represented as a string
         :param instance_list: a list with the instances for which the constraint needs to be checked
-        :return: list of all instances violating the constraint, i.e., the SPARQL query result is not empty
+        :param batch_query: the SPARQL query rewritten to bind the instances via a VALUES clause; default: None
+        :param batch_var: the variable of the batch query holding the instance of a solution mapping; default: None
+        :return: list of all instances violating the constraint, i.e., the SPARQL query result is not empty;
+            once the deadline passed, only the violations found by the queries sent before are returned
         """
-        self.stats.update_log(''.join(['\n\nEvaluating query for ', constraint_id, ':\n', query_str]))
-
-        violations = []
         start = time.time() * 1000.0
-        for instance in instance_list:
-            query = query_str.replace('$this', '<' + instance + '>')
-            if len(self.endpoint.run_query(query)['results']['bindings']) > 0:
-                violations.append(instance)
+        if batch_query is not None and self.sparql_batch_size > 1:
+            queries = list(self.partitioner.partition(batch_query, ('<' + instance + '>' for instance in instance_list),
+                                                      max_instances=self.sparql_batch_size))
+            violating = set()
+            for focus_nodes in self.__map(lambda query: self.__focus_nodes(query, batch_var), queries):
+                if focus_nodes is not None:
+                    violating.update(focus_nodes)
+            violations = [instance for instance in instance_list if instance in violating]
+        else:
+            queries = [query_str.replace('$this', '<' + instance + '>') for instance in instance_list]
+            violations = [instance for instance, violated in zip(instance_list, self.__map(self.__has_solutions, queries))
+                          if violated]
         end = time.time() * 1000.0
 
-        self.stats.update_log(''.join(['\nelapsed: ', str(end - start), ' ms\n']))
+        self.log.query('sparql_constraint', query_str, id=constraint_id, elapsed=end - start, queries=len(queries),
+                       solution_mappings=len(violations))
         self.stats.record_query_exec_time(end - start)
         self.stats.record_query()
-        self.stats.update_log(''.join(['\nNumber of solution mappings: ', str(len(violations)), '\n']))
         self.stats.record_number_of_sol_mappings(len(violations))
 
         return violations
 
+    def __map(self, function, queries):
+        """
+        Applies the function to all queries, using the worker pool if available; the order is preserved.
+        Queries that are due after the deadline are not sent, their result is None.
+        """
+        if self.deadline is not None:
+            function = self.__before_deadline(function)
+        if self.executor is None or len(queries) < 2:
+            return map(function, queries)
+        return self.executor.map(function, queries)
+
+    def __before_deadline(self, function):
+        return lambda query: None if _deadline_passed(self.deadline) else function(query)
+
+    def __has_solutions(self, query):
+        _, rows = self.endpoint.run_query_rows(query)
+        # the rows are counted instead of stopping at the first one, so that the connection can be reused
+        return sum(1 for _ in rows) > 0
+
+    def __focus_nodes(self, query, focus_var):
+        variables, rows = self.endpoint.run_query_rows(query)
+        index = variables.index(focus_var)
+        return {row[index] for row in rows}
+
     def extract_targets(self, shape):
         """
         Retrieves answers from the SPARQL endpoint.
         When a network of shapes has only 'some' targets, a shape without a target class returns no new bindings
 
         :param shape: focus shape being evaluated
-        :return: set containing target literals (stored in the form of built-in python tuples)
+        :return: set containing target literals (stored in the form of built-in python tuples); once the deadline
+            passed, only the targets retrieved so far
         """
         query = shape.get_target_query()  # targetQuery is set in shape's definition file (json file)
-        self.stats.update_log(''.join(['\nEvaluating target query for ', shape.id, ':\n', query]))
-
         start = time.time() * 1000.0
-        bindings = self.endpoint.run_query(query)['results']['bindings']
+        targets = set()
+        for query_str in self.restrict_to_focus_nodes(shape, iter([query])):
+            if _deadline_passed(self.deadline):
+                break
+            targets.update(self.__extract_focus_nodes(shape, query_str))
         end = time.time() * 1000.0
 
-        self.stats.update_log('\nelapsed: ' + str(end - start) + ' ms\n')
+        self.log.query('target_query', query, shape=shape.id, elapsed=end - start, targets=len(targets))
         self.stats.record_query_exec_time(end - start)
         self.stats.record_query()
-        self.stats.update_log('\nNumber of targets retrieved: ' + str(len(bindings)))
-        return {(shape.id, b['x']['value'], True) for b in bindings}
+        return targets
 
     def extract_options(self, shape):
         """
@@ -102,21 +314,32 @@ class InstancesRetrieval:
         When a network of shapes has only 'some' targets, a shape without a target class returns no new bindings
 
         :param shape: focus shape being evaluated
-        :return: set containing target literals (stored in the form of built-in python tuples)
+        :return: set containing target literals (stored in the form of built-in python tuples); once the deadline
+            passed, only the options retrieved so far
         """
         query = shape.get_or_query()  # or_query is formed in the shape class
         if not query:
             return
-        self.stats.update_log(''.join(['\nEvaluating OR_options query for ', shape.id, ':\n', query]))
         start = time.time() * 1000.0
-        bindings = self.endpoint.run_query(query)['results']['bindings']
+        options = set() if _deadline_passed(self.deadline) else self.__extract_focus_nodes(shape, query)
         end = time.time() * 1000.0
 
-        self.stats.update_log('\nelapsed: ' + str(end - start) + ' ms\n')
+        self.log.query('or_query', query, shape=shape.id, elapsed=end - start, options=len(options))
         self.stats.record_query_exec_time(end - start)
         self.stats.record_query()
-        self.stats.update_log('\nNumber of options retrieved: ' + str(len(bindings)))
-        return {(shape.id, b['x']['value'], True) for b in bindings}
+        return options
+
+    def __extract_focus_nodes(self, shape, query):
+        """Streams the answers of a target query into a set of atoms for the instances bound to ?x."""
+        variables, rows = self.__query_rows(query, paginated=True)
+        x = variables.index('x')
+        return {(shape.id, row[x], True) for row in rows}
+
+    def __run_target_query(self, query):
+        """Executes a query retrieving targets, page by page if pagination is enabled."""
+        if self.paginator is None:
+            return self.endpoint.run_query_rows(query)
+        return self.paginator.run_query_rows(self.endpoint, query, 'x', self.deadline)
 
     def extract_targets_with_filter(self, shape, filtering_shape):
         """
@@ -125,6 +348,7 @@ class InstancesRetrieval:
         :param shape: focus shape being evaluated
         :param filtering_shape: referenced shape used to filter query, or None
         :return: two sets containing all targets of 'shape': pending targets to validate and directly invalidated targets
+            (once the deadline passed, only the targets retrieved so far)
         """
         if self.endpoint.get_endpoint_type() != SPARQLWrapper:
             return self.extract_targets(shape), []  # FIXME: rdflib cannot handle unbound variables in aggregates, hence, no filtering will be applied
@@ -135,36 +359,25 @@ class InstancesRetrieval:
         pending_targets = set()
         inv_targets = set()
 
-        self.stats.update_log(''.join(['\n', 'instances retrieval ', shape.get_id(),
-                              ": [out-neighbor's (", filtering_shape.get_id(), ')']))
-        self.stats.update_log(''.join([' instances: ', str(len(prev_val_list)), ' valid ',
-                              str(len(prev_inv_list)), ' invalid]']))
+        self.log.debug('filtered_targets', shape=shape.get_id(), filtering_shape=filtering_shape.get_id(),
+                       filtering_valid=len(prev_val_list), filtering_invalid=len(prev_inv_list))
 
-        max_split_number = 256
-        max_instances_per_query = 115
-        shortest_inst_list = prev_val_list if len(prev_val_list) < len(prev_inv_list) else prev_inv_list
-
-        if prev_val_list == prev_inv_list or \
-                len(prev_val_list) == 0 or len(prev_inv_list) == 0 or \
-                len(shortest_inst_list) > max_split_number:
+        filtered_queries = self.filtered_target_queries(shape, filtering_shape)
+        if filtered_queries is None:
             pending_targets = self.extract_targets(shape)
             return pending_targets, inv_targets
 
-        query_template = shape.queriesFilters[filtering_shape.get_id()]
-        constraint = query_template['constraint']
-        query_template = query_template['query_valid'].get_sparql() if shortest_inst_list == prev_val_list else query_template['query_invalid'].get_sparql()
-        separator = ' '
-
-        split_instances = self.__get_formatted_instances(shortest_inst_list, separator, max_instances_per_query)
-        query = [query_template.replace('$instances_to_add$', sublist) for sublist in split_instances]
-
+        constraint, queries = filtered_queries
         start = time.time() * 1000.0
-        for q in query:
-            self.stats.update_log('\nEvaluating target query for ' + shape.id + ':\n' + q)
-            bindings = self.endpoint.run_query(q)['results']['bindings']
-            for b in bindings:
-                instance = b['x']['value']
-                cardinality = int(b['cnt']['value'])
+        for q in queries:
+            if _deadline_passed(self.deadline):
+                break
+            self.log.query('filtered_target_query', q, shape=shape.id)
+            variables, rows = self.__query_rows(q, paginated=True)
+            x, cnt = variables.index('x'), variables.index('cnt')
+            for row in rows:
+                instance = row[x]
+                cardinality = int(row[cnt])
 
                 if isinstance(constraint, MinOnlyConstraint):
                     if cardinality < constraint.min:
@@ -177,29 +390,57 @@ class InstancesRetrieval:
                     else:
                         pending_targets.update([(shape.id, instance, True)])
         end = time.time() * 1000.0
+        self.log.info('filtered_targets_retrieved', shape=shape.id, elapsed=end - start,
+                      pending_targets=len(pending_targets), invalid_targets=len(inv_targets))
         self.stats.record_query_exec_time(end - start)
         self.stats.record_query()
-        self.stats.update_log('\nelapsed: ' + str(end - start) + ' ms\n')
-        self.stats.update_log('\nNumber of pending targets: ' + str(len(pending_targets)))
-        self.stats.update_log('\nNumber of invalid targets: ' + str(len(inv_targets)))
         return pending_targets, inv_targets
 
+    def filtered_target_queries(self, shape, filtering_shape):
+        """
+        Builds the target queries of 'shape' filtered by the valid or invalid targets of 'filtering_shape',
+        whichever are fewer.
+
+        :param shape: focus shape being evaluated
+        :param filtering_shape: referenced shape used to filter the target query
+        :return: tuple with the constraint the filter is based on and a list with the query string,
+            None if the targets of 'filtering_shape' are not suited for filtering
+        """
+        prev_val_list = filtering_shape.get_valid_targets()
+        prev_inv_list = filtering_shape.get_invalid_targets()
+        max_split_number = 256
+        shortest_inst_list = prev_val_list if len(prev_val_list) < len(prev_inv_list) else prev_inv_list
+
+        if prev_val_list == prev_inv_list or \
+                len(prev_val_list) == 0 or len(prev_inv_list) == 0 or \
+                len(shortest_inst_list) > max_split_number:
+            return None
+
+        query_template = shape.queriesFilters[filtering_shape.get_id()]
+        constraint = query_template['constraint']
+        query_template = query_template['query_valid'].get_sparql() if shortest_inst_list == prev_val_list else query_template['query_invalid'].get_sparql()
+        queries = list(islice(self.partitioner.partition(query_template, shortest_inst_list), 2))
+        if len(queries) > 1:
+            # each partition would count the links of a target to its own instances only, i.e., the cardinality
+            # of a target is only known if all instances fit into a single query
+            return None
+        return constraint, queries
+
     def rewrite_constraint_query(self, shape, q, filtering_shape, q_type, use_selective_queries):
         """
         Filters constraint query with targets from 'filtering_shape' (if any).
         The end-user can restrict number of instances allowed for considering a filtering clause.
         Since the length of a query string is restricted by the SPARQL endpoint configuration, the query might be
-        divided into several sub-queries, where each subquery contains at most 'max_instances_per_query' (set to 80).
+        divided into several sub-queries, where each subquery does not exceed the maximum query size of the partitioner.
 
         :param shape: focus shape being evaluated
         :param q: Query object representing the target query of the focus shape
         :param filtering_shape: shape used to filter the instances of the target query
         :param q_type: query type
         :param use_selective_queries: boolean that indicates if the selective validation is enabled
-        :return: list with (possibly partitioned) filtered query or original query if no filter was applied
+        :return: generator over the (possibly partitioned) filtered query or the original query if no filter was applied
         """
         max_split_number = shape.get_query_split_threshold()
-        max_instances_per_query = 80
         prev_val_list = set() if filtering_shape is None else filtering_shape.get_valid_targets()
         prev_inv_list = set() if filtering_shape is None else filtering_shape.get_invalid_targets()
         query_template = q.get_sparql()
@@ -222,8 +463,6 @@ class InstancesRetrieval:
                 len(prev_val_list) <= max_split_number:
             values_clauses = ''
             inter_shape_triples = '\n'
-            separator = ''
-            split_instances = self.__get_formatted_instances(prev_val_list, separator, max_instances_per_query)
             for c in shape.constraints:
                 if c.shapeRef == filtering_shape.get_id() and c.min == 1:
                     obj_var = ' ?' + c.variables[0]
@@ -232,30 +471,91 @@ class InstancesRetrieval:
                         focus_var = c.varGenerator.get_focus_node_var()
                         inter_shape_triples += '?' + focus_var + ' ' + c.path + obj_var + '.\n'
 
-            return [query_template.replace(
-                        '$filter_clause_to_add$',
-                        values_clauses.replace('$instances$', sublist) + inter_shape_triples
-                    ) for sublist in split_instances]
+            query_template = query_template.replace('$filter_clause_to_add$', values_clauses + inter_shape_triples)
+            return self.restrict_to_focus_nodes(shape, self.partitioner.partition(
+                query_template, prev_val_list, placeholder='$instances$', separator=''))
 
-        return [query_template.replace('$filter_clause_to_add$', '')]
+        return self.restrict_to_focus_nodes(shape, iter([query_template.replace('$filter_clause_to_add$', '')]))
 
-    @staticmethod
-    def __get_formatted_instances(instances, separator, max_list_len):
+    def restrict_to_focus_nodes(self, shape, query_strings):
         """
-        Takes instances to be added to the query's filtering clause and returns one or more lists with (in)valid
-        instances in two possible formats: (a) using commas for instances in the VALUES clause or (b) using
-        spaces as separator for the instances in the FILTER NOT IN clause.
-
-        :param instances: shortest instances list (either the one with valid or invalid targets)
-        :param separator: string that contains either a comma or a space character
-        :param max_list_len: integer that sets the max number of instances in a query
-        :return: set containing all instances with the requested format
+        Restricts the queries of a shape to its focus nodes (if any) by binding ?x with a VALUES clause in each
+        (sub-)query projecting ?x. The queries are split so that the maximum query size is not exceeded.
+
+        :param shape: shape the queries belong to
+        :param query_strings: iterable over the query strings
+        :return: generator over the restricted query strings, the query strings themselves if not restricted
         """
-        chunks = len(instances) / max_list_len
-        n = math.ceil(chunks)
-        if chunks > 1:  # Get split list
-            instances = tuple(instances)
-            inst_count = math.ceil(len(instances) / n)
-            split_lists = {instances[i:i + inst_count] for i in range(0, inst_count, inst_count)}
-            return {separator.join(subList) for subList in split_lists}
-        return {separator.join(instances)}
+        nodes = self.focus_nodes.get(shape.get_id())
+        if nodes is None:
+            yield from query_strings
+            return
+        for query_str in query_strings:
+            template = _FOCUS_NODE_GROUP.sub(lambda m: m.group(0) + '\nVALUES ?x {$focus_nodes$}\n', query_str)
+            yield from self.partitioner.partition(template, nodes, placeholder='$focus_nodes$')
+
+
+class _StreamedPartition:
+    """Answers of a partition of a constraint query, streamed from a query worker via a bounded buffer."""
+
+    def __init__(self, query_str, ready):
+        self.query_str = query_str
+        self.ready = ready
+        self.variables = None
+        self.error = None
+        self.start = None
+        self.chunks = queue.Queue(maxsize=_CHUNKS_PER_PARTITION)
+        self.closed = threading.Event()
+
+    def begin(self, variables):
+        """Called by the worker once the projected variables are known."""
+        self.variables = variables
+        self.ready.put(self)
+
+    def fail(self, error):
+        """Called by the worker if the query could not be executed."""
+        self.error = error
+        self.ready.put(self)
+
+    def put(self, item):
+        """Hands a chunk over, waits while the buffer is full; returns False if the partition is no longer read."""
+        while not self.closed.is_set():
+            try:
+                self.chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def rows(self, deadline):
+        """Yields the solution mappings of the partition; no further chunks are awaited once the deadline passed."""
+        try:
+            while True:
+                try:
+                    item = self.chunks.get(timeout=_remaining_time(deadline))
+                except queue.Empty:
+                    return
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield from item
+        finally:
+            self.closed.set()
+
+
+def _deadline_passed(deadline):
+    """Checks whether the deadline (see time.monotonic) passed, False if there is no deadline."""
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def _remaining_time(deadline):
+    """Returns the seconds until the deadline (see time.monotonic), None if there is no deadline."""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+def _close(rows):
+    """Closes a stream of solution mappings that might not be consumed completely."""
+    close = getattr(rows, 'close', None)
+    if close is not None:
+        close()
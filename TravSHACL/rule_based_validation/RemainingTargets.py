@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+from TravSHACL.rule_based_validation.TermDictionary import TermDictionary
+
+
+class RemainingTargets:
+    """Pending targets, i.e., targets that are neither valid nor invalid yet, partitioned by the shape they belong to.
+       The targets are packed atoms (see TermDictionary) and the partitions are identified by the id of the shape's
+       predicate. Hence, the targets of a shape and their number are available without looking at the pending
+       targets of all other shapes."""
+
+    def __init__(self, terms: TermDictionary):
+        """
+        Creates a new empty set of pending targets.
+
+        :param terms: the term dictionary the targets are packed with
+        """
+        self.terms = terms
+        self.partitions = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, atom: int):
+        partition = self.partitions.get(self.terms.predicate_id(atom))
+        return partition is not None and atom in partition
+
+    def __iter__(self):
+        for partition in self.partitions.values():
+            yield from partition
+
+    def add(self, atom: int):
+        """Adds a pending target."""
+        pred_id = self.terms.predicate_id(atom)
+        partition = self.partitions.get(pred_id)
+        if partition is None:
+            partition = self.partitions[pred_id] = set()
+        if atom not in partition:
+            partition.add(atom)
+            self.size += 1
+
+    def update(self, atoms):
+        """Adds all the given pending targets."""
+        for atom in atoms:
+            self.add(atom)
+
+    def discard(self, atom: int):
+        """
+        Removes a target if it is pending.
+
+        :param atom: the packed target
+        :return: True if the target was pending, False otherwise
+        """
+        partition = self.partitions.get(self.terms.predicate_id(atom))
+        if partition is None or atom not in partition:
+            return False
+        partition.remove(atom)
+        self.size -= 1
+        return True
+
+    def of_shape(self, shape_name: str):
+        """
+        Returns the pending targets of a shape. The returned set must not be modified while iterating over it.
+
+        :param shape_name: name of the shape
+        :return: set with the packed targets
+        """
+        return self.partitions.get(self.terms.predicate_ids[shape_name], frozenset())
+
+    def count(self, shape_name: str):
+        """Returns the number of pending targets of a shape."""
+        partition = self.partitions.get(self.terms.predicate_ids[shape_name])
+        return 0 if partition is None else len(partition)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+
+class ShapeScheduler:
+    """Decides which of the upcoming shapes in the evaluation order can be processed concurrently with the
+       shape currently being evaluated. The shape network is turned into a DAG by directing each reference
+       from the shape evaluated earlier to the one evaluated later. A shape is independent as soon as all its
+       predecessors are evaluated, i.e., the queries of the shape do not change anymore. Only the queries of
+       independent shapes are sent in advance, the shapes themselves are still validated in the given order."""
+
+    def __init__(self, node_order: list, dependencies: dict, use_selective_queries: bool, workers: int = 4):
+        """
+        Creates a new scheduler for the given evaluation order.
+
+        :param node_order: the order in which the shapes are evaluated
+        :param dependencies: Python dictionary holding the names of the shapes referenced by each shape
+        :param use_selective_queries: indicates whether queries are filtered with the targets of evaluated shapes,
+            if not, the queries of all shapes are independent of each other
+        :param workers: maximum number of queries sent in advance at the same time; also the number of upcoming
+            shapes considered; default: 4
+        """
+        if workers <= 0:
+            raise ValueError('The number of workers needs to be positive.')
+        self.workers = workers
+        self.positions = {name: i for i, name in enumerate(node_order)}
+        self.predecessors = {name: set() for name in node_order}
+        if use_selective_queries:
+            for name in node_order:
+                self.predecessors[name] = {ref for ref in dependencies.get(name, [])
+                                           if self.positions.get(ref, len(node_order)) < self.positions[name]}
+        self.scheduled = set()
+
+    def ready_shapes(self, upcoming: list, evaluated: set):
+        """
+        Returns the upcoming shapes whose queries can be sent now. Each shape is returned only once.
+
+        :param upcoming: names of the shapes still to be evaluated, in evaluation order
+        :param evaluated: names of the shapes that were already evaluated
+        :return: list of shape names in evaluation order
+        """
+        ready = []
+        for name in upcoming[:self.workers]:
+            if name not in self.scheduled and self.predecessors.get(name, set()) <= evaluated:
+                self.scheduled.add(name)
+                ready.append(name)
+        return ready
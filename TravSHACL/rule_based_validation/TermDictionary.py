@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+
+class TermDictionary:
+    """Dictionary encoding of the atoms used during the validation. Each predicate and each term, i.e., the IRI or
+       literal an atom is about, is mapped to a small integer. An atom (predicate, term, sign) is packed into a single
+       integer: ((term * number of predicates) + predicate) * 2 + sign. Hence, the sets of atoms and the rules only
+       hold integers and each term is stored only once. The sign is the lowest bit, i.e., the negation of an atom is
+       obtained by flipping it."""
+
+    def __init__(self, predicates: list):
+        """
+        Creates a new term dictionary.
+
+        :param predicates: all predicates that may occur in an atom, i.e., the names of the shapes and their queries
+        """
+        self.predicates = list(dict.fromkeys(predicates))
+        self.predicate_ids = {pred: i for i, pred in enumerate(self.predicates)}
+        self.stride = 2 * len(self.predicates)
+        self.terms = []
+        self.term_ids = {}
+
+    def __len__(self):
+        return len(self.terms)
+
+    def term_id(self, term: str):
+        """Returns the integer of a term, the term is added to the dictionary if it is not yet known."""
+        id_ = self.term_ids.get(term)
+        if id_ is None:
+            id_ = self.term_ids[term] = len(self.terms)
+            self.terms.append(term)
+        return id_
+
+    def offset(self, predicate: str, sign: bool):
+        """
+        Returns the offset of a predicate and sign within the packed atom. An atom with this predicate and sign
+        about the term with the integer 't' is 't * stride + offset'.
+        """
+        return 2 * self.predicate_ids[predicate] + sign
+
+    def encode(self, atom: tuple):
+        """Packs the atom (predicate, term, sign) into an integer."""
+        return self.term_id(atom[1]) * self.stride + self.offset(atom[0], atom[2])
+
+    def decode(self, atom: int):
+        """Unpacks an atom into the tuple (predicate, term, sign)."""
+        term_id, offset = divmod(atom, self.stride)
+        return self.predicates[offset >> 1], self.terms[term_id], bool(offset & 1)
+
+    def predicate_id(self, atom: int):
+        """Returns the integer of the predicate of a packed atom."""
+        return (atom % self.stride) >> 1
+
+    def predicate(self, atom: int):
+        """Returns the predicate of a packed atom."""
+        return self.predicates[(atom % self.stride) >> 1]
+
+    def term(self, atom: int):
+        """Returns the term of a packed atom."""
+        return self.terms[atom // self.stride]
+
+    @staticmethod
+    def positive(atom: int):
+        """Returns the positive atom with the same predicate and term."""
+        return atom | 1
+
+    @staticmethod
+    def negative(atom: int):
+        """Returns the negative atom with the same predicate and term."""
+        return atom & ~1
+
+    @staticmethod
+    def negate(atom: int):
+        """Returns the negation of an atom."""
+        return atom ^ 1
+
+    @staticmethod
+    def sign(atom: int):
+        """Returns the sign of a packed atom."""
+        return bool(atom & 1)
@@ -1,19 +1,35 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Monica Figuera'
 
+import heapq
+import itertools
 import time
+from collections import namedtuple
 
 from TravSHACL.rule_based_validation.InstancesRetrieval import InstancesRetrieval
+from TravSHACL.rule_based_validation.RemainingTargets import RemainingTargets
+from TravSHACL.rule_based_validation.TermDictionary import TermDictionary
 from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
 from TravSHACL.utils import fileManagement
+from TravSHACL.utils.ReportWriter import ReportWriter
+from TravSHACL.utils.TraceRecorder import TraceRecorder
+from TravSHACL.utils.ValidationLog import ValidationLog
 from TravSHACL.utils.ValidationStats import ValidationStats
 
+# classification of a focus node as 'valid' or 'violated' for a shape, 'classified_by' is the name of the shape
+# being evaluated when the classification was found, None for targets that are valid after the validation finished
+ValidationEvent = namedtuple('ValidationEvent', ['shape', 'focus_node', 'result', 'classified_by'])
+
 
 class Validation:
     """This class is responsible for managing the validation process."""
 
     def __init__(self, endpoint: SPARQLEndpoint, node_order, shapes_dict, target_shape_predicates,
-                 use_selective_queries, output_dir_name, save_stats, save_targets_to_file):
+                 use_selective_queries, output_dir_name, save_stats, save_targets_to_file, query_workers=4,
+                 sparql_batch_size=100, query_partitioner=None, target_paginator=None, shape_scheduler=None,
+                 log_level='INFO', log_queries=True, trace_sampling=1, report_format='ttl', max_violations=0,
+                 stop_after_shape=None, deadline=None, on_event=None, collect_output=True, focus_nodes=None,
+                 known_targets=None):
         """
         Creates a new instance for the validation process.
 
@@ -25,6 +41,36 @@ class Validation:
         :param output_dir_name: path for the output files
         :param save_stats: indicates whether statistics will be saved to the output path
         :param save_targets_to_file: indicates whether target classifications will be saved to the output path
+        :param query_workers: maximum number of query partitions sent to the endpoint at the same time; default: 4
+        :param sparql_batch_size: maximum number of instances checked by one query of a SPARQL constraint; default: 100
+        :param query_partitioner: splits queries with a list of instances according to the maximum query size
+            of the endpoint, None uses the default maximum query size; default: None
+        :param target_paginator: retrieves the targets page by page, None uses a single query per target query;
+            default: None
+        :param shape_scheduler: ShapeScheduler deciding which queries of upcoming shapes are sent while the
+            current shape is evaluated, None evaluates the shapes strictly one after another; default: None
+        :param log_level: minimum level of the events recorded in the validation log, 'DEBUG', 'INFO', or 'OFF';
+            the log is only written if statistics are saved; default: 'INFO'
+        :param log_queries: indicates whether the validation log includes the query strings; default: True
+        :param trace_sampling: records the trace of every n-th target classification, 0 disables the traces;
+            the traces are only recorded if statistics are saved; default: 1
+        :param report_format: format of the validation report saved to the output path, one of 'ttl', 'nt',
+            'ndjson', or 'csv.gz'; default: 'ttl'
+        :param max_violations: the validation stops as soon as this number of violations is found,
+            0 validates all shapes; default: 0
+        :param stop_after_shape: name of a shape, the validation stops as soon as all its targets are classified;
+            default: None
+        :param deadline: point in time (see time.monotonic) after which no further queries are sent, the targets
+            are classified as far as possible with the answers obtained so far; None for no time limit; default: None
+        :param on_event: function called with a ValidationEvent for each target as soon as it is classified,
+            None disables the events; default: None
+        :param collect_output: indicates whether the classified targets are returned by exec(), if not, and
+            nothing is saved to the output path, exec() returns None; default: True
+        :param focus_nodes: Python dictionary mapping shape names to the IRIs of the focus nodes the shape is validated
+            for, the other shapes are validated for all their targets; default: None
+        :param known_targets: Python dictionary mapping shape names to a tuple with the IRIs of the valid and of the
+            violated targets that are known from a previous validation, e.g., the targets not among 'focus_nodes';
+            they are not classified again but the shapes referring to them rely on their classification; default: None
         """
         self.node_order = node_order
         self.shapes_dict = shapes_dict
@@ -35,30 +81,82 @@ class Validation:
         self.save_stats = save_stats
         self.save_targets_to_file = save_targets_to_file
         self.stats = ValidationStats()
-        self.traces = set()
-
-        self.stats.update_log('Node order: ' + str(self.node_order) + '\n')
-        self.InstRetrieval = InstancesRetrieval(endpoint, shapes_dict, self.stats)
+        self.log = ValidationLog(output_dir_name if save_stats else None, log_level, log_queries)
+        self.traces = TraceRecorder(trace_sampling if save_stats else 0)
+        self.report_writer = ReportWriter(report_format)
+        self.on_event = on_event
+        self.collect_output = collect_output
+        self.max_violations = max_violations
+        self.stop_after_shape = stop_after_shape
+        self.deadline = deadline
+        self.violations = 0
+        self.stop_reason = None  # set when the validation stops early, i.e., before all shapes are evaluated
+        self.unevaluated_shapes = []
+
+        self.log.info('node_order', shapes=self.node_order)
+        if focus_nodes is not None:
+            self.log.info('focus_nodes', shapes={name: len(nodes) for name, nodes in focus_nodes.items()})
+        self.scheduler = shape_scheduler
+        self.InstRetrieval = InstancesRetrieval(endpoint, shapes_dict, self.stats, query_workers,
+                                                sparql_batch_size, query_partitioner, target_paginator,
+                                                shape_scheduler.workers if shape_scheduler is not None else 0,
+                                                self.log, deadline, focus_nodes)
+        self.terms = TermDictionary([pred for shape in shapes_dict.values() for pred in shape.predicates])
+        self.known_targets = known_targets
         self.valid_targets_after_termination = set()
-        self.start_of_verification = time.time()
+        self.unclassified_targets = set()
 
     def exec(self):
         """Executes the validation process of the entire shape schema."""
-        focus_shape = self.shapes_dict[self.node_order.pop(0)]
-        state = ValidationState(self.shapes_dict)
-        initial_targets = self.retrieve_next_targets(state, focus_shape, state.shapes_state)
-        state.remaining_targets.update(initial_targets)
-        state.shapes_state[focus_shape.get_id()]['remaining_targets_count'] = len(initial_targets)
+        cache = self.InstRetrieval.endpoint.cache
+        cache_lookups = (cache.hits, cache.misses) if cache is not None else None
+
+        state = ValidationState(self.shapes_dict, self.terms)
+        if self.known_targets is not None:
+            self.infer_known_targets(state)
+        try:
+            try:
+                self.prefetch_queries(state, self.node_order)
+                focus_shape = self.shapes_dict[self.node_order.pop(0)]
+                initial_targets = self.retrieve_next_targets(state, focus_shape, state.shapes_state)
+                state.remaining_targets.update(initial_targets)
+
+                start = time.time() * 1000.0
+                self.validate(state, focus_shape)
+            finally:
+                # once the deadline passed, the queries still running are not awaited
+                self.InstRetrieval.close(wait=self.stop_reason != 'deadline')
+            finish = time.time() * 1000.0
+            elapsed = round(finish - start)
+            self.stats.record_total_time(elapsed)
+            self.stats.record_total_rules(state.total_rule_number)
+            if cache is not None:
+                self.stats.record_cache_lookups(cache.hits - cache_lookups[0], cache.misses - cache_lookups[1])
+            self.log.info('validation_finished', elapsed=elapsed, max_rules=self.stats.max_rules,
+                          total_rules=state.total_rule_number)
+            if self.stop_reason is not None:
+                self.unclassified_targets = set(state.remaining_targets)
+                self.unevaluated_shapes = [name for name in self.shapes_dict
+                                           if self.shapes_dict[name] not in state.visited_shapes]
+                self.log.info('validation_stopped', reason=self.stop_reason, violations=self.violations,
+                              unclassified_targets=len(self.unclassified_targets),
+                              unevaluated_shapes=self.unevaluated_shapes)
+            return self.validation_output(state.shapes_state)
+        finally:
+            self.log.close()
+
+    def infer_known_targets(self, state):
+        """
+        Adds the classifications of the known targets to the inferred atoms of their shapes, as if the targets were
+        classified during this validation.
 
-        start = time.time() * 1000.0
-        self.validate(state, focus_shape)
-        finish = time.time() * 1000.0
-        elapsed = round(finish - start)
-        self.stats.record_total_time(elapsed)
-        self.stats.record_total_rules(state.total_rule_number)
-        self.stats.update_log('\n\nMaximal number or rules in memory: ' + str(self.stats.max_rules))
-        self.stats.update_log('\nTotal number of rules: ' + str(state.total_rule_number))
-        return self.validation_output(state.shapes_state)
+        :param state: current validation state
+        """
+        encode = self.terms.encode
+        for shape_name, (valid, violated) in self.known_targets.items():
+            inferred = state.shapes_state[shape_name]['inferred']
+            inferred.update(encode((shape_name, node, True)) for node in valid)
+            inferred.update(encode((shape_name, node, True)) ^ 1 for node in violated)
 
     def validate(self, state, focus_shape):
         """
@@ -68,12 +166,25 @@ class Validation:
         :param focus_shape: focus shape to be evaluated
         """
         if len(state.visited_shapes) == len(self.shapes_dict) or focus_shape is None:
+            self.stop_reason = None  # all shapes are evaluated, hence, the result is complete
             self.valid_targets_after_termination.update(state.remaining_targets)
             return
+        self.check_deadline()
+        if self.stop_reason is not None:
+            return  # stopped while retrieving the targets, the focus shape is not evaluated
 
-        self.stats.update_log('\n\n>>>>> Starting validation of shape: ' + focus_shape.get_id())
-        state.evaluated_predicates.add(focus_shape.get_id())
+        self.log.info('shape_started', shape=focus_shape.get_id())
+        state.evaluated_predicates.add(self.terms.predicate_ids[focus_shape.get_id()])
         self.eval_shape(state, focus_shape, state.shapes_state)
+        self.InstRetrieval.discard_prefetched(focus_shape.get_id())
+        if self.stop_after_shape is not None and self.stop_reason is None and \
+                self.shapes_dict[self.stop_after_shape] in state.visited_shapes and \
+                state.remaining_targets.count(self.stop_after_shape) == 0:
+            self.stop_reason = 'stop_after_shape'
+        self.check_deadline()
+        if self.stop_reason is not None and len(state.visited_shapes) < len(self.shapes_dict):
+            return  # stopped early, the pending targets remain unclassified
+        self.prefetch_queries(state, self.node_order)
 
         next_focus_shape = None
         if len(self.node_order) > 0:
@@ -91,9 +202,10 @@ class Validation:
         :param state: current overall validation state
         :param next_focus_shape: the upcoming focus shape, i.e., the shape all possible targets need to be collected for
         :param shapes_state: dictionary storing validation's state of each shape
-        :return: all pending targets for the upcoming focus shape
+        :return: all pending targets for the upcoming focus shape as packed atoms; if the deadline passed meanwhile,
+            the targets retrieved so far, which are then left unclassified
         """
-        self.stats.update_log('\n\n>>>>>\nRetrieving (next) targets ...')
+        self.log.debug('retrieving_targets', shape=next_focus_shape.get_id())
         if next_focus_shape.get_target_query() is None:
             return set()
 
@@ -105,23 +217,29 @@ class Validation:
             # A query can filter its answers with (in)validated targets given by an evaluated out-neighboring shape
             pending, invalid = self.InstRetrieval.extract_targets_with_filter(next_focus_shape, filtering_shape)
             for target in invalid:
+                target = self.terms.encode(target)
                 self.register_target(target, 'violated', next_focus_shape_name, shapes_state)
-                shapes_state[next_focus_shape_name]['inferred'].add((target[0], target[1], not target[2]))
-                shapes_state[next_focus_shape_name]['remaining_targets_count'] -= 1
+                shapes_state[next_focus_shape_name]['inferred'].add(TermDictionary.negate(target))
         else:
             pending = self.InstRetrieval.extract_targets(next_focus_shape)
+        self.check_deadline()
+        if self.stop_reason is not None:
+            return {self.terms.encode(target) for target in pending}
 
         # checking for 'or' constraint
         if next_focus_shape.flag:
             invalid_pending = []
             pending_val = self.InstRetrieval.extract_options(next_focus_shape)
+            self.check_deadline()
+            if self.stop_reason is not None:
+                return {self.terms.encode(target) for target in pending}  # the options might be incomplete
             for target in pending:
                 if pending_val:
                     if target not in pending_val:
                         invalid_pending.append(target)
-                        self.register_target(target, "violated", next_focus_shape_name, shapes_state)
-                        shapes_state[next_focus_shape_name]['inferred'].add((target[0], target[1], not target[2]))
-                        shapes_state[next_focus_shape_name]['remaining_targets_count'] -= 1
+                        atom = self.terms.encode(target)
+                        self.register_target(atom, "violated", next_focus_shape_name, shapes_state)
+                        shapes_state[next_focus_shape_name]['inferred'].add(TermDictionary.negate(atom))
 
             pending = [target for target in pending if target not in invalid_pending]
 
@@ -132,17 +250,53 @@ class Validation:
                 violations = self.InstRetrieval.execute_sparql_constraint(
                     constraint_id=constraint.id,
                     query_str=constraint.query,
-                    instance_list=[p[1] for p in pending]
+                    instance_list=[p[1] for p in pending],
+                    batch_query=constraint.get_batch_query(),
+                    batch_var=constraint.batch_var
                 )
-                pending = {target for target in pending if target[1] not in violations}
+                violated = set(violations)
+                pending = {target for target in pending if target[1] not in violated}
                 for invalid in violations:
-                    target = (next_focus_shape_name, invalid, False)
+                    target = self.terms.encode((next_focus_shape_name, invalid, False))
                     self.register_target(target, 'violated', next_focus_shape_name, shapes_state)
-                    shapes_state[next_focus_shape_name]['inferred'].add((target[0], target[1], not target[2]))
-                    shapes_state[next_focus_shape_name]['remaining_targets_count'] -= 1
+                    shapes_state[next_focus_shape_name]['inferred'].add(TermDictionary.negate(target))
+
+        return {self.terms.encode(target) for target in pending}
+
+    def prefetch_queries(self, state, upcoming):
+        """
+        Sends the queries of the upcoming shapes that became independent of the shapes still to be evaluated.
+        The queries are determined with the current validation state. The shapes are still evaluated in order;
+        a prefetched answer is only used if the shape issues exactly the same query, hence, the result of the
+        validation is the same as without prefetching.
+
+        :param state: current overall validation state
+        :param upcoming: names of the shapes still to be evaluated, in evaluation order
+        """
+        if self.scheduler is None or self.InstRetrieval.prefetch_executor is None:
+            return
+
+        evaluated = {shape.get_id() for shape in state.visited_shapes}
+        for shape_name in self.scheduler.ready_shapes(upcoming, evaluated):
+            shape = self.shapes_dict[shape_name]
+            filtering_shape = None
+            if shape.get_target_query() is not None:
+                filtering_shape = self.get_evaluated_out_neighbor(shape, state.visited_shapes, state)
+                filtered_queries = None
+                if self.selectivity_enabled and filtering_shape is not None and \
+                        not shape.is_max_ref(filtering_shape.get_id()):
+                    filtered_queries = self.InstRetrieval.filtered_target_queries(shape, filtering_shape)
+                if filtered_queries is not None:
+                    self.InstRetrieval.prefetch(shape_name, filtered_queries[1], paginated=True)
+                else:
+                    self.InstRetrieval.prefetch(shape_name, [shape.get_target_query()], paginated=True)
+                if shape.flag and shape.get_or_query():
+                    self.InstRetrieval.prefetch(shape_name, [shape.get_or_query()], paginated=True)
 
-        shapes_state[next_focus_shape_name]['remaining_targets_count'] = len(pending)
-        return pending
+            for q, q_type in [(shape.minQuery, 'min')] + [(q, 'max') for q in shape.maxQueries]:
+                if q is not None:
+                    self.InstRetrieval.prefetch(shape_name, list(self.InstRetrieval.rewrite_constraint_query(
+                        shape, q, filtering_shape, q_type, self.selectivity_enabled)))
 
     @staticmethod
     def get_evaluated_out_neighbor(focus_shape, visited_shapes, state):
@@ -169,7 +323,7 @@ class Validation:
 
                 if (0 < len_val < best_val_threshold) or (0 < len_inv < best_inv_threshold):
                     if len_inv > 0 and prev_shape.get_target_query() is not None:
-                        if state.shapes_state[prev_shape_name]['remaining_targets_count'] == 0:
+                        if state.remaining_targets.count(prev_shape_name) == 0:
                             best_filtering_shape = prev_shape
 
         return best_filtering_shape
@@ -186,17 +340,25 @@ class Validation:
         shape_name = shape.get_id()
 
         self.eval_constraints_queries(state, shape, shapes_state[shape_name]['filtering_shape'])  # interleave
+        if self.stop_reason is not None:
+            # the answers of the shape's queries are incomplete, hence, atoms of the shape must not be negated just
+            # because they were not inferred; the final saturation only classifies what follows from the answers
+            predicates = [shape_name] + [q.get_rule_pattern().head[0] for q in [shape.minQuery] + shape.maxQueries
+                                         if q is not None]
+            state.evaluated_predicates.difference_update(self.terms.predicate_ids[pred] for pred in predicates)
+            self.saturate_remaining(state, shape_name, shapes_state, shape_evaluated=False)
+            self.log.info('shape_interrupted', shape=shape_name, remaining_targets=len(state.remaining_targets))
+            return
 
-        self.stats.update_log('\nStarting saturation ...')
         start = time.time() * 1000.0
         self.saturate_remaining(state, shape_name, shapes_state)
         end = time.time() * 1000.0
 
         self.stats.record_saturation_time(end - start)
-        self.stats.update_log('\nsaturation ...\nelapsed: ' + str(end - start) + ' ms')
 
         state.visited_shapes.add(shape)
-        self.stats.update_log('\nRemaining targets: ' + str(len(state.remaining_targets)))
+        self.log.info('shape_finished', shape=shape_name, saturation_time=end - start,
+                      remaining_targets=len(state.remaining_targets))
 
     def eval_constraints_queries(self, state, shape, filtering_shape):
         """
@@ -211,47 +373,37 @@ class Validation:
         shape_name = shape.get_id()
         shapes_state = state.shapes_state
         remaining_targets = state.remaining_targets
+        terms = self.terms
 
         if shape.minQuery is None and not shape.maxQueries:  # current shape is a shape without constraints
-            to_remove = []
-            for head in remaining_targets:
-                if head[0] == shape_name:
-                    self.register_target(head, 'valid', shape_name, shapes_state)
-                    to_remove.append(head)
-                    shapes_state[shape_name]['remaining_targets_count'] -= 1
-                    shapes_state[shape_name]['inferred'].add(head)
-            for head in to_remove:
+            for head in list(remaining_targets.of_shape(shape_name)):
+                self.register_target(head, 'valid', shape_name, shapes_state)
                 remaining_targets.discard(head)
+                shapes_state[shape_name]['inferred'].add(head)
 
         if shape.minQuery is not None:
             min_query_rp = shape.minQuery.get_rule_pattern()
             self.interleave(state, shape, shape.minQuery, filtering_shape, min_query_rp, shape_rp, 'min')
 
         for q in shape.maxQueries:
+            self.check_deadline()
+            if self.stop_reason is not None:
+                return
             max_query_rp = q.get_rule_pattern()
             self.interleave(state, shape, q, filtering_shape, max_query_rp, shape_rp, 'max')
+            if self.stop_reason is not None:
+                return
             # after running the max constraints, rules need to be added for the instances that were not
             # in the query result since they will still be valid and may need to be checked further
-            for head in remaining_targets:
-                if head[0] == shape_name:
-                    body = set()
-                    for i, atom_pattern in enumerate(shape_rp.body):
-                        a = (atom_pattern[0], head[1], atom_pattern[2])
-                        body.add(a)
-
-                    s_head = (shape_name, head[1], True)
-
-                    if s_head not in state.rule_map.keys():
-                        s = set()
-                        s.add(frozenset(body))
-                        state.rule_map[s_head] = s
-                        state.rule_number += 1
-                        state.total_rule_number += 1
-                    else:
-                        if frozenset(body) not in state.rule_map[s_head]:
-                            state.rule_number += 1
-                            state.total_rule_number += 1
-                        state.rule_map[s_head].add(frozenset(body))
+            body_offsets = [terms.offset(atom_pattern[0], atom_pattern[2]) for atom_pattern in shape_rp.body]
+            for head in remaining_targets.of_shape(shape_name):
+                term_offset = head // terms.stride * terms.stride
+                body = frozenset(term_offset + offset for offset in body_offsets)
+                s_head = TermDictionary.positive(head)
+
+                if state.add_rule(s_head, body):
+                    state.rule_number += 1
+                    state.total_rule_number += 1
 
     def interleave(self, state, shape, q, filtering_shape, q_rule_pattern, s_rule_pattern, q_type):
         """
@@ -261,7 +413,8 @@ class Validation:
         (possibly) partitioned when the number of filtering instances exceeds a given threshold.
 
         Each grounded rule is composed of literals (an atom or its negation).
-        Each atom 'a' is a tuple with 3 fields: a[0] - predicate, a[1] - instance (entity), a[2] - sign (True or False)
+        Each atom 'a' consists of a predicate, an instance (entity), and a sign (True or False); it is packed into
+        an integer with the term dictionary, see TermDictionary.
 
         :param state: current state of the validation
         :param shape: focus shape
@@ -273,6 +426,10 @@ class Validation:
         """
         shapes_state = state.shapes_state
         preds_to_shapes = state.preds_to_shapes
+        evaluated_predicates = state.evaluated_predicates
+        terms = self.terms
+        term_id = terms.term_id
+        stride = terms.stride
         shape_name = shape.get_id()
         t_state = shapes_state[shape_name]  # focus shape's state
 
@@ -281,6 +438,12 @@ class Validation:
         shape_rp_head = s_rule_pattern.head
         shape_rp_body = s_rule_pattern.body
 
+        # atoms of a pattern are obtained by adding the offset of its predicate and sign to the offset of the term
+        q_head_offset = terms.offset(query_rp_head[0], query_rp_head[2])
+        s_head_offset = terms.offset(shape_rp_head[0], shape_rp_head[2])
+        q_body_offsets = [terms.offset(pattern[0], pattern[2]) for pattern in query_rp_body]
+        s_body_offsets = [terms.offset(pattern[0], pattern[2]) for pattern in shape_rp_body]
+        q_body_pred_ids = [terms.predicate_ids[pattern[0]] for pattern in query_rp_body]
         q_body_ref_shapes = [preds_to_shapes[pattern[0]] for pattern in query_rp_body]
         s_body_ref_shapes = [preds_to_shapes[pattern[0]] for pattern in shape_rp_body]
         shape_max_refs = shape.get_max_query_valid_refs()
@@ -288,24 +451,35 @@ class Validation:
         new_rules_count = 0
         rules_directly_inferred = 0
 
-        for query_str in self.InstRetrieval.rewrite_constraint_query(shape, q, filtering_shape, q_type, self.selectivity_enabled):
-            start = time.time() * 1000.0
-            for b in self.InstRetrieval.run_constraint_query(q, query_str):
-                q_head = (query_rp_head[0], b[query_rp_head[1]]['value'], query_rp_head[2])
-                s_head = (shape_rp_head[0], b[shape_rp_head[1]]['value'], shape_rp_head[2])
+        partitions = self.InstRetrieval.run_constraint_queries(
+            q, self.InstRetrieval.rewrite_constraint_query(shape, q, filtering_shape, q_type, self.selectivity_enabled)
+        )
+        start = time.time() * 1000.0
+        for variables, rows in partitions:  # partitions are grounded in the order their answers arrive
+            self.check_deadline()
+            if self.stop_reason is not None:
+                break  # no further answers are needed
+            var_index = {var: i for i, var in enumerate(variables)}
+            q_head_index = var_index[query_rp_head[1]]
+            s_head_index = var_index[shape_rp_head[1]]
+            q_body_indices = [var_index[atom_pattern[1]] for atom_pattern in query_rp_body]
+            s_body_indices = [var_index[atom_pattern[1]] for atom_pattern in shape_rp_body]
+            for b in rows:
+                q_head = term_id(b[q_head_index]) * stride + q_head_offset
+                s_head = term_id(b[s_head_index]) * stride + s_head_offset
 
                 body = set()
                 is_body_inferred = True
                 is_body_inferrable = True
                 negated_body = False
-                for i, atom_pattern in enumerate(query_rp_body):
+                for i in range(len(query_rp_body)):
                     a_state = shapes_state[q_body_ref_shapes[i]]  # body atom's shape state
-                    a = (atom_pattern[0], b[atom_pattern[1]]['value'], atom_pattern[2])
+                    a = term_id(b[q_body_indices[i]]) * stride + q_body_offsets[i]
                     body.add(a)
-                    if a[0] in state.evaluated_predicates:  # exclude not yet evaluated atom's query
-                        if state.rule_map.get((a[0], a[1], True)) is None:
+                    if q_body_pred_ids[i] in evaluated_predicates:  # exclude not yet evaluated atom's query
+                        if state.rule_map.get(a | 1) is None:
                             if a not in a_state['inferred']:
-                                if (a[0], a[1], not a[2]) not in a_state['inferred']:
+                                if a ^ 1 not in a_state['inferred']:
                                     is_body_inferred = False
                                     continue  # exclude non-selective answers from interleaving
                                 else:
@@ -328,25 +502,19 @@ class Validation:
 
                 if negated_body:
                     # case (2) - infer negation of rule head (given negated body atom)
-                    t_state['inferred'].add((q_head[0], q_head[1], False))
-                    if s_head[2] and s_head in state.remaining_targets:
+                    t_state['inferred'].add(q_head & ~1)
+                    if s_head & 1 and s_head in state.remaining_targets:
                         self.register_target(s_head, 'violated', shape_name, shapes_state)
                         state.remaining_targets.discard(s_head)
-                        t_state['remaining_targets_count'] -= 1
+                        if self.stop_reason is not None:
+                            break
                     continue
 
                 # case (3) - add pending rule / infer query head
                 if not is_body_inferred:
                     if is_body_inferrable:
-                        if q_head not in state.rule_map.keys():
-                            s = set()
-                            s.add(frozenset(body))
-                            state.rule_map[q_head] = s
+                        if state.add_rule(q_head, frozenset(body)):
                             new_rules_count += 1
-                        else:
-                            if frozenset(body) not in state.rule_map[q_head]:
-                                new_rules_count += 1
-                                state.rule_map[q_head].add(frozenset(body))
                 else:
                     t_state['inferred'].add(q_head)
                     rules_directly_inferred += 1
@@ -355,17 +523,17 @@ class Validation:
                 body = set()
                 is_body_inferred = True
                 negated_body = False
-                for i, atom_pattern in enumerate(shape_rp_body):
+                for i in range(len(shape_rp_body)):
                     a_state = shapes_state[s_body_ref_shapes[i]]
-                    a = (atom_pattern[0], b[atom_pattern[1]]['value'], atom_pattern[2])
+                    a = term_id(b[s_body_indices[i]]) * stride + s_body_offsets[i]
                     body.add(a)
                     if a not in a_state['inferred']:
-                        if (a[0], a[1], not a[2]) not in a_state['inferred']:
+                        if a ^ 1 not in a_state['inferred']:
                             is_body_inferred = False
                             continue  # non-selective (when retrieved objects of a triple that do not match any target)
 
                         # case (1) - if negated (unmatchable) body atoms
-                        elif (a[0], a[1], not a[2]) in a_state['inferred']:
+                        elif a ^ 1 in a_state['inferred']:
                             negated_body = True
                             break
                         else:
@@ -373,24 +541,18 @@ class Validation:
 
                 if negated_body:
                     # case (2) - infer negation of rule head (negated body atom)
-                    t_state['inferred'].add((s_head[0], s_head[1], False))
-                    if s_head[2] and s_head in state.remaining_targets:
+                    t_state['inferred'].add(s_head & ~1)
+                    if s_head & 1 and s_head in state.remaining_targets:
                         self.register_target(s_head, 'violated', shape_name, shapes_state)
                         state.remaining_targets.discard(s_head)
-                        t_state['remaining_targets_count'] -= 1
+                        if self.stop_reason is not None:
+                            break
                     continue
 
                 # case (3) - add pending rule / classify valid target (all body inferred)
                 if not is_body_inferred:
-                    if s_head not in state.rule_map.keys():
-                        s = set()
-                        s.add(frozenset(body))
-                        state.rule_map[s_head] = s
+                    if state.add_rule(s_head, frozenset(body)):
                         new_rules_count += 1
-                    else:
-                        if frozenset(body) not in state.rule_map[s_head]:
-                            new_rules_count += 1
-                            state.rule_map[s_head].add(frozenset(body))
                 else:
                     if s_head not in t_state['inferred']:
                         t_state['inferred'].add(s_head)
@@ -400,77 +562,116 @@ class Validation:
 
                         self.register_target(s_head, 'valid', shape_name, shapes_state)
                         state.remaining_targets.discard(s_head)
-                        t_state['remaining_targets_count'] -= 1
                     rules_directly_inferred += 1
 
-            self.stats.update_log('\nGrounded rules. \n')
             end = time.time()*1000.0
+            self.log.debug('partition_grounded', id=q.get_id(), elapsed=end - start)
             self.stats.record_interleaving_time(end - start)
-            state.evaluated_predicates.add(query_rp_head[0])
+            start = end
+            evaluated_predicates.add(terms.predicate_ids[query_rp_head[0]])
+        self.check_deadline()  # the answers of the remaining partitions are missing if the deadline passed
 
         all_current_rules = new_rules_count + rules_directly_inferred
         state.rule_number += new_rules_count
         state.total_rule_number += all_current_rules
-        self.stats.update_log('\n\nNumber of rules: ' + str(all_current_rules))
+        self.log.info('rules_grounded', id=q.get_id(), rules=all_current_rules, pending_rules=new_rules_count)
         self.stats.record_current_number_of_rules(all_current_rules)
 
-    def saturate_remaining(self, state, shape_name, shapes_state):
+    def saturate_remaining(self, state, shape_name, shapes_state, shape_evaluated=True):
         """
         The saturation process consists of two steps:
         1. Negate: same as in step (1) of interleaving process
         2. Infer: same is step (2) of interleaving process
         Repeat 1 and 2 until no further changes are made (i.e., no new inferences found)
 
+        The first round considers all atoms and rules. Afterwards, only the rules with a body atom whose truth value
+        changed are applied again; they are found via the index of the body atoms (see ValidationState).
+
         :param state: current state of the validation
         :param shape_name: name of focus shape or its 'parents' (after recursion)
         :param shapes_state: dictionary storing validation's state of each shape
+        :param shape_evaluated: indicates whether all queries of the focus shape were evaluated, otherwise, its pending
+            targets without a rule are not negated; default: True
         """
         rule_map = state.rule_map
-        negated = self.negate_unmatchable_heads(state, rule_map, state.evaluated_predicates, shape_name, shapes_state, state.preds_to_shapes)
-        inferred = self.apply_rules(state, state.remaining_targets, rule_map, shape_name, shapes_state, state.preds_to_shapes)
-        if negated or inferred:
-            self.saturate_remaining(state, shape_name, shapes_state)
-
-    def negate_unmatchable_heads(self, state, rule_map, evaluated_predicates, shape_name, shapes_state, preds_to_shapes):
+        self.negate_unmatchable_heads(state, rule_map, state.evaluated_predicates, shape_name, shapes_state,
+                                      state.preds_to_shapes, shape_evaluated)
+        worklist = None  # the first round applies all rules
+        while worklist is None or worklist:
+            dropped_heads, worklist = self.apply_rules(state, state.remaining_targets, rule_map, shape_name,
+                                                       shapes_state, state.preds_to_shapes, worklist)
+            worklist.update(self.negate_dropped_heads(state, dropped_heads))
+
+    def negate_unmatchable_heads(self, state, rule_map, evaluated_predicates, shape_name, shapes_state, preds_to_shapes,
+                                 shape_evaluated=True):
         """
         Derives negation of atoms that are not satisfied. An atom 'a' is not satisfied when:
         its query (predicate) was already evaluated, positive 'a' is not a rule head, and 'a' is not inferred yet.
 
         :param state: current state of the validation
         :param rule_map: set of pending rules associated to either focus shape or an incoming neighbor after recursion
-        :param evaluated_predicates: target/min/max query predicates evaluated so far
+        :param evaluated_predicates: ids of the target/min/max query predicates evaluated so far
         :param shape_name: string name of the focus shape
         :param shapes_state: dictionary storing validation's state of each shape
         :param preds_to_shapes: dictionary that maps predicate names to shape names
+        :param shape_evaluated: indicates whether all queries of the focus shape were evaluated, otherwise, its pending
+            targets without a rule are not negated; default: True
         :return: True if new negative inferences were found, False otherwise
         """
+        predicate_id = self.terms.predicate_id
+        pred_states = state.pred_states
         new_negated_atom_found = False
-        all_body_atoms = set(frozenset().union(*set().union(*rule_map.values())))
-        for a in all_body_atoms:
-            a_state = shapes_state[preds_to_shapes[a[0]]]  # atom's shape state (gets shape id from the constraint id)
-            if a[0] in evaluated_predicates \
-                    and rule_map.get((a[0], a[1], True)) is None \
+        for a in state.body_index:  # all atoms occurring in the bodies of the pending rules
+            pred_id = predicate_id(a)
+            a_state = pred_states[pred_id]  # atom's shape state (gets shape id from the constraint id)
+            if pred_id in evaluated_predicates \
+                    and rule_map.get(a | 1) is None \
                     and a not in a_state['inferred']:  # if atom 'a' is not satisfied
-                negated_atom = (a[0], a[1], False)
+                negated_atom = a & ~1
                 if negated_atom not in a_state['inferred']:
                     new_negated_atom_found = True
                     a_state['inferred'].add(negated_atom)
 
-        remaining = set()
-        for a in state.remaining_targets:
-            t_state = shapes_state[a[0]]  # target's shape state
-            if a[0] in evaluated_predicates \
-                    and rule_map.get((a[0], a[1], True)) is None \
-                    and a not in t_state['inferred']:  # if atom 'a' is not satisfied
-                self.register_target(a, 'violated', shape_name, shapes_state)
-                t_state['inferred'].add((a[0], a[1], not a[2]))
-                t_state['remaining_targets_count'] -= 1
-            else:
-                remaining.add(a)
-        state.remaining_targets = remaining
+        # the pending targets of the shapes evaluated before all have a rule since their saturation, and the rules
+        # are only dropped when the target is classified, hence, only the targets of the focus shape need a check
+        if not shape_evaluated:
+            return new_negated_atom_found
+        t_state = shapes_state[shape_name]
+        unsatisfied = [a for a in state.remaining_targets.of_shape(shape_name)
+                       if rule_map.get(a | 1) is None and a not in t_state['inferred']]
+        for a in unsatisfied:
+            self.register_target(a, 'violated', shape_name, shapes_state)
+            t_state['inferred'].add(a ^ 1)
+            state.remaining_targets.discard(a)
         return new_negated_atom_found
 
-    def apply_rules(self, state, remaining_targets, rule_map, shape_name, shapes_state, preds_to_shapes):
+    def negate_dropped_heads(self, state, dropped_heads):
+        """
+        Step (1) of the saturation restricted to the heads of the rules dropped in the last round. Since the atoms
+        were checked before, an atom can only become unsatisfied if the rules for its positive atom were dropped.
+        The remaining targets do not need to be checked again, they are classified when their rules are dropped.
+
+        :param state: current state of the validation
+        :param dropped_heads: heads of the rules dropped in the last round
+        :return: heads of the rules with a body atom whose truth value changed
+        """
+        predicate_id = self.terms.predicate_id
+        body_index = state.body_index
+        changed_heads = set()
+        for head in dropped_heads:
+            pred_id = predicate_id(head)
+            if pred_id not in state.evaluated_predicates:
+                continue
+            inferred = state.pred_states[pred_id]['inferred']
+            negated_atom = head & ~1
+            if negated_atom not in inferred and \
+                    (negated_atom in body_index or (head | 1 in body_index and head | 1 not in inferred)):
+                inferred.add(negated_atom)
+                changed_heads.update(state.heads_of(negated_atom))
+                changed_heads.update(state.heads_of(head | 1))
+        return changed_heads
+
+    def apply_rules(self, state, remaining_targets, rule_map, shape_name, shapes_state, preds_to_shapes, heads):
         """
         Performs two types of inferences:
         # case (1): If the rule map contains a rule and some rule bodies were inferred
@@ -478,22 +679,42 @@ class Validation:
         # case (2): If the negation of any rule body was inferred
                     => the rule cannot be applied (rule head not inferred), rule dropped.
 
+        The rules are applied in the order they were added to the rule map. An inference affects the rules with the
+        inferred atom or its negation in the body; these are applied later in the same round if they were added after
+        the current rule, otherwise they are returned for the next round.
+
         :param state: current state of the validation
         :param remaining_targets: pending targets, i.e., targets that are neither valid nor invalid yet
         :param rule_map: set of pending rules associated to either focus shape or an incoming neighbor after recursion
         :param shape_name: name of the current focus shape
         :param shapes_state: dictionary storing validation's state of each shape
         :param preds_to_shapes: dictionary that maps predicate names to shape names
-        :return: True if new inferences were found, False otherwise
+        :param heads: heads of the rules to apply, None applies all rules; default: None
+        :return: tuple with the heads of the dropped rules and the heads of the rules to apply in the next round
         """
-        fresh_literals = False
-        rule_map_copy = rule_map.copy()
-        for head, bodies in rule_map_copy.items():
-            head_shape_name = preds_to_shapes[head[0]]
+        predicate_id = self.terms.predicate_id
+        pred_states = state.pred_states
+        rule_order = state.rule_order
+        if heads is None:  # the rule map keeps the rules in the order they were added, later ones are applied anyway
+            queue = None
+            ordered_heads = list(rule_map)
+        else:
+            queue = [(rule_order[head], head) for head in heads if head in rule_map]
+            heapq.heapify(queue)
+            queued = {head for _, head in queue}
+            ordered_heads = self.__pop_in_order(queue, queued)
+        next_round = set()
+        dropped_heads = []
+        for head in ordered_heads:
+            bodies = rule_map.get(head)
+            if bodies is None:  # dropped earlier in this round
+                continue
+            position = rule_order[head]
+            head_state = pred_states[predicate_id(head)]
             inferred_bodies = set()
             for body in bodies:
-                inferred_atoms = {'F_atom' if (a[0], a[1], not a[2]) in shapes_state[preds_to_shapes[a[0]]]['inferred']
-                                  else ('T_atom' if a in shapes_state[preds_to_shapes[a[0]]]['inferred']
+                inferred_atoms = {'F_atom' if a ^ 1 in pred_states[predicate_id(a)]['inferred']
+                                  else ('T_atom' if a in pred_states[predicate_id(a)]['inferred']
                                         else 'P_atom') for a in body}
                 if 'T_atom' in inferred_atoms and len(inferred_atoms) == 1:
                     inferred_bodies.add('T')
@@ -503,54 +724,76 @@ class Validation:
                     inferred_bodies.add('P')
 
             if 'T' in inferred_bodies:  # case (1)
-                fresh_literals = True
                 if head in remaining_targets:
                     self.register_target(head, 'valid', shape_name, shapes_state)
                     remaining_targets.discard(head)
-                    shapes_state[head_shape_name]['remaining_targets_count'] -= 1
-                shapes_state[head_shape_name]['inferred'].add(head)
-                del rule_map[head]
-                state.rule_number -= len(bodies)
+                head_state['inferred'].add(head)
             elif 'F' in inferred_bodies and 'P' not in inferred_bodies:  # case (2)
-                fresh_literals = True
                 if head in remaining_targets:
                     self.register_target(head, 'violated', shape_name, shapes_state)
                     remaining_targets.discard(head)
-                    shapes_state[head_shape_name]['remaining_targets_count'] -= 1
-                shapes_state[head_shape_name]['inferred'].add((head[0], head[1], not head[2]))
-                del rule_map[head]
-                state.rule_number -= len(bodies)
+                head_state['inferred'].add(head ^ 1)
+            else:
+                continue
+
+            state.drop_rule(head)
+            state.rule_number -= len(bodies)
+            dropped_heads.append(head)
+            for affected_head in itertools.chain(state.heads_of(head), state.heads_of(head ^ 1)):
+                if rule_order[affected_head] > position:
+                    if queue is not None and affected_head not in queued:
+                        queued.add(affected_head)
+                        heapq.heappush(queue, (rule_order[affected_head], affected_head))
+                else:
+                    next_round.add(affected_head)
 
-        if not fresh_literals:
-            return False
-        self.stats.update_log('\nRemaining targets: ' + str(len(remaining_targets)))
-        return True
+        if dropped_heads:
+            self.log.debug('saturation_round', shape=shape_name, dropped_rules=len(dropped_heads),
+                           remaining_targets=len(remaining_targets))
+        return dropped_heads, next_round
+
+    @staticmethod
+    def __pop_in_order(queue, queued):
+        """Yields the heads of a heap ordered by the position of the rules, heads pushed meanwhile included."""
+        while queue:
+            _, head = heapq.heappop(queue)
+            queued.discard(head)
+            yield head
+
+    def check_deadline(self):
+        """Stops the validation if the deadline passed."""
+        if self.deadline is not None and self.stop_reason is None and time.monotonic() >= self.deadline:
+            self.stop_reason = 'deadline'
 
     def register_target(self, t, t_type, invalidating_shape_name, shapes_state):
         """
-        Adds each target to the set of valid/invalid instances of a shape.
+        Adds each target to the set of valid/invalid instances of a shape and passes the classification to
+        'on_event' if set.
 
-        :param t: target tuple: t[0] - predicate (string), t[1] - instance (string), t[2] - sign (boolean)
+        :param t: target as packed atom, i.e., predicate (shape name), instance, and sign
         :param t_type: string value that tells whether 't' is a valid target ('valid') or a 'violated' one
         :param invalidating_shape_name: string name of the shape that (in)validates target 't'
         :param shapes_state: dictionary storing validation's state of each shape
         """
-        instance = '<' + t[1] + '>'
-        self.shapes_dict[t[0]].targets[t_type].add(instance)
+        term = self.terms.term(t)
+        shape_name = self.terms.predicate(t)
+        self.shapes_dict[shape_name].targets[t_type].add('<' + term + '>')
         shapes_state[invalidating_shape_name]['registered_targets'][t_type].add(t)
-        self.traces.add(''.join([invalidating_shape_name, ',', t_type, ',',
-                        str(len(self.traces) + 1), ',',
-                        str(time.time() - self.start_of_verification), '\n']))
+        self.traces.record(invalidating_shape_name, t_type)
+        if t_type == 'violated':
+            self.violations += 1
+            if self.violations == self.max_violations:
+                self.stop_reason = 'max_violations'
+        if self.on_event is not None:
+            self.on_event(ValidationEvent(shape_name, term, t_type, invalidating_shape_name))
 
     @staticmethod
     def write_targets_to_file(output_dir_name, all_valid_targets, all_invalid_targets):
         """Writes all target classifications to file, i.e., one file for valid targets and one for invalid ones."""
         def write_list_to_file(list_, file_):
             """Helper function to write a list to file."""
-            for elem in list_:
-                lit_sign_str = '' if elem[2] else '!'
-                lit_str = lit_sign_str + elem[0] + '(' + elem[1] + ')'  # get string representation of tuple
-                file_.write(lit_str + ',\n')
+            fileManagement.write_lines(file_, (''.join(['' if elem[2] else '!', elem[0], '(', elem[1], '),\n'])
+                                               for elem in list_))  # string representation of the tuples
 
         valid_targets_file = fileManagement.open_file(output_dir_name, 'targets_valid.log')
         write_list_to_file(all_valid_targets, valid_targets_file)
@@ -567,76 +810,74 @@ class Validation:
         :param shapes_state: dictionary storing validation's state of each shape
         :return: dictionary containing shape names and their respective (in)validated targets
         """
+        if self.on_event is not None:
+            for t in self.valid_targets_after_termination:
+                self.on_event(ValidationEvent(self.terms.predicate(t), self.terms.term(t), 'valid', None))
+        if not (self.collect_output or self.save_stats or self.save_targets_to_file):
+            return None
+
         output = {}
         all_valid_targets = set()
         all_invalid_targets = set()
+        decode = self.terms.decode
         for shape_name in self.shapes_dict.keys():
-            validated_targets = shapes_state[shape_name]['registered_targets']['valid']
-            invalidated_targets = shapes_state[shape_name]['registered_targets']['violated']
+            validated_targets = {decode(t) for t in shapes_state[shape_name]['registered_targets']['valid']}
+            invalidated_targets = {decode(t) for t in shapes_state[shape_name]['registered_targets']['violated']}
             output[shape_name] = {
                 'valid_instances': validated_targets,
                 'invalid_instances': invalidated_targets,
             }
             all_valid_targets.update(validated_targets)
             all_invalid_targets.update(invalidated_targets)
-        all_valid_targets.update(self.valid_targets_after_termination)
+        valid_targets_after_termination = {decode(t) for t in self.valid_targets_after_termination}
+        all_valid_targets.update(valid_targets_after_termination)
 
         if self.save_targets_to_file:
             self.write_targets_to_file(self.output_dir_name, all_valid_targets, all_invalid_targets)
 
+        self.log.info('targets_classified', valid=len(all_valid_targets), invalid=len(all_invalid_targets))
         if self.save_stats:
-            validation_log = fileManagement.open_file(self.output_dir_name, 'validation.log')
             stats = fileManagement.open_file(self.output_dir_name, 'stats.txt')
-            traces = fileManagement.open_file(self.output_dir_name, 'traces.csv')
 
             self.stats.record_number_of_targets(len(all_valid_targets), len(all_invalid_targets))
             self.stats.write_all_stats(stats)
             fileManagement.close_file(stats)
 
-            self.stats.write_validation_log(validation_log)
-            validation_log.write('\nValid targets: ' + str(len(all_valid_targets)))
-            validation_log.write('\nInvalid targets: ' + str(len(all_invalid_targets)))
-            fileManagement.close_file(validation_log)
-
-            traces.write('Shape,Result,Number,Time\n')
-            for trace in self.traces:
-                traces.write(trace)
-            fileManagement.close_file(traces)
+            if self.traces.sampling > 0:
+                traces = fileManagement.open_file(self.output_dir_name, 'traces.csv')
+                self.traces.write(traces)
+                fileManagement.close_file(traces)
 
         # add to output all targets that could not be (in)validated by any shape
-        output["unbound"] = {'valid_instances': self.valid_targets_after_termination}
+        output["unbound"] = {'valid_instances': valid_targets_after_termination}
+        if self.stop_reason is not None:
+            # targets retrieved but not classified before the validation stopped; the targets of the unevaluated
+            # shapes were not even retrieved
+            output['unclassified'] = {
+                'pending_instances': {decode(t) for t in self.unclassified_targets},
+                'unevaluated_shapes': set(self.unevaluated_shapes)
+            }
 
-        # TTL validation report
+        # validation report
         if self.save_stats:
-            if len(all_invalid_targets) == 0:
-                output_ttl = ':report a sh:ValidationReport ;\n' + '  sh:conforms true '
-            else:
-                output_ttl = ':report a sh:ValidationReport ;\n' + '  sh:conforms false ;\n' + '  sh:result'
-                for i, violation in enumerate(all_invalid_targets):
-                    if i != 0:
-                        output_ttl += ' ,'
-                    output_ttl += '\n    [ a  sh:ValidationResult ;\n' +\
-                                  '      sh:resultSeverity  sh:Violation ;\n' +\
-                                  '      sh:focusNode  <' + violation[1] + '> ;\n' +\
-                                  '      sh:sourceShape  ' + violation[0] + ' ]'
-
-            output_ttl = '@prefix sh: <http://www.w3.org/ns/shacl#> . \n\n' + output_ttl + ' .'            
-            validation_report = fileManagement.open_file(self.output_dir_name, 'validationReport.ttl')
-            validation_report.write(output_ttl)
-            fileManagement.close_file(validation_report)
+            self.report_writer.write(self.output_dir_name, (violation[:2] for violation in all_invalid_targets))
         return output
 
 
 class ValidationState:
-    """This class is responsible for keeping track of the validation state."""
+    """This class is responsible for keeping track of the validation state.
+       All atoms, i.e., targets, inferred literals, and rules, are packed into integers with the term dictionary."""
 
-    def __init__(self, shapes_dict):
-        self.remaining_targets = set()
+    def __init__(self, shapes_dict, terms):
+        self.remaining_targets = RemainingTargets(terms)  # pending targets partitioned by shape
         self.visited_shapes = set()
-        self.evaluated_predicates = set()
+        self.evaluated_predicates = set()  # ids of the predicates in the term dictionary
         self.shapes_state = {}
         self.preds_to_shapes = {}  # maps all constraint ids to their respective shape ids
         self.rule_map = {}
+        self.rule_order = {}  # position of each head in the rule map, i.e., the order in which the rules were added
+        self.rule_counter = itertools.count()
+        self.body_index = {}  # maps each atom occurring in a rule body to the heads of these rules, see heads_of()
         self.rule_number = 0
         self.total_rule_number = 0
 
@@ -644,8 +885,69 @@ class ValidationState:
             self.shapes_state[shape_name] = {
                 'filtering_shape': None,
                 'inferred': set(),
-                'remaining_targets_count': 0,
                 'registered_targets': {'valid': set(), 'violated': set()}
             }
             for pred in shapes_dict[shape_name].predicates:
                 self.preds_to_shapes[pred] = shape_name
+        # state of the shape each predicate belongs to, indexed by the ids of the predicates in the term dictionary
+        self.pred_states = [self.shapes_state[self.preds_to_shapes[pred]] for pred in terms.predicates]
+
+    def add_rule(self, head, body):
+        """
+        Adds a rule to the rule map and its body atoms to the index.
+
+        :param head: head of the rule
+        :param body: frozenset with the atoms of the rule body
+        :return: True if the rule is new, False otherwise
+        """
+        bodies = self.rule_map.get(head)
+        if bodies is None:
+            bodies = self.rule_map[head] = set()
+            self.rule_order[head] = next(self.rule_counter)
+        elif body in bodies:
+            return False
+        bodies.add(body)
+        body_index = self.body_index
+        for a in body:
+            heads = body_index.get(a)
+            if heads is None:
+                body_index[a] = head  # most atoms occur in a single rule, hence, a set is only created when needed
+            elif type(heads) is int:
+                if heads != head:
+                    body_index[a] = {heads, head}
+            else:
+                heads.add(head)
+        return True
+
+    def drop_rule(self, head):
+        """
+        Removes all rules with the given head from the rule map and the index.
+
+        :param head: head of the rules
+        """
+        body_index = self.body_index
+        for body in self.rule_map.pop(head):
+            for a in body:
+                heads = body_index.get(a)
+                if heads is None:
+                    continue
+                if type(heads) is int:
+                    if heads == head:
+                        del body_index[a]
+                else:
+                    heads.discard(head)
+                    if len(heads) == 1:
+                        body_index[a] = heads.pop()
+        del self.rule_order[head]
+
+    def heads_of(self, atom):
+        """
+        Returns the heads of the pending rules with the given atom in their body.
+
+        :param atom: a packed atom
+        :return: iterable over the heads of the rules
+        """
+        heads = self.body_index.get(atom)
+        if heads is None:
+            return ()
+        return (heads,) if type(heads) is int else heads
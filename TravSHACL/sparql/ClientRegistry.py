@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import threading
+
+from TravSHACL.sparql.HTTPTransport import HTTPTransport
+
+
+class ClientRegistry:
+    """Registry of HTTP transports that can be shared by several SPARQL endpoint instances, e.g., by all
+       validations running in one process. Endpoints with the same URL and credentials use the same
+       connection pool, i.e., the pool size limits the number of connections to the endpoint for all of them."""
+
+    def __init__(self):
+        self._transports = {}
+        self._lock = threading.Lock()
+
+    def get_transport(self, url: str, user: str = None, pwd: str = None, pool_size: int = 4, timeout: float = None,
+                      compress_requests: bool = False):
+        """
+        Returns the transport for the given SPARQL endpoint; it is created if it does not exist yet.
+
+        :param url: URL of the SPARQL endpoint
+        :param user: username to connect to a private SPARQL endpoint; default: None
+        :param pwd: password to connect to a private SPARQL endpoint; default: None
+        :param pool_size: maximum number of persistent connections kept open to the endpoint, only
+            used when the transport is created; default: 4
+        :param timeout: socket timeout in seconds, None means no timeout; only used when the transport is created;
+            default: None
+        :param compress_requests: indicates whether the request body is sent gzip-compressed; only used when the
+            transport is created; default: False
+        :return: the HTTPTransport instance for the SPARQL endpoint
+        """
+        key = (url, user, pwd)
+        with self._lock:
+            transport = self._transports.get(key)
+            if transport is None:
+                transport = HTTPTransport(url, user, pwd, pool_size, timeout, compress_requests)
+                self._transports[key] = transport
+            return transport
+
+    def close(self):
+        """Closes the idle connections of all registered transports and empties the registry."""
+        with self._lock:
+            transports = list(self._transports.values())
+            self._transports.clear()
+        for transport in transports:
+            transport.close()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from TravSHACL.sparql.QueryGenerator import get_target_node_statement
+
+_IRI = re.compile(r'<[^<>"{}|^`\\\s]*>')
+_PREFIXED_NAME = re.compile(r'[A-Za-z_][\w.-]*:[\w.-]*|:[\w.-]*')
+
+VOID_CLASS_QUERY = '''PREFIX void: <http://rdfs.org/ns/void#>
+SELECT ?class ?count WHERE {
+  ?partition void:class ?class ;
+             void:entities ?count .
+}'''
+
+VOID_PROPERTY_QUERY = '''PREFIX void: <http://rdfs.org/ns/void#>
+SELECT ?property ?count WHERE {
+  ?partition void:property ?property ;
+             void:triples ?count .
+}'''
+
+
+class EndpointStatistics:
+    """Collects the cardinalities of classes and predicates in a SPARQL endpoint. The cardinalities are
+       taken from the VoID description of the endpoint if available, otherwise COUNT queries are sent.
+       All cardinalities are kept in memory; the queries are cached on disk if the endpoint uses a query cache."""
+
+    def __init__(self, endpoint, use_void: bool = True, workers: int = 4):
+        """
+        Creates a new statistics collector for the given endpoint.
+
+        :param endpoint: instance of SPARQLEndpoint the statistics are collected from
+        :param use_void: indicates whether the VoID description of the endpoint is used; default: True
+        :param workers: maximum number of COUNT queries sent to the endpoint at the same time; default: 4
+        """
+        self.endpoint = endpoint
+        self.use_void = use_void
+        self.workers = workers
+        self.class_counts = {}
+        self.predicate_counts = {}
+        self.query_counts = {}
+        self._void_loaded = False
+        self._lock = threading.Lock()
+
+    def collect(self, shapes):
+        """
+        Collects the cardinalities of the target classes and the predicates used by the given shapes.
+        Shapes with a target other than a class are estimated by counting the answers of their target query.
+
+        :param shapes: list of the shapes the statistics are collected for
+        """
+        self.__load_void()
+        classes, predicates, queries = set(), set(), set()
+        for shape in shapes:
+            target_class = get_target_class(shape)
+            if target_class is not None:
+                classes.add(target_class)
+            elif shape.targetQueryNoPref is not None:
+                queries.add((shape.get_prefix_string() if shape.prefixes else '', shape.targetQueryNoPref))
+            for constraint in shape.constraints:
+                predicate = get_predicate(constraint.path, shape.prefixes)
+                if predicate is not None:
+                    predicates.add(predicate)
+
+        tasks = [(self.class_counts, c, _class_count_query(c)) for c in classes if c not in self.class_counts] + \
+                [(self.predicate_counts, p, _predicate_count_query(p))
+                 for p in predicates if p not in self.predicate_counts] + \
+                [(self.query_counts, q, _target_count_query(*q)) for q in queries if q not in self.query_counts]
+        if self.workers > 1 and len(tasks) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                counts = list(executor.map(lambda task: self.__count(task[2]), tasks))
+        else:
+            counts = [self.__count(task[2]) for task in tasks]
+        with self._lock:
+            for (store, key, _), count in zip(tasks, counts):
+                store[key] = count
+
+    def get_target_count(self, shape):
+        """
+        Returns the estimated number of targets of a shape.
+
+        :param shape: the shape whose targets are estimated
+        :return: the number of targets, 0 if the shape has no target definition, None if not collected
+        """
+        target_class = get_target_class(shape)
+        if target_class is not None:
+            return self.class_counts.get(target_class)
+        if shape.targetQueryNoPref is None:
+            return 0
+        return self.query_counts.get((shape.get_prefix_string() if shape.prefixes else '', shape.targetQueryNoPref))
+
+    def get_path_count(self, shape, path):
+        """
+        Returns the number of triples with the predicate of the given path.
+
+        :param shape: the shape the path belongs to, used to resolve prefixed names
+        :param path: the path of a constraint
+        :return: the number of triples, None if the path is not a (inverse) predicate or was not collected
+        """
+        predicate = get_predicate(path, shape.prefixes)
+        return self.predicate_counts.get(predicate) if predicate is not None else None
+
+    def __load_void(self):
+        """Reads the class and property partitions of the VoID description, if any."""
+        if not self.use_void or self._void_loaded:
+            return
+        self._void_loaded = True
+        for store, query, var in ((self.class_counts, VOID_CLASS_QUERY, 'class'),
+                                  (self.predicate_counts, VOID_PROPERTY_QUERY, 'property')):
+            variables, rows = self.endpoint.run_query_rows(query)
+            term, count = variables.index(var), variables.index('count')
+            for row in rows:
+                try:
+                    store['<' + row[term] + '>'] = int(row[count])
+                except (TypeError, ValueError):
+                    continue
+
+    def __count(self, query):
+        variables, rows = self.endpoint.run_query_rows(query)
+        index = variables.index('cnt')
+        count = 0
+        for row in rows:
+            count = int(row[index])
+        return count
+
+
+def get_target_class(shape):
+    """Returns the IRI of the target class of a shape or None if the shape has no (resolvable) target class."""
+    if shape.targetType != 'class' or shape.targetDef is None:
+        return None
+    return _expand(shape.targetDef, shape.prefixes)
+
+
+def get_predicate(path, prefixes):
+    """Returns the IRI of the predicate of a path or its inverse; None for complex paths."""
+    if path is None:
+        return None
+    path = path.strip()
+    if path.startswith('^'):
+        path = path[1:].strip()
+    if _IRI.fullmatch(path) or _PREFIXED_NAME.fullmatch(path):
+        return _expand(path, prefixes)
+    return None
+
+
+def _expand(term, prefixes):
+    """Expands a prefixed name to a full IRI enclosed in angle brackets."""
+    if term.startswith('<') and term.endswith('>'):
+        return term
+    if ':' not in term:
+        return None
+    prefix, local_name = term.split(':', 1)
+    namespace = prefixes.get(prefix)
+    if namespace is None:
+        return None
+    return '<' + namespace.strip('<>') + local_name + '>'
+
+
+def _class_count_query(class_iri):
+    return 'SELECT (COUNT(?x) AS ?cnt) WHERE { ?x a ' + class_iri + ' . }'
+
+
+def _predicate_count_query(predicate):
+    return 'SELECT (COUNT(?s) AS ?cnt) WHERE { ?s ' + predicate + ' ?o . }'
+
+
+def _target_count_query(prefixes, target_query):
+    return prefixes + 'SELECT (COUNT(DISTINCT ?x) AS ?cnt) WHERE {' + get_target_node_statement(target_query) + '}'
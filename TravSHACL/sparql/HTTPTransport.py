@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import base64
+import gzip
+import http.client
+import io
+import json
+import queue
+import threading
+import zlib
+from urllib.parse import urlencode, urlparse
+
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError, EndPointNotFound, QueryBadFormed, \
+    SPARQLWrapperException, Unauthorized, URITooLong
+
+RESULTS_JSON = 'application/sparql-results+json'
+RESULTS_TSV = 'text/tab-separated-values'
+RESULTS_CSV = 'text/csv'
+
+_HTTP_ERRORS = {
+    400: QueryBadFormed,
+    401: Unauthorized,
+    404: EndPointNotFound,
+    414: URITooLong,
+    500: EndPointInternalError
+}
+
+
+class HTTPTransport:
+    """HTTP transport for a single SPARQL endpoint. Instead of opening a new connection for each query,
+       the transport keeps a bounded pool of persistent (keep-alive) connections and reuses them."""
+
+    def __init__(self, url: str, user: str = None, pwd: str = None, pool_size: int = 4,
+                 timeout: float = None, compress_requests: bool = False):
+        """
+        Creates a new transport for the given SPARQL endpoint.
+
+        :param url: URL of the SPARQL endpoint
+        :param user: username to connect to a private SPARQL endpoint; default: None
+        :param pwd: password to connect to a private SPARQL endpoint; default: None
+        :param pool_size: maximum number of persistent connections kept open to the endpoint; default: 4
+        :param timeout: socket timeout in seconds, None means no timeout; default: None
+        :param compress_requests: indicates whether the request body is sent gzip-compressed; default: False
+        """
+        if pool_size < 1:
+            raise ValueError('The connection pool needs to hold at least one connection.')
+        parsed_url = urlparse(url)
+        if parsed_url.scheme not in ('http', 'https'):
+            raise ValueError('Unsupported URL scheme for a SPARQL endpoint: ' + url)
+
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.compress_requests = compress_requests
+
+        self._connection_class = http.client.HTTPSConnection if parsed_url.scheme == 'https' else http.client.HTTPConnection
+        self._host = parsed_url.hostname
+        self._port = parsed_url.port
+        self._path = (parsed_url.path or '/') + ('?' + parsed_url.query if parsed_url.query else '')
+
+        self._headers = {
+            'Accept-Encoding': 'gzip, deflate',
+            'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+            'Connection': 'keep-alive',
+            'User-Agent': 'TravSHACL'
+        }
+        if compress_requests:
+            self._headers['Content-Encoding'] = 'gzip'
+        if user is not None and pwd is not None:
+            credentials = base64.b64encode((user + ':' + pwd).encode('utf-8')).decode('ascii')
+            self._headers['Authorization'] = 'Basic ' + credentials
+
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def query(self, query_string: str):
+        """
+        Executes a SPARQL query and returns the decoded JSON result.
+
+        :param query_string: the SPARQL query to be executed
+        :return: Python dictionary representing the SPARQL JSON result
+        """
+        return json.loads(self.request(query_string, RESULTS_JSON))
+
+    def request(self, query_string: str, accept: str):
+        """
+        Sends a SPARQL query via HTTP POST over a pooled connection.
+
+        :param query_string: the SPARQL query to be executed
+        :param accept: the media type requested from the endpoint
+        :return: the (decompressed) response body as bytes
+        """
+        with self.open(query_string, accept) as response:
+            return response.read()
+
+    def open(self, query_string: str, accept: str):
+        """
+        Sends a SPARQL query via HTTP POST over a pooled connection without reading the response body.
+        The connection is returned to the pool when the returned stream is closed. If the body was not
+        read completely by then, the connection is discarded instead.
+
+        :param query_string: the SPARQL query to be executed
+        :param accept: the media type requested from the endpoint
+        :return: binary file-like object streaming the (decompressed) response body
+        """
+        body = urlencode({'query': query_string}).encode('utf-8')
+        if self.compress_requests:
+            body = gzip.compress(body)
+        headers = dict(self._headers)
+        headers['Accept'] = accept
+
+        connection, reused = self._acquire()
+        try:
+            try:
+                response = self._send(connection, body, headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # the server closed an idle keep-alive connection, retry once on a fresh one
+                connection.close()
+                response = self._send(connection, body, headers)
+        except BaseException:
+            connection.close()
+            self._release(connection)
+            raise
+
+        stream = io.BufferedReader(_PooledResponse(self, connection, response))
+        if response.status >= 400:
+            with stream:
+                data = stream.read()
+            raise _HTTP_ERRORS.get(response.status, SPARQLWrapperException)(data)
+        return stream
+
+    def close(self):
+        """Closes all connections currently idle in the pool."""
+        while True:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._created -= 1
+
+    def _acquire(self):
+        """Takes an idle connection from the pool or opens a new one if the pool is not exhausted yet."""
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                return self._connection_class(self._host, self._port, timeout=self.timeout), False
+        return self._pool.get(), True  # all connections are in use, wait for one to be released
+
+    def _release(self, connection):
+        self._pool.put(connection)
+
+    def _send(self, connection, body, headers):
+        connection.request('POST', self._path, body=body, headers=headers)
+        return connection.getresponse()
+
+    @staticmethod
+    def _decoder(response):
+        """Returns a stream decompressing the response body according to its content encoding."""
+        content_encoding = response.getheader('Content-Encoding')
+        if content_encoding is None:
+            return response
+        content_encoding = content_encoding.strip().lower()
+        if content_encoding == 'gzip':
+            return gzip.GzipFile(fileobj=response, mode='rb')
+        if content_encoding == 'deflate':
+            return _DeflateReader(response)
+        return response
+
+
+class _PooledResponse(io.RawIOBase):
+    """Response body of a pooled connection; closing it hands the connection back to the transport."""
+
+    def __init__(self, transport: HTTPTransport, connection, response):
+        self._transport = transport
+        self._connection = connection
+        self._response = response
+        self._body = transport._decoder(response)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        # a partially read body would corrupt the next response on this connection
+        if self._response.will_close or not self._response.isclosed():
+            self._response.close()
+            self._connection.close()
+        self._transport._release(self._connection)
+
+
+class _DeflateReader:
+    """Decompresses a deflate-encoded response body while it is read."""
+
+    def __init__(self, response):
+        self._response = response
+        self._decompressor = None
+        self._pending = b''
+
+    def read(self, size):
+        while len(self._pending) < size:
+            chunk = self._response.read(io.DEFAULT_BUFFER_SIZE)
+            if not chunk:
+                if self._decompressor is not None:
+                    self._pending += self._decompressor.flush()
+                break
+            if self._decompressor is None:
+                self._decompressor = zlib.decompressobj()
+                try:
+                    self._pending += self._decompressor.decompress(chunk)
+                    continue
+                except zlib.error:
+                    self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)  # raw deflate stream without zlib header
+            self._pending += self._decompressor.decompress(chunk)
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import uuid
+from collections import namedtuple
+
+# string literals and IRIs are kept as they are, comments are dropped, and whitespace is collapsed
+_QUERY_TOKENS = re.compile(r'("""(?:[^\\]|\\.)*?"""|\'\'\'(?:[^\\]|\\.)*?\'\'\'|"(?:[^"\\\n]|\\.)*"|'
+                           r'\'(?:[^\'\\\n]|\\.)*\'|<[^<>"{}|^`\\\s]*>)|([?$]\w+)|(?:#[^\n]*|\s)+')
+
+ENTRY_SUFFIX = '.ndjson.gz'
+
+CacheKey = namedtuple('CacheKey', ['digest', 'variables'])
+
+
+def normalize_query(query_string: str, rename_variables: bool = False):
+    """
+    Normalizes the text of a SPARQL query so that queries differing only in their layout
+    share the same cache entry. Literals and IRIs are not modified.
+
+    :param query_string: the SPARQL query to be normalized
+    :param rename_variables: indicates whether the variables are renamed in the order of their first occurrence;
+        this way, queries generated with different variable names share the same cache entry; default: False
+    :return: the normalized query string and a dictionary mapping the variable names to the normalized ones
+    """
+    variables = {}
+
+    def replace(match):
+        if match.group(1):
+            return match.group(1)
+        if match.group(2):
+            name = match.group(2)[1:]
+            if not rename_variables:
+                return '?' + name
+            if name not in variables:
+                variables[name] = 'v' + str(len(variables))
+            return '?' + variables[name]
+        return ' '
+
+    return _QUERY_TOKENS.sub(replace, query_string).strip(), variables
+
+
+class QueryCache:
+    """Persistent on-disk cache for SPARQL query results. Each result is stored as a gzip-compressed
+       file of JSON lines; the least recently used results are evicted when the cache exceeds its size."""
+
+    def __init__(self, cache_dir: str, max_size: int = 256, data_version: str = None, bypass: bool = False):
+        """
+        Creates a new query cache backed by the given directory.
+
+        :param cache_dir: directory where the cached query results are stored; it is created if it does not exist
+        :param max_size: maximum size of the cache in megabytes; default: 256
+        :param data_version: token identifying the version of the data, results cached for
+            another version are not used; default: None
+        :param bypass: indicates whether cached results are ignored; new results are still stored, i.e.,
+            the cache is refreshed; default: False
+        """
+        if max_size <= 0:
+            raise ValueError('The size of the query cache needs to be positive.')
+        self.cache_dir = cache_dir
+        self.max_size = max_size * 1024 * 1024
+        self.data_version = data_version or ''
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+
+    def key(self, endpoint_id: str, query_string: str, result_kind: str = 'rows'):
+        """
+        Computes the key of a query result.
+
+        :param endpoint_id: identifier of the SPARQL endpoint, i.e., its URL
+        :param query_string: the SPARQL query
+        :param result_kind: the representation of the result stored in the cache, i.e., 'rows' or 'json';
+            the variables are only renamed for rows since the names are not part of the cached rows
+        :return: the key of the cache entry
+        """
+        query, variables = normalize_query(query_string, rename_variables=result_kind == 'rows')
+        key = '\n'.join([result_kind, endpoint_id, self.data_version, query])
+        return CacheKey(hashlib.sha256(key.encode('utf-8')).hexdigest(), variables)
+
+    def get_rows(self, key: CacheKey):
+        """
+        Looks up the solution mappings of a query.
+
+        :param key: the key of the cache entry
+        :return: None for a cache miss; otherwise the projected variables and a generator over the solution mappings
+        """
+        file = self.__open(key.digest)
+        if file is None:
+            return None
+        try:
+            names = {normalized: name for name, normalized in key.variables.items()}
+            variables = [names[var] for var in json.loads(file.readline())]
+        except (OSError, EOFError, ValueError, KeyError):
+            file.close()
+            self.__discard(key.digest)
+            return None
+        self.__record(True)
+
+        def rows():
+            with file:
+                for line in file:
+                    yield tuple(json.loads(line))
+
+        return variables, rows()
+
+    def store_rows(self, key: CacheKey, variables: list, rows):
+        """
+        Stores the solution mappings of a query while they are passed through.
+        The entry is only added to the cache if all solution mappings were consumed.
+
+        :param key: the key of the cache entry
+        :param variables: the projected variables of the query
+        :param rows: iterator over the solution mappings
+        :return: generator over the solution mappings
+        """
+        if any(var not in key.variables for var in variables):  # e.g., variables bound by the endpoint only
+            yield from rows
+            return
+        path = self.__path(key.digest)
+        tmp_path = path + '.' + uuid.uuid4().hex + '.tmp'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file = gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6)
+        completed = False
+        try:
+            file.write(json.dumps([key.variables[var] for var in variables]) + '\n')
+            for row in rows:
+                file.write(json.dumps(row) + '\n')
+                yield row
+            completed = True
+        finally:
+            file.close()
+            if completed:
+                self.__commit(tmp_path, path)
+            else:
+                os.remove(tmp_path)
+
+    def get_result(self, key: CacheKey):
+        """
+        Looks up the full result of a query.
+
+        :param key: the key of the cache entry
+        :return: None for a cache miss; otherwise the query result as Python dictionary
+        """
+        file = self.__open(key.digest)
+        if file is None:
+            return None
+        try:
+            with file:
+                result = json.loads(file.read())
+        except (OSError, EOFError, ValueError):
+            self.__discard(key.digest)
+            return None
+        self.__record(True)
+        return result
+
+    def store_result(self, key: CacheKey, result: dict):
+        """
+        Stores the full result of a query.
+
+        :param key: the key of the cache entry
+        :param result: the query result as Python dictionary
+        """
+        path = self.__path(key.digest)
+        tmp_path = path + '.' + uuid.uuid4().hex + '.tmp'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as file:
+            file.write(json.dumps(result))
+        self.__commit(tmp_path, path)
+
+    def clear(self):
+        """Removes all entries from the cache."""
+        with self._lock:
+            for path in self._entries():
+                os.remove(path)
+            self._size = 0
+
+    def _entries(self):
+        for directory, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if file.endswith(ENTRY_SUFFIX):
+                    yield os.path.join(directory, file)
+
+    def __path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ENTRY_SUFFIX)
+
+    def __open(self, key):
+        """Opens the entry for reading and marks it as recently used; returns None for a cache miss."""
+        if self.bypass:
+            self.__record(False)
+            return None
+        path = self.__path(key)
+        try:
+            file = gzip.open(path, 'rt', encoding='utf-8')
+            os.utime(path)  # the modification time keeps track of the last use
+        except OSError:
+            self.__record(False)
+            return None
+        return file
+
+    def __discard(self, key):
+        """Removes a corrupted entry."""
+        self.__record(False)
+        path = self.__path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._size -= size
+
+    def __record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def __commit(self, tmp_path, path):
+        """Moves a completely written entry to its final location and evicts old entries if necessary."""
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += size - replaced
+            if self._size > self.max_size:
+                self.__evict()
+
+    def __evict(self):
+        """Removes the least recently used entries until the cache is reduced to 90% of its maximum size."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self._size = sum(entry[1] for entry in entries)
+        target_size = self.max_size * 0.9
+        for _, size, path in entries:
+            if self._size <= target_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
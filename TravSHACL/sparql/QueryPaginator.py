@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import re
+import time
+
+PAGINATION_MODES = ('keyset', 'offset')
+
+# IRIs, string literals, and comments are skipped when looking for the query form
+_SELECT = re.compile(r'<[^<>"{}|^`\\\s]*>|"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\'|#[^\n]*|\b(SELECT)\b', re.IGNORECASE)
+_STRING_ESCAPES = {'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+
+class QueryPaginator:
+    """Retrieves the answers of a SELECT query page by page, so that endpoints capping the number of
+       results per query, e.g., Virtuoso's ResultSetMaxRows, do not truncate the result silently.
+       The query is wrapped as a sub-query and the pages are ordered by one of its projected variables."""
+
+    def __init__(self, page_size: int, mode: str = 'keyset'):
+        """
+        Creates a new paginator.
+
+        :param page_size: maximum number of solution mappings requested per page
+        :param mode: 'keyset' continues after the last value of the ordering variable, 'offset' uses
+            LIMIT and OFFSET; keyset pagination compares the string values, i.e., blank nodes are skipped;
+            default: 'keyset'
+        """
+        if page_size <= 0:
+            raise ValueError('The page size needs to be positive.')
+        if mode not in PAGINATION_MODES:
+            raise ValueError('Unsupported pagination mode: ' + str(mode))
+        self.page_size = page_size
+        self.mode = mode
+        # maximum number of results per query detected for the endpoint, the page size if a page was filled
+        self.result_cap = None
+
+    def run_query_rows(self, endpoint, query_string: str, var: str = 'x', deadline: float = None):
+        """
+        Executes a SELECT query page by page and streams the solution mappings of all pages.
+        A page with fewer results than requested is either the last one or was truncated by the endpoint.
+        In the latter case, the following page is not empty and the size of the truncated page is used
+        as page size from then on. Once a page is filled, the endpoint is known to not truncate pages,
+        hence, from then on a page with fewer results than requested is the last one.
+
+        :param endpoint: instance of SPARQLEndpoint to send the queries to
+        :param query_string: the SELECT query to be paginated
+        :param var: name of the projected variable used to order the pages; default: 'x'
+        :param deadline: point in time (see time.monotonic) after which no further pages are requested,
+            None for no time limit; default: None
+        :return: tuple with the list of projected variables and a generator over the solution mappings of all pages
+        """
+        prologue, select = _split_prologue(query_string)
+        variables, rows = endpoint.run_query_rows(self.__page_query(prologue, select, var, self.__limit(), 0, None))
+        return variables, self.__pages(endpoint, prologue, select, var, variables.index(var), rows, deadline)
+
+    def __pages(self, endpoint, prologue, select, var, index, rows, deadline):
+        limit = self.__limit()
+        offset = 0
+        after = None
+        truncated = None  # size of the last page if it had fewer results than requested
+        while True:
+            count = 0
+            for row in rows:
+                count += 1
+                after = row[index]
+                yield row
+            if count == 0:
+                return
+            if truncated is not None:
+                self.result_cap = truncated  # the previous page was truncated by the endpoint
+                limit = self.__limit()
+                truncated = None
+            if count < limit:
+                if self.result_cap is not None:
+                    return
+                truncated = count
+            elif self.result_cap is None:
+                self.result_cap = self.page_size  # the endpoint does not truncate pages of the requested size
+            offset += count
+            if deadline is not None and time.monotonic() >= deadline:
+                return  # the answers of the remaining pages are missing
+            _, rows = endpoint.run_query_rows(self.__page_query(prologue, select, var, limit, offset, after))
+
+    def __limit(self):
+        return self.page_size if self.result_cap is None else min(self.page_size, self.result_cap)
+
+    def __page_query(self, prologue, select, var, limit, offset, after):
+        if self.mode == 'keyset':
+            key_filter = '' if after is None else '\n  FILTER (STR(?' + var + ') > ' + _string_literal(after) + ')'
+            return ''.join([prologue, 'SELECT * WHERE {\n  {\n', select, '\n  }', key_filter,
+                            '\n}\nORDER BY STR(?', var, ')\nLIMIT ', str(limit)])
+        return ''.join([prologue, 'SELECT * WHERE {\n  {\n', select, '\n  }\n}\nORDER BY ?', var,
+                        '\nLIMIT ', str(limit), ('\nOFFSET ' + str(offset)) if offset > 0 else ''])
+
+
+def _split_prologue(query_string):
+    """Splits the query into its prologue, i.e., the PREFIX and BASE declarations, and the SELECT query."""
+    for match in _SELECT.finditer(query_string):
+        if match.group(1):
+            return query_string[:match.start()], query_string[match.start():]
+    raise ValueError('Only SELECT queries can be paginated.')
+
+
+def _string_literal(value):
+    return '"' + ''.join(_STRING_ESCAPES.get(char, char) for char in str(value)) + '"'
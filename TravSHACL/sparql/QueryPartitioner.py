@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import threading
+
+from rdflib import Graph
+
+SIZE_UNITS = ('chars', 'bytes')
+
+_PROBE_LOWER_BOUND = 1024
+_PROBE_RESOLUTION = 256
+_probed_sizes = {}  # maximum query sizes already probed in this process, keyed by endpoint URL, unit, and upper bound
+_probe_lock = threading.Lock()
+
+
+class QueryPartitioner:
+    """Splits a query with a placeholder for a list of instances, e.g., the instances of a VALUES clause,
+       into as few queries as possible without exceeding the maximum query size accepted by the endpoint."""
+
+    def __init__(self, max_query_size: int = 8192, unit: str = 'chars'):
+        """
+        Creates a new query partitioner.
+
+        :param max_query_size: maximum size of a query sent to the SPARQL endpoint; default: 8192
+        :param unit: unit of the query size, either 'chars' or 'bytes' (UTF-8 encoded); default: 'chars'
+        """
+        if max_query_size <= 0:
+            raise ValueError('The maximum query size needs to be positive.')
+        if unit not in SIZE_UNITS:
+            raise ValueError('Unsupported unit for the query size: ' + str(unit))
+        self.max_query_size = max_query_size
+        self.unit = unit
+
+    def size(self, text: str):
+        """Returns the size of the text in the unit of the partitioner."""
+        return len(text.encode('utf-8')) if self.unit == 'bytes' else len(text)
+
+    def partition(self, template: str, instances, placeholder: str = '$instances_to_add$',
+                  separator: str = ' ', max_instances: int = None):
+        """
+        Lazily generates the partitions of a query. Each partition replaces all occurrences of the placeholder
+        with the same sublist of the instances, which is packed until the next instance would exceed the maximum
+        query size. An instance that does not fit into a query on its own is sent in a partition of its own.
+
+        :param template: the query string including the placeholder
+        :param instances: iterable of the formatted instances, e.g., IRIs enclosed in angle brackets
+        :param placeholder: the string to be replaced by the list of instances; default: '$instances_to_add$'
+        :param separator: string separating two instances of the list; default: ' '
+        :param max_instances: maximum number of instances per partition, None for no limit; default: None
+        :return: generator over the query strings of all partitions; the template itself if it has no placeholder
+        """
+        occurrences = template.count(placeholder)
+        if occurrences == 0:
+            yield template
+            return
+
+        budget = self.max_query_size - self.size(template) + occurrences * self.size(placeholder)
+        separator_size = self.size(separator)
+        sublist = []
+        used = 0
+        for instance in instances:
+            cost = occurrences * (self.size(instance) + (separator_size if sublist else 0))
+            if sublist and (used + cost > budget or len(sublist) == max_instances):
+                yield template.replace(placeholder, separator.join(sublist))
+                sublist = []
+                used = 0
+                cost = occurrences * self.size(instance)
+            sublist.append(instance)
+            used += cost
+        if sublist:
+            yield template.replace(placeholder, separator.join(sublist))
+
+    def probe(self, endpoint):
+        """
+        Determines the maximum query size accepted by the SPARQL endpoint via a binary search with queries
+        of increasing size, bounded by the maximum query size of this partitioner. The result is kept for
+        the remaining lifetime of the process. In-memory graphs do not restrict the query size.
+
+        :param endpoint: instance of SPARQLEndpoint to be probed
+        :return: a query partitioner using the probed maximum query size
+        """
+        if isinstance(endpoint.endpoint, Graph) or self.max_query_size <= _PROBE_LOWER_BOUND:
+            return self
+
+        key = (endpoint.url, self.unit, self.max_query_size)
+        with _probe_lock:
+            max_query_size = _probed_sizes.get(key)
+            if max_query_size is None:
+                max_query_size = self.__probe_max_query_size(endpoint)
+                _probed_sizes[key] = max_query_size
+        return QueryPartitioner(max_query_size, self.unit)
+
+    def __probe_max_query_size(self, endpoint):
+        # the smallest query is expected to succeed, otherwise the endpoint is not reachable
+        self.__run_probe_query(endpoint, _PROBE_LOWER_BOUND)
+        if self.__accepts(endpoint, self.max_query_size):
+            return self.max_query_size
+        accepted, rejected = _PROBE_LOWER_BOUND, self.max_query_size
+        while rejected - accepted > _PROBE_RESOLUTION:
+            size = (accepted + rejected) // 2
+            if self.__accepts(endpoint, size):
+                accepted = size
+            else:
+                rejected = size
+        return accepted
+
+    def __accepts(self, endpoint, size):
+        try:
+            self.__run_probe_query(endpoint, size)
+        except Exception:  # the endpoint refuses too long queries in different ways, e.g., HTTP 413 or 414
+            return False
+        return True
+
+    def __run_probe_query(self, endpoint, size):
+        """Sends a query of the given size that binds dummy IRIs in a VALUES clause and does not return any result."""
+        template = 'SELECT ?x WHERE { VALUES ?x { $instances_to_add$ } } LIMIT 0'
+        instances = ('<urn:trav-shacl:probe:' + str(i) + '>' for i in range(size))
+        query = next(QueryPartitioner(size, self.unit).partition(template, instances))
+        query = query.replace(' }', ' ' * (size - self.size(query)) + ' }', 1)  # pad to the exact size
+        _, rows = endpoint.run_query_rows(query, use_cache=False)
+        for _ in rows:
+            pass
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+__author__ = 'Philipp D. Rohde'
+
+import codecs
+import csv
+import io
+import json
+import re
+
+CHUNK_SIZE = 65536
+
+_TSV_ESCAPES = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+_TSV_ESCAPE_CHARS = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+def parse_rows(stream, result_format):
+    """
+    Parses a SPARQL SELECT result incrementally.
+
+    :param stream: binary file-like object holding the serialized SPARQL result
+    :param result_format: format of the serialization, one of 'json', 'tsv', or 'csv'
+    :return: tuple with the list of projected variables and a generator yielding one tuple per solution mapping;
+        the tuple holds the values of the variables in the order of the variable list, None for unbound variables
+    """
+    if result_format == 'json':
+        return parse_json_rows(stream)
+    if result_format == 'tsv':
+        return parse_tsv_rows(stream)
+    if result_format == 'csv':
+        return parse_csv_rows(stream)
+    raise ValueError('Unsupported SPARQL result format: ' + str(result_format))
+
+
+def parse_json_rows(stream):
+    """
+    Parses a SPARQL JSON result incrementally. Only the head of the result is read eagerly,
+    the bindings are decoded one after another while iterating over the returned generator.
+
+    :param stream: binary file-like object holding the SPARQL JSON result
+    :return: tuple with the list of projected variables and a generator over the solution mappings
+    """
+    reader = _JSONStreamReader(stream)
+    variables = None
+    buffered = None
+
+    reader.expect('{')
+    while True:
+        key = reader.next_key()
+        if key is None:  # end of the result object without any bindings
+            return variables or [], iter(())
+        if key == 'results':
+            reader.expect('{')
+            while True:
+                inner_key = reader.next_key()
+                if inner_key is None:
+                    break
+                if inner_key == 'bindings':
+                    reader.expect('[')
+                    if variables is not None:
+                        return variables, _json_bindings(reader, variables)
+                    # the head follows the bindings; this is rare but allowed, so the bindings need to be kept
+                    buffered = list(reader.iter_array())
+                else:
+                    reader.value()
+        elif key == 'head':
+            head = reader.value()
+            variables = head.get('vars', []) if isinstance(head, dict) else []
+            if buffered is not None:
+                return variables, (tuple(b[v]['value'] if v in b else None for v in variables) for b in buffered)
+        else:
+            reader.value()
+
+
+def _json_bindings(reader, variables):
+    for binding in reader.iter_array():
+        yield tuple(binding[v]['value'] if v in binding else None for v in variables)
+
+
+def parse_tsv_rows(stream):
+    """
+    Parses a SPARQL TSV result incrementally, i.e., line by line.
+
+    :param stream: binary file-like object holding the SPARQL TSV result
+    :return: tuple with the list of projected variables and a generator over the solution mappings
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='\n')
+    header = text.readline().rstrip('\r\n')
+    variables = [v[1:] if v[:1] in ('?', '$') else v for v in header.split('\t')] if header else []
+
+    def rows():
+        for line in text:
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            yield tuple(_tsv_term_value(cell) for cell in line.split('\t'))
+
+    return variables, rows()
+
+
+def _tsv_term_value(term):
+    """Returns the value of an RDF term serialized in SPARQL TSV, i.e., the IRI or the lexical form."""
+    if not term:
+        return None
+    if term[0] == '<' and term[-1] == '>':
+        return term[1:-1]
+    if term[0] == '"' or term[0] == "'":
+        end = term.rfind(term[0])
+        return _unescape_tsv(term[1:end]) if end > 0 else term
+    return term  # blank nodes and literals in abbreviated syntax, e.g., numbers or booleans
+
+
+def _unescape_tsv(lexical_form):
+    if '\\' not in lexical_form:
+        return lexical_form
+
+    def replace(match):
+        escape = match.group(1)
+        if escape[0] in ('u', 'U'):
+            return chr(int(escape[1:], 16))
+        return _TSV_ESCAPE_CHARS.get(escape, escape)
+
+    return _TSV_ESCAPES.sub(replace, lexical_form)
+
+
+def parse_csv_rows(stream):
+    """
+    Parses a SPARQL CSV result incrementally, i.e., record by record.
+    Note that CSV does not distinguish between unbound variables and empty strings.
+
+    :param stream: binary file-like object holding the SPARQL CSV result
+    :return: tuple with the list of projected variables and a generator over the solution mappings
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+    variables = next(reader, [])
+
+    def rows():
+        for record in reader:
+            if record:
+                yield tuple(value if value != '' else None for value in record)
+
+    return variables, rows()
+
+
+class _JSONStreamReader:
+    """Minimal pull parser reading one JSON value at a time from a binary stream."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Reads the next chunk from the stream; returns False if the stream is exhausted."""
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(b'', final=True)
+        else:
+            self.buffer = self.buffer[self.pos:] + self.text_decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """Returns the next non-whitespace character without consuming it, None at the end of the stream."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self._peek() != char:
+            raise ValueError('Malformed SPARQL JSON result: expected "' + char + '" at position ' + str(self.pos))
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # a number at the end of the buffer might be incomplete
+                if end < len(self.buffer) or self.eof or not isinstance(value, (int, float)):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def next_key(self):
+        """Returns the next key of the current object, None if the object is closed."""
+        char = self._peek()
+        if char == ',':
+            self.pos += 1
+            char = self._peek()
+        if char == '}':
+            self.pos += 1
+            return None
+        key = self.value()
+        self.expect(':')
+        return key
+
+    def iter_array(self):
+        """Decodes the elements of the current array one by one."""
+        char = self._peek()
+        if char == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self._peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError('Malformed SPARQL JSON result: expected "," or "]" at position ' + str(self.pos))
@@ -3,33 +3,104 @@ from __future__ import annotations  # required for typing in older versions of P
 
 __author__ = 'Philipp D. Rohde'
 
+import threading
+
 from SPARQLWrapper import SPARQLWrapper, JSON, BASIC, POST
 from rdflib import Graph
 
+from TravSHACL.sparql.ClientRegistry import ClientRegistry
+from TravSHACL.sparql.HTTPTransport import HTTPTransport, RESULTS_CSV, RESULTS_JSON, RESULTS_TSV
+from TravSHACL.sparql.QueryCache import QueryCache
+from TravSHACL.sparql.ResultParser import parse_json_rows, parse_rows
+
+RESULT_FORMATS = {
+    'json': RESULTS_JSON,
+    'tsv': RESULTS_TSV,
+    'csv': RESULTS_CSV
+}
+
+_RDFLIB_LOCK = threading.Lock()  # the SPARQL parser of RDFLib is not thread-safe, hence, all graphs share this lock
+
 
 class SPARQLEndpoint:
     """Implementation of a SPARQL endpoint. This implementation serves as a wrapper in order to be able to execute
        SPARQL queries over SPARQL endpoints via the Web and RDFlib graphs, i.e., in-memory knowledge graphs."""
 
-    instance = None
-
-    class __SPARQLEndpoint:
-        """Private class to allow simulation of a Singleton."""
-        def __init__(self, url: str | Graph, user: str = None, pwd: str = None):
-            if isinstance(url, str):
-                self.endpoint = SPARQLWrapper(url)
-                self.endpoint.setReturnFormat(JSON)
-                if user is not None and pwd is not None:
-                    self.endpoint.setHTTPAuth(BASIC)
-                    self.endpoint.setCredentials(user=user, passwd=pwd)
-                    self.endpoint.setMethod(POST)
-            else:
-                self.endpoint = url
+    def __init__(self, endpoint: str | Graph, user: str = None, pwd: str = None, pool_size: int = 4,
+                 result_format: str = 'json', cache: QueryCache = None, registry: ClientRegistry = None,
+                 timeout: float = None, compress_requests: bool = False):
+        """
+        Creates a new SPARQL endpoint instance.
+
+        :param endpoint: URL of the SPARQL endpoint (as string) or an in-memory RDFLib graph
+        :param user: username to connect to a private SPARQL endpoint; default: None
+        :param pwd: password to connect to a private SPARQL endpoint; default: None
+        :param pool_size: number of persistent HTTP connections kept open to the SPARQL endpoint,
+            0 disables connection pooling; default: 4
+        :param result_format: serialization requested for the query results, one of 'json', 'tsv', or 'csv';
+            default: 'json'
+        :param cache: on-disk cache for the query results, None disables caching; default: None
+        :param registry: registry providing HTTP transports shared with other SPARQL endpoint instances,
+            None means that the instance uses its own transport; default: None
+        :param timeout: timeout of the requests to the SPARQL endpoint in seconds, None means no timeout;
+            default: None
+        :param compress_requests: indicates whether the queries are sent gzip-compressed, only supported with
+            connection pooling; default: False
+        """
+        if not (isinstance(endpoint, str) or isinstance(endpoint, Graph)):
+            raise TypeError('The SPARQL endpoint needs to be a URL (as string) or an in-memory RDFlib graph. ' +
+                            str(type(endpoint)) + ' given instead.')
+        if result_format not in RESULT_FORMATS:
+            raise ValueError('Unsupported SPARQL result format: ' + str(result_format))
+        self.result_format = result_format
+        self.transport = None
+        self.owns_transport = False
+        self.cache = None
+        self.lock = _RDFLIB_LOCK
+        if isinstance(endpoint, str):
+            self.url = endpoint
+            self.cache = cache  # in-memory graphs are not cached since they might change at any time
+            if pool_size > 0:
+                if registry is not None:
+                    self.transport = registry.get_transport(endpoint, user, pwd, pool_size, timeout,
+                                                            compress_requests)
+                else:
+                    self.transport = HTTPTransport(endpoint, user, pwd, pool_size, timeout, compress_requests)
+                    self.owns_transport = True
+            self.lock = threading.Lock()  # SPARQLWrapper is not safe to be queried concurrently
+            self.endpoint = SPARQLWrapper(endpoint)
+            self.endpoint.setReturnFormat(JSON)
+            if timeout is not None:
+                self.endpoint.setTimeout(timeout)
+            if user is not None and pwd is not None:
+                self.endpoint.setHTTPAuth(BASIC)
+                self.endpoint.setCredentials(user=user, passwd=pwd)
+                self.endpoint.setMethod(POST)
+        else:
+            self.endpoint = endpoint
+
+    def close(self):
+        """Closes the idle connections to the SPARQL endpoint unless the transport is shared via a registry."""
+        if self.owns_transport:
+            self.transport.close()
+
+    def get_endpoint_type(self):
+        return type(self.endpoint)
 
-        def get_endpoint_type(self):
-            return type(self.endpoint)
+    def run_query(self, query_string):
+        if self.cache is None:
+            return self.__run_query(query_string)
+        key = self.cache.key(self.url, query_string, 'json')
+        result = self.cache.get_result(key)
+        if result is None:
+            result = self.__run_query(query_string)
+            self.cache.store_result(key, result)
+        return result
 
-        def run_query(self, query_string):
+    def __run_query(self, query_string):
+        if self.transport is not None:
+            return self.transport.query(query_string)
+        with self.lock:
             if isinstance(self.endpoint, SPARQLWrapper):
                 self.endpoint.setQuery(query_string)
                 return self.endpoint.query().convert()
@@ -51,16 +122,54 @@ class SPARQLEndpoint:
                         {var.toPython()[1:]: {'value': result[var].toPython()} for var in variables})
                 return result_dict
 
-    def __new__(cls, endpoint, user, pwd):
-        if not (isinstance(endpoint, str) or isinstance(endpoint, Graph)):
-            raise TypeError('The SPARQL endpoint needs to be a URL (as string) or an in-memory RDFlib graph. ' +
-                            type(endpoint) + ' given instead.')
-        if not SPARQLEndpoint.instance:
-            SPARQLEndpoint.instance = SPARQLEndpoint.__SPARQLEndpoint(endpoint, user, pwd)
-        return SPARQLEndpoint.instance
+    def run_query_rows(self, query_string, use_cache=True):
+        """
+        Executes a SPARQL query and streams its result instead of materializing the full result set.
+
+        :param query_string: the SPARQL query to be executed
+        :param use_cache: indicates whether the query cache is used (if any); default: True
+        :return: tuple with the list of projected variables and a generator yielding one tuple per solution
+            mapping; the tuple holds the values in the order of the variable list, None for unbound variables
+        """
+        if self.cache is None or not use_cache:
+            return self.__run_query_rows(query_string)
+        key = self.cache.key(self.url, query_string)
+        cached = self.cache.get_rows(key)
+        if cached is not None:
+            return cached
+        variables, rows = self.__run_query_rows(query_string)
+        return variables, self.cache.store_rows(key, variables, rows)
+
+    def __run_query_rows(self, query_string):
+        if self.transport is not None:
+            stream = self.transport.open(query_string, RESULT_FORMATS[self.result_format])
+            return self.__stream_rows(stream, lambda: parse_rows(stream, self.result_format))
+        with self.lock:
+            if isinstance(self.endpoint, SPARQLWrapper):
+                self.endpoint.setQuery(query_string)
+                stream = self.endpoint.query().response
+            else:
+                # RDFLib evaluates the query lazily, hence, the rows are collected while holding the lock.
+                result_raw = self.endpoint.query(query_string)
+                variables = [v.toPython()[1:] for v in result_raw.vars]
+                rows = [tuple(None if result[var] is None else result[var].toPython() for var in result_raw.vars)
+                        for result in result_raw]
+                return variables, iter(rows)
+        return self.__stream_rows(stream, lambda: parse_json_rows(stream))
+
+    @staticmethod
+    def __stream_rows(stream, parse):
+        """Parses the head of a streamed result and closes the stream once the rows are consumed."""
+        try:
+            variables, rows = parse()
+        except BaseException:
+            stream.close()
+            raise
 
-    def __getattr__(self, item):
-        return getattr(self.instance, item)
+        def closing_rows():
+            try:
+                yield from rows
+            finally:
+                stream.close()
 
-    def __setattr__(self, key, value):
-        return setattr(self.instance, key, value)
+        return variables, closing_rows()
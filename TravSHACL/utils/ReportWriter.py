@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import json
+
+from TravSHACL.utils import fileManagement
+
+REPORT_FILES = {
+    'ttl': 'validationReport.ttl',
+    'nt': 'validationReport.nt',
+    'ndjson': 'validationReport.ndjson',
+    'csv.gz': 'validationReport.csv.gz'
+}
+
+RDF_TYPE = '<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>'
+SH = 'http://www.w3.org/ns/shacl#'
+XSD_BOOLEAN = '<http://www.w3.org/2001/XMLSchema#boolean>'
+
+
+class ReportWriter:
+    """Writes the validation report, i.e., one validation result per violation, to the output directory.
+       The report is streamed to the file in batches of lines, hence, it is never held in memory as a whole.
+       Supported formats are Turtle ('ttl'), N-Triples ('nt'), one JSON object per line ('ndjson'),
+       and gzip-compressed CSV ('csv.gz')."""
+
+    def __init__(self, report_format: str = 'ttl', batch_size: int = 10000):
+        """
+        Creates a new report writer.
+
+        :param report_format: format of the validation report, one of 'ttl', 'nt', 'ndjson', or 'csv.gz';
+            default: 'ttl'
+        :param batch_size: number of lines written to the file at once; default: 10000
+        """
+        if report_format not in REPORT_FILES:
+            raise ValueError('Unknown report format: ' + str(report_format) + ', expected one of ' +
+                             ', '.join(REPORT_FILES) + '.')
+        self.report_format = report_format
+        self.batch_size = batch_size
+
+    @property
+    def filename(self):
+        """Name of the file the report is written to."""
+        return REPORT_FILES[self.report_format]
+
+    def write(self, output_dir: str, violations):
+        """
+        Writes the validation report.
+
+        :param output_dir: directory the report is written to
+        :param violations: iterable over the violations, each as tuple of the shape name and the focus node
+        """
+        lines = {
+            'ttl': self.__turtle,
+            'nt': self.__n_triples,
+            'ndjson': self.__ndjson,
+            'csv.gz': self.__csv
+        }[self.report_format](violations)
+        report = fileManagement.open_file(output_dir, self.filename, compressed=self.report_format == 'csv.gz')
+        try:
+            fileManagement.write_lines(report, lines, self.batch_size)
+        finally:
+            fileManagement.close_file(report)
+
+    @staticmethod
+    def __turtle(violations):
+        yield '@prefix sh: <http://www.w3.org/ns/shacl#> . \n\n'
+        first = True
+        for shape, focus_node in violations:
+            if first:
+                yield ':report a sh:ValidationReport ;\n  sh:conforms false ;\n  sh:result'
+                first = False
+            else:
+                yield ' ,'
+            yield ''.join(['\n    [ a  sh:ValidationResult ;\n',
+                           '      sh:resultSeverity  sh:Violation ;\n',
+                           '      sh:focusNode  <', focus_node, '> ;\n',
+                           '      sh:sourceShape  ', shape, ' ]'])
+        if first:
+            yield ':report a sh:ValidationReport ;\n  sh:conforms true '
+        yield ' .'
+
+    @staticmethod
+    def __n_triples(violations):
+        report = '_:report '
+        yield ''.join([report, RDF_TYPE, ' <', SH, 'ValidationReport> .\n'])
+        conforms = True
+        for i, (shape, focus_node) in enumerate(violations):
+            conforms = False
+            result = '_:result' + str(i + 1) + ' '
+            shape = shape if shape.startswith('<') else json.dumps(shape)  # shapes of the JSON format have no IRI
+            yield ''.join([report, '<', SH, 'result> ', result, '.\n',
+                           result, RDF_TYPE, ' <', SH, 'ValidationResult> .\n',
+                           result, '<', SH, 'resultSeverity> <', SH, 'Violation> .\n',
+                           result, '<', SH, 'focusNode> <', focus_node, '> .\n',
+                           result, '<', SH, 'sourceShape> ', shape, ' .\n'])
+        yield ''.join([report, '<', SH, 'conforms> "', 'true' if conforms else 'false', '"^^', XSD_BOOLEAN, ' .\n'])
+
+    @staticmethod
+    def __ndjson(violations):
+        encode = json.dumps
+        for shape, focus_node in violations:
+            yield ''.join(['{"focusNode": ', encode(focus_node), ', "sourceShape": ', encode(shape),
+                           ', "resultSeverity": "Violation"}\n'])
+
+    @staticmethod
+    def __csv(violations):
+        yield 'FocusNode,SourceShape\r\n'
+        for shape, focus_node in violations:
+            yield ''.join([_csv_field(focus_node), ',', _csv_field(shape), '\r\n'])
+
+
+def _csv_field(value):
+    """Quotes a CSV field if necessary."""
+    if ',' in value or '"' in value or '\n' in value or '\r' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
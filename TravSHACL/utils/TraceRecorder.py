@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import time
+from array import array
+
+RESULTS = ['valid', 'violated']
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+
+class TraceRecorder:
+    """Append-only record of the target classifications over time, i.e., the traces of the validation.
+       A trace consists of the shape that classified the target, the result, and the time since the start of the
+       validation. The traces are kept in typed arrays, the shapes are stored as indices of a list of names.
+       Only every n-th classification can be recorded or none at all; the running number of a trace always
+       counts all classifications."""
+
+    def __init__(self, sampling: int = 1):
+        """
+        Creates a new trace recorder.
+
+        :param sampling: records every n-th classification, 1 records all of them, 0 disables the traces; default: 1
+        """
+        if sampling < 0:
+            raise ValueError('The trace sampling needs to be positive or 0.')
+        self.sampling = sampling
+        self.count = 0
+        self.shape_names = []
+        self.shape_ids = {}
+        self.shapes = array('I')
+        self.results = array('B')
+        self.numbers = array('Q')
+        self.times = array('d')
+        self.start = time.perf_counter()
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def record(self, shape_name: str, result: str):
+        """
+        Records the classification of a target.
+
+        :param shape_name: name of the shape that (in)validated the target
+        :param result: 'valid' or 'violated'
+        """
+        self.count += 1
+        if self.sampling == 0 or self.count % self.sampling != 0:
+            return
+        shape_id = self.shape_ids.get(shape_name)
+        if shape_id is None:
+            shape_id = self.shape_ids[shape_name] = len(self.shape_names)
+            self.shape_names.append(shape_name)
+        self.shapes.append(shape_id)
+        self.results.append(RESULT_CODES[result])
+        self.numbers.append(self.count)
+        self.times.append(time.perf_counter() - self.start)
+
+    def write(self, output_file):
+        """
+        Writes all recorded traces as CSV to the output file, in the order they were recorded.
+
+        :param output_file: file handler for the traces
+        """
+        output_file.write('Shape,Result,Number,Time\n')
+        names = self.shape_names
+        output_file.writelines(
+            ''.join([names[shape], ',', RESULTS[result], ',', str(number), ',', str(elapsed), '\n'])
+            for shape, result, number, elapsed in zip(self.shapes, self.results, self.numbers, self.times)
+        )
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import annotations  # required for typing in older versions of Python
+
+__author__ = 'Philipp D. Rohde'
+
+import json
+import time
+
+from TravSHACL.utils import fileManagement
+
+DEBUG = 10
+INFO = 20
+OFF = 100
+LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'OFF': OFF}
+
+
+class ValidationLog:
+    """Structured log of the validation process. Each record is an event with a level, the time in milliseconds
+       since the start of the log, and named fields; it is written as one JSON object per line. The records are
+       buffered and streamed to 'validation.log' in the output directory. Without an output directory, or with
+       the level 'OFF', the log is disabled and recording an event returns immediately."""
+
+    def __init__(self, output_dir: str = None, level: str = 'INFO', log_queries: bool = True, buffer_size: int = 256):
+        """
+        Creates a new validation log.
+
+        :param output_dir: directory the log file is written to, None disables the log; default: None
+        :param level: minimum level of the recorded events, 'DEBUG', 'INFO', or 'OFF'; default: 'INFO'
+        :param log_queries: indicates whether the query strings are included in the records of executed queries;
+            default: True
+        :param buffer_size: number of records kept in memory before they are written to the file; default: 256
+        """
+        if level not in LEVELS:
+            raise ValueError('Unknown log level: ' + str(level) + ', expected one of ' + ', '.join(LEVELS) + '.')
+        self.output_dir = output_dir
+        self.level = LEVELS[level] if output_dir is not None else OFF
+        self.log_queries = log_queries
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.file = None
+        self.start = time.perf_counter()
+
+    def debug(self, event: str, **fields):
+        """Records an event of level DEBUG, e.g., the details of each saturation round."""
+        if DEBUG >= self.level:
+            self.__record('DEBUG', event, fields)
+
+    def info(self, event: str, **fields):
+        """Records an event of level INFO, e.g., the start of the evaluation of a shape."""
+        if INFO >= self.level:
+            self.__record('INFO', event, fields)
+
+    def query(self, event: str, query: str, **fields):
+        """
+        Records the execution of a query with level INFO.
+
+        :param event: name of the event
+        :param query: the query string, only recorded if enabled
+        :param fields: further fields of the record, e.g., the execution time
+        """
+        if INFO >= self.level:
+            if self.log_queries:
+                fields['query'] = query
+            self.__record('INFO', event, fields)
+
+    def __record(self, level, event, fields):
+        record = {'time': round((time.perf_counter() - self.start) * 1000.0, 3), 'level': level, 'event': event}
+        record.update(fields)
+        self.buffer.append(json.dumps(record, default=str))
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records to the log file; the file is created with the first record."""
+        if not self.buffer:
+            return
+        if self.file is None:
+            self.file = fileManagement.open_file(self.output_dir, 'validation.log')
+        self.file.write('\n'.join(self.buffer) + '\n')
+        self.buffer.clear()
+
+    def close(self):
+        """Writes the remaining records and closes the log file."""
+        self.flush()
+        if self.file is not None:
+            fileManagement.close_file(self.file)
+            self.file = None
@@ -22,10 +22,10 @@ class ValidationStats:
         self.max_saturation_time = 0
         self.total_saturation_time = 0
         self.number_of_queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.totalTime = 0
 
-        self.validation_log = ''
-
     def write_all_stats(self, output_file):
         """
         Writes all collected statistics to the output file.
@@ -40,6 +40,8 @@ class ValidationStats:
         output_file.write('\nmax number of rules in memory:\n' + str(self.max_rules))
         output_file.write('\ntotal number of rules:\n' + str(self.total_rules))
         output_file.write('\nnumber of queries:\n' + str(self.number_of_queries))
+        output_file.write('\nquery cache hits:\n' + str(self.cache_hits))
+        output_file.write('\nquery cache misses:\n' + str(self.cache_misses))
         output_file.write('\nmax exec time for a query:\n' + str(self.max_query_exec_time))
         output_file.write('\ntotal query exec time:\n' + str(self.total_query_exec_time))
         output_file.write('\nmax interleaving (+ query exec) time for a query:\n' + str(self.max_interleaving_time))
@@ -48,6 +50,27 @@ class ValidationStats:
         output_file.write('\ntotal (deferred) saturation time:\n' + str(self.total_saturation_time))
         output_file.write('\ntotal time:\n' + str(self.totalTime) + '\n')
 
+    def merge(self, stats):
+        """
+        Adds the statistics of another validation, e.g., of another connected component of the shape network.
+        The maxima are the maxima of both validations; the number of targets and the total time are not changed.
+
+        :param stats: the ValidationStats instance of the other validation
+        """
+        self.total_sol_mappings += stats.total_sol_mappings
+        self.max_sol_mappings = max(self.max_sol_mappings, stats.max_sol_mappings)
+        self.total_rules += stats.total_rules
+        self.max_rules = max(self.max_rules, stats.max_rules)
+        self.total_query_exec_time += stats.total_query_exec_time
+        self.max_query_exec_time = max(self.max_query_exec_time, stats.max_query_exec_time)
+        self.total_interleaving_time += stats.total_interleaving_time
+        self.max_interleaving_time = max(self.max_interleaving_time, stats.max_interleaving_time)
+        self.total_saturation_time += stats.total_saturation_time
+        self.max_saturation_time = max(self.max_saturation_time, stats.max_saturation_time)
+        self.number_of_queries += stats.number_of_queries
+        self.cache_hits += stats.cache_hits
+        self.cache_misses += stats.cache_misses
+
     def record_number_of_targets(self, valid_count, invalid_count):
         """
         Records the total number of targets for the validation.
@@ -85,6 +108,16 @@ class ValidationStats:
         """Increases the counter for keeping track of the number of queries executed."""
         self.number_of_queries += 1
 
+    def record_cache_lookups(self, hits, misses):
+        """
+        Records the lookups in the query cache.
+
+        :param hits: number of query results served from the cache
+        :param misses: number of query results that had to be retrieved from the endpoint
+        """
+        self.cache_hits += hits
+        self.cache_misses += misses
+
     def record_number_of_sol_mappings(self, k):
         """
         Records the number of solution mappings for the queries executed.
@@ -131,19 +164,3 @@ class ValidationStats:
         :param ms: time in milliseconds passed for the total validation
         """
         self.totalTime = ms
-
-    def update_log(self, log):
-        """
-        Updates the validation log.
-
-        :param log: the new log entry to be added
-        """
-        self.validation_log += log
-
-    def write_validation_log(self, validation_log_output):
-        """
-        Writes the validation log to file.
-
-        :param validation_log_output: file handler for the validation log
-        """
-        validation_log_output.write(self.validation_log)
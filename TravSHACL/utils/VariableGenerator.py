@@ -1,21 +1,20 @@
 # -*- coding: utf-8 -*-
 
-import itertools
 from enum import Enum
 
-i = itertools.count()
-
 
 class VariableGenerator:
-    """Used to create unused variables for the SPARQL queries."""
+    """Used to create unused variables for the SPARQL queries. The variables are numbered per generator,
+       i.e., per shape, hence, the queries of a shape do not depend on the shapes parsed before."""
 
     def __init__(self):
         self.index = 0
 
-    @staticmethod
-    def generate_variable(type_):
+    def generate_variable(self, type_):
         type_ = 'p_'  # *** hardcoded
-        return str(type_) + str(next(i))
+        variable = str(type_) + str(self.index)
+        self.index += 1
+        return variable
 
     @staticmethod
     def get_focus_node_var():
@@ -1,23 +1,45 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Philipp D. Rohde'
 
+import gzip
 import os
 
 
-def open_file(path, filename):
+def open_file(path, filename, compressed=False):
     """
     Opens a file with the given filename at the specified path. If the path does not exist, it will be created.
     The file will be opened in write mode with UTF-8 encoding.
 
     :param path: path where to open the file
     :param filename: name of the file to be opened
+    :param compressed: indicates whether the file is gzip-compressed; default: False
     :return: file handler
     """
     if not os.path.exists(path):
         os.makedirs(path, exist_ok=True)
+    if compressed:
+        return gzip.open(os.path.join(path, filename), 'wt', encoding='utf8', newline='')
     return open(os.path.join(path, filename), 'w', encoding='utf8')
 
 
+def write_lines(file, lines, batch_size=10000):
+    """
+    Writes the lines to the file in batches, i.e., one write per batch instead of one per line.
+
+    :param file: the File object to write to
+    :param lines: iterable over the lines, including their line breaks
+    :param batch_size: number of lines per write; default: 10000
+    """
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            file.write(''.join(batch))
+            batch.clear()
+    if batch:
+        file.write(''.join(batch))
+
+
 def close_file(file):
     """
     Closes the specified file.
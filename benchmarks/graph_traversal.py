@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for the graph traversal algorithms over synthetic shape networks.
+
+Usage: python benchmarks/graph_traversal.py [--sizes 100 1000 5000] [--repeat 3]
+"""
+__author__ = 'Philipp D. Rohde'
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from TravSHACL.core.GraphTraversal import GraphTraversal  # noqa: E402
+
+
+def chain_network(number_of_shapes, rnd):
+    """Each shape refers to the next one, i.e., the worst case for the depth of the traversal."""
+    refs = [(i, i + 1) for i in range(number_of_shapes - 1)]
+    return _network(number_of_shapes, refs)
+
+
+def star_network(number_of_shapes, rnd):
+    """All shapes refer to one central shape."""
+    refs = [(i, 0) for i in range(1, number_of_shapes)]
+    return _network(number_of_shapes, refs)
+
+
+def random_network(number_of_shapes, rnd):
+    """Random shape references with two references per shape on average; usually several connected components."""
+    refs = [(rnd.randrange(number_of_shapes), rnd.randrange(number_of_shapes)) for _ in range(2 * number_of_shapes)]
+    return _network(number_of_shapes, refs)
+
+
+def _network(number_of_shapes, refs):
+    names = ['<http://example.com/shapes/Shape' + str(i) + '>' for i in range(number_of_shapes)]
+    dependencies = {name: [] for name in names}
+    reversed_dependencies = {name: [] for name in names}
+    for source, target in refs:
+        dependencies[names[source]].append(names[target])
+        reversed_dependencies[names[target]].append(names[source])
+    return dependencies, reversed_dependencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark of the graph traversal over synthetic shape networks')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[100, 1000, 5000, 10000],
+                        help='Number of shapes of the synthetic networks')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per configuration, the best is reported')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the random networks')
+    args = parser.parse_args()
+
+    print('network  shapes  traversal  best time [ms]')
+    for network in (chain_network, star_network, random_network):
+        for size in args.sizes:
+            dependencies, reversed_dependencies = network(size, random.Random(args.seed))
+            starting_point = next(iter(dependencies))
+            for graph_traversal in (GraphTraversal.DFS, GraphTraversal.BFS):
+                times = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    order = graph_traversal.traverse_graph(dependencies, reversed_dependencies, starting_point)
+                    times.append((time.perf_counter() - start) * 1000.0)
+                    assert len(order) == size
+                print('{:<8} {:>6}  {:<9}  {:>14.2f}'.format(network.__name__.split('_')[0], size,
+                                                             graph_traversal.name, min(times)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of parsing SHACL shapes graphs with triple pattern lookups compared to SPARQL queries per shape.
+Uses the LUBM shapes of the examples and synthetic shape schemas.
+
+Usage: python benchmarks/shape_parser.py [--sizes 50 1000 10000] [--query-limit 50] [--repeat 3]
+"""
+__author__ = 'Philipp D. Rohde'
+
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+from rdflib import BNode, Graph, Literal, Namespace, RDF
+from rdflib.collection import Collection
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from TravSHACL.core.ShapeParser import ShapeParser  # noqa: E402
+
+SH = Namespace('http://www.w3.org/ns/shacl#')
+EX = Namespace('http://example.com/')
+SHAPES = Namespace('http://example.com/shapes/')
+LUBM_SHAPES = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'example', 'shapes', 'LUBM')
+
+
+def synthetic_shapes(number_of_shapes, rnd):
+    """
+    Generates a shapes graph with the given number of node shapes. Every tenth shape has a target node, all others
+    a target class. Each shape has up to four property constraints, i.e., cardinality constraints on plain, inverse,
+    and sequence paths, references to other shapes via qualified value shapes, and some use sh:or or SPARQL
+    constraints. Shapes with a target node only have minimum cardinality constraints.
+    """
+    g = Graph()
+    for i in range(number_of_shapes):
+        shape = SHAPES['Shape' + str(i)]
+        g.add((shape, RDF.type, SH.NodeShape))
+        node_target = i % 10 == 9
+        if node_target:
+            g.add((shape, SH.targetNode, EX['node' + str(i)]))
+        else:
+            g.add((shape, SH.targetClass, EX['Class' + str(i)]))
+        if i % 50 == 7:
+            g.add((shape, SH.targetQuery, Literal('SELECT ?x WHERE { ?x a <' + str(EX['Class' + str(i)]) + '> }')))
+
+        for j in range(rnd.randint(1, 4)):
+            prop = BNode()
+            g.add((shape, SH.property, prop))
+            kind = rnd.random()
+            if kind < 0.15:
+                path = BNode()
+                g.add((path, SH.inversePath, EX['p' + str(j)]))
+            elif kind < 0.25:
+                path = BNode()
+                Collection(g, path, [EX['p' + str(j)], EX['q' + str(j)]])
+            else:
+                path = EX['p' + str(j)]
+            g.add((prop, SH.path, path))
+            if node_target:  # qualified value shapes require a target query
+                g.add((prop, SH.minCount, Literal(1)))
+            elif rnd.random() < 0.3:
+                qvs = BNode()
+                g.add((prop, SH.qualifiedValueShape, qvs))
+                g.add((qvs, SH.node, SHAPES['Shape' + str(rnd.randrange(number_of_shapes))]))
+                g.add((prop, SH.qualifiedMinCount, Literal(1)))
+            elif rnd.random() < 0.05:
+                qvs = BNode()
+                g.add((prop, SH.qualifiedValueShape, qvs))
+                g.add((qvs, SH.value, EX['value' + str(j)]))
+                g.add((prop, SH.qualifiedMinCount, Literal(1)))
+            elif rnd.random() < 0.1:
+                g.add((prop, SH.minCount, Literal(1)))
+                g.add((prop, SH.maxCount, Literal(1)))
+            else:
+                g.add((prop, SH.minCount, Literal(rnd.randint(1, 3))))
+                if rnd.random() < 0.4:
+                    g.add((prop, SH.maxCount, Literal(rnd.randint(3, 5))))
+
+        if i % 25 == 3:
+            options = []
+            for j in range(2):
+                option = BNode()
+                g.add((option, SH.path, EX['or' + str(j)]))
+                g.add((option, SH.minCount, Literal(1)))
+                options.append(option)
+            or_list = BNode()
+            Collection(g, or_list, options)
+            g.add((shape, SH['or'], or_list))
+        if i % 40 == 5:
+            constraint = BNode()
+            g.add((shape, SH.sparql, constraint))
+            g.add((constraint, SH.select, Literal('SELECT $this WHERE { $this <' + str(EX.p0) + '> ?o . '
+                                                  'FILTER (?o < 0) }')))
+    return g
+
+
+def lubm_shapes():
+    """Returns the shapes graphs of the LUBM shape schema of the examples, one per file."""
+    return [Graph().parse(path) for path in sorted(glob.glob(os.path.join(LUBM_SHAPES, '*.ttl')))]
+
+
+def time_parser(use_index, graphs, repeat):
+    times = []
+    for _ in range(repeat):
+        parser = ShapeParser(ignore_errors=True, use_index=use_index)
+        start = time.perf_counter()
+        for g in graphs:
+            parser.parse_ttl(g, True, 256, False)
+        times.append((time.perf_counter() - start) * 1000.0)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the SHACL shapes parser')
+    parser.add_argument('--sizes', nargs='*', type=int, default=[50, 1000, 10000],
+                        help='Number of shapes of the synthetic shape schemas')
+    parser.add_argument('--query-limit', dest='queryLimit', type=int, default=50,
+                        help='Largest synthetic schema parsed with SPARQL queries, larger ones take too long')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per configuration, the best is reported')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic shape schemas')
+    args = parser.parse_args()
+
+    print('schema      shapes  triples  SPARQL queries [ms]  triple lookups [ms]')
+    workloads = [('LUBM', lubm_shapes())] + \
+                [('synthetic', [synthetic_shapes(size, random.Random(args.seed))]) for size in args.sizes]
+    for name, graphs in workloads:
+        number_of_shapes = sum(len(set(g.subjects(RDF.type, SH.NodeShape))) for g in graphs)
+        triples = sum(len(g) for g in graphs)
+        query_time = time_parser(False, graphs, args.repeat) \
+            if name == 'LUBM' or number_of_shapes <= args.queryLimit else None
+        index_time = time_parser(True, graphs, args.repeat)
+        print('{:<10} {:>7} {:>8}  {:>19}  {:>19.1f}'.format(
+            name, number_of_shapes, triples, '-' if query_time is None else '{:.1f}'.format(query_time), index_time))
+
+
+if __name__ == '__main__':
+    main()
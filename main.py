@@ -24,8 +24,8 @@ if __name__ == '__main__':
                         help='SPARQL Endpoint')
     parser.add_argument('outputDir', metavar='outputDir', type=str, default=None,
                         help='Name of the directory where results of validation will be saved')
-    parser.add_argument(dest='graphTraversal', type=str, default='DFS', choices=['BFS', 'DFS'],
-                        help='The algorithm used for graph traversal (BFS / DFS)')
+    parser.add_argument(dest='graphTraversal', type=str, default='DFS', choices=['BFS', 'DFS', 'COST'],
+                        help='The algorithm used for graph traversal (BFS / DFS / COST)')
 
     parser.add_argument('--heuristics', nargs='*', type=str, default=[],
                         help='TARGET if shapes with target definition should be prioritized\n'
@@ -50,7 +50,123 @@ if __name__ == '__main__':
     parser.add_argument('-f', '--force', action='store_true', default=False,
                         help='Ignore parsing errors, log a warning instead', required=False)
 
+    parser.add_argument('--pool-size', dest='poolSize', metavar='poolSize', type=int, default=4,
+                        help='Number of persistent HTTP connections to the SPARQL endpoint (0 disables pooling)',
+                        required=False)
+
+    parser.add_argument('--endpoint-timeout', dest='endpointTimeout', metavar='endpointTimeout', type=float,
+                        default=None, help='Timeout of the requests to the SPARQL endpoint in seconds', required=False)
+
+    parser.add_argument('--compress-requests', dest='compressRequests', action='store_true', default=False,
+                        help='Send the queries gzip-compressed to the SPARQL endpoint (requires --pool-size > 0)',
+                        required=False)
+
+    parser.add_argument('--workers', metavar='workers', type=int, default=4,
+                        help='Max number of query partitions sent to the SPARQL endpoint at the same time',
+                        required=False)
+
+    parser.add_argument('--result-format', dest='resultFormat', metavar='resultFormat', default='json',
+                        choices=['json', 'tsv', 'csv'],
+                        help='Result format requested from the SPARQL endpoint (json, tsv, or csv)', required=False)
+
+    parser.add_argument('--cache-dir', dest='cacheDir', metavar='cacheDir', type=str, default=None,
+                        help='Directory of the on-disk query result cache (caching is disabled if not given)',
+                        required=False)
+
+    parser.add_argument('--cache-size', dest='cacheSize', metavar='cacheSize', type=int, default=256,
+                        help='Max size of the query result cache in MB', required=False)
+
+    parser.add_argument('--data-version', dest='dataVersion', metavar='dataVersion', type=str, default=None,
+                        help='Token identifying the version of the data; cached results of other versions are not used',
+                        required=False)
+
+    parser.add_argument('--bypass-cache', dest='bypassCache', action='store_true', default=False,
+                        help='Ignore cached query results but refresh the cache with the new results', required=False)
+
+    parser.add_argument('--sparql-batch-size', dest='sparqlBatchSize', metavar='sparqlBatchSize', type=int, default=100,
+                        help='Max number of focus nodes checked by one query of a SPARQL constraint (1 disables batching)',
+                        required=False)
+
+    parser.add_argument('--max-query-size', dest='maxQuerySize', metavar='maxQuerySize', type=int, default=8192,
+                        help='Max size of a query sent to the SPARQL endpoint, lists of instances are split accordingly',
+                        required=False)
+
+    parser.add_argument('--query-size-unit', dest='querySizeUnit', metavar='querySizeUnit', default='chars',
+                        choices=['chars', 'bytes'], help='Unit of the max query size (chars or bytes)', required=False)
+
+    parser.add_argument('--probe-query-size', dest='probeQuerySize', action='store_true', default=False,
+                        help='Determine the max query size accepted by the SPARQL endpoint, bounded by --max-query-size',
+                        required=False)
+
+    parser.add_argument('--page-size', dest='pageSize', metavar='pageSize', type=int, default=0,
+                        help='Number of targets retrieved per query (0 disables the pagination of target queries)',
+                        required=False)
+
+    parser.add_argument('--pagination', metavar='pagination', default='keyset', choices=['keyset', 'offset'],
+                        help='Pagination mode for target queries (keyset or offset)', required=False)
+
+    parser.add_argument('--parallel', action='store_true', default=False,
+                        help='Send the queries of upcoming independent shapes while the current shape is evaluated',
+                        required=False)
+
+    parser.add_argument('--shape-workers', dest='shapeWorkers', metavar='shapeWorkers', type=int, default=4,
+                        help='Max number of queries of upcoming shapes sent at the same time with --parallel',
+                        required=False)
+
+    parser.add_argument('--component-workers', dest='componentWorkers', metavar='componentWorkers', type=int,
+                        default=1, help='Max number of processes validating connected components of the shape '
+                                        'network at the same time (1 validates them one after another)',
+                        required=False)
+
+    parser.add_argument('--schema-cache-dir', dest='schemaCacheDir', metavar='schemaCacheDir', type=str, default=None,
+                        help='Directory of the compiled shape schema cache (caching is disabled if not given)',
+                        required=False)
+
+    parser.add_argument('--parse-workers', dest='parseWorkers', metavar='parseWorkers', type=int, default=1,
+                        help='Max number of processes parsing shape files at the same time (1 parses them one after '
+                             'another)', required=False)
+
+    parser.add_argument('--log-level', dest='logLevel', metavar='logLevel', default='INFO',
+                        choices=['DEBUG', 'INFO', 'OFF'], help='Min level of the events written to the validation log '
+                                                               '(DEBUG, INFO, or OFF)', required=False)
+
+    parser.add_argument('--omit-queries', dest='omitQueries', action='store_true', default=False,
+                        help='Do not include the query strings in the validation log', required=False)
+
+    parser.add_argument('--trace-sampling', dest='traceSampling', metavar='traceSampling', type=int, default=1,
+                        help='Record the trace of every n-th target classification (0 disables the traces)',
+                        required=False)
+
+    parser.add_argument('--report-format', dest='reportFormat', metavar='reportFormat', default='ttl',
+                        choices=['ttl', 'nt', 'ndjson', 'csv.gz'],
+                        help='Format of the validation report (ttl, nt, ndjson, or csv.gz)', required=False)
+
+    parser.add_argument('--max-violations', dest='maxViolations', metavar='maxViolations', type=int, default=0,
+                        help='Stop the validation once this number of violations is found (0 validates all shapes)',
+                        required=False)
+
+    parser.add_argument('--stop-after-shape', dest='stopAfterShape', metavar='stopAfterShape', default=None,
+                        help='Stop the validation once all targets of this shape are classified', required=False)
+
+    parser.add_argument('--deadline', dest='deadline', metavar='deadline', type=float, default=None,
+                        help='Time budget of the validation in seconds; afterwards, no further queries are sent and '
+                             'the targets classified so far are reported', required=False)
+
+    parser.add_argument('--snapshot', metavar='snapshot', type=str, default=None,
+                        help='File of the validation snapshot; a complete validation saves its classifications to it',
+                        required=False)
+
+    parser.add_argument('--added', metavar='added', type=str, default=None,
+                        help='N-Triples file with the triples added since the snapshot; the focus nodes affected by '
+                             'the change are validated again', required=False)
+
+    parser.add_argument('--removed', metavar='removed', type=str, default=None,
+                        help='N-Triples file with the triples removed since the snapshot; the focus nodes affected by '
+                             'the change are validated again', required=False)
+
     args = parser.parse_args()
+    if (args.added is not None or args.removed is not None) and args.snapshot is None:
+        parser.error('--added and --removed require --snapshot')
     eval_shape_schema(args)
 
     end = time.time()
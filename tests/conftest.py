@@ -0,0 +1,69 @@
+import gzip
+import json
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from TravSHACL.sparql.HTTPTransport import RESULTS_JSON
+
+RESULT = {'head': {'vars': ['x']}, 'results': {'bindings': [{'x': {'type': 'uri', 'value': 'http://example.com/a'}}]}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Answers each query with RESULT and records the requests; the behavior is configured via the server."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        query = parse_qs(body.decode('utf-8'))['query'][0]
+        server.requests.append((self.client_address, query, self.headers.get('Content-Encoding')))
+        if server.max_query_size is not None and len(query) > server.max_query_size:
+            self.send_response(413)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = json.dumps(RESULT).encode('utf-8')
+        if server.response_encoding == 'gzip':
+            data = gzip.compress(data)
+        elif server.response_encoding == 'deflate':
+            data = zlib.compress(data)
+        elif server.response_encoding == 'raw-deflate':
+            compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            data = compressor.compress(data) + compressor.flush()
+        self.send_response(200)
+        self.send_header('Content-Type', RESULTS_JSON)
+        if server.response_encoding is not None:
+            self.send_header('Content-Encoding', server.response_encoding.replace('raw-', ''))
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if server.drop_connections:
+            self.close_connection = True  # closed without 'Connection: close', i.e., the client keeps a stale one
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """Local SPARQL endpoint answering each query with RESULT, see _Handler."""
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.requests = []
+    httpd.response_encoding = None
+    httpd.drop_connections = False
+    httpd.max_query_size = None  # longer queries are rejected with HTTP 413
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server):
+    return 'http://127.0.0.1:' + str(server.server_address[1]) + '/sparql'
@@ -1,12 +1,22 @@
+import csv
+import gzip
 import json
+import time
 from glob import glob
 
 import pytest
-from rdflib import Graph
+from rdflib import Graph, RDF, URIRef
 
-from TravSHACL import parse_heuristics
+import TravSHACL.core.SchemaCache as schema_cache
+from TravSHACL import ChangeSet, ValidationSnapshot, parse_heuristics
 from TravSHACL.core.GraphTraversal import GraphTraversal
+from TravSHACL.core.SchemaCache import SchemaCache
+from TravSHACL.core.ShapeParser import ShapeParser
 from TravSHACL.core.ShapeSchema import ShapeSchema
+from TravSHACL.rule_based_validation.InstancesRetrieval import InstancesRetrieval
+from TravSHACL.sparql.ClientRegistry import ClientRegistry
+from TravSHACL.sparql.EndpointStatistics import EndpointStatistics
+from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
 
 TEST_ENDPOINT = 'http://localhost:8899/sparql'
 TEST_GRAPH = Graph().parse('./tests/data/test.ttl')
@@ -49,8 +59,694 @@ def test_case(file, selective, graph_traversal, prio_target, prio_degree, prio_n
         order_by_in_queries=False,
         save_outputs=False
     )
+    check_result(shape_schema.validate(), gt_valid, gt_invalid)
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+@pytest.mark.parametrize('query_workers', [1, 4])
+@pytest.mark.parametrize('endpoint', [TEST_ENDPOINT, TEST_GRAPH])
+def test_case_query_workers(file, selective, query_workers, endpoint):
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    def validate(workers):
+        # each instance is sent in a partition of its own, hence, the constraint queries have many partitions
+        return ShapeSchema(
+            schema_dir=test_definition['schemaDir'],
+            endpoint=endpoint,
+            use_selective_queries=selective,
+            max_query_size=1,
+            query_workers=workers
+        ).validate()
+
+    result = validate(query_workers)
+    assert result == validate(1)
+    check_result(result,
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+@pytest.mark.parametrize('shape_format', ['JSON', 'SHACL'])
+@pytest.mark.parametrize('endpoint', [TEST_ENDPOINT, TEST_GRAPH])
+def test_case_cost_based(file, selective, shape_format, endpoint):
+    if 'sparql' in file and shape_format == 'JSON':
+        pytest.skip('SPARQL constraints in JSON format are not implemented.')
+    if 'or_constraint' in file and shape_format == 'JSON':
+        pytest.skip('OR constraints in JSON format are not implemented.')
+
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        schema_format=shape_format,
+        endpoint=endpoint,
+        graph_traversal=GraphTraversal.COST,
+        use_selective_queries=selective,
+        max_split_size=256
+    )
+    check_result(shape_schema.validate(),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+
+
+def test_cost_based_statistics_collected_once(monkeypatch):
+    collected = []
+    collect = EndpointStatistics.collect
+    monkeypatch.setattr(EndpointStatistics, 'collect', lambda self, shapes: collected.append(shapes) or collect(self, shapes))
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+    shape_schema = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=TEST_GRAPH,
+                               graph_traversal=GraphTraversal.COST)
+    gt_valid = sorted(test_definition['groundTruth']['valid'])
+    gt_invalid = sorted(test_definition['groundTruth']['invalid'])
+    check_result(shape_schema.validate(), gt_valid, gt_invalid)
+    check_result(shape_schema.validate(), gt_valid, gt_invalid)
+    for _ in shape_schema.iter_validate():
+        pass
+    assert len(collected) == 1
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+@pytest.mark.parametrize('graph_traversal', [GraphTraversal.DFS, GraphTraversal.BFS])
+def test_case_parallel(file, selective, graph_traversal, monkeypatch):
+    # only SPARQL endpoints accessed via a URL are queried in parallel, in-memory graphs are evaluated as before
+    prefetching = []
+    close = InstancesRetrieval.close
+    monkeypatch.setattr(InstancesRetrieval, 'close', lambda self, wait=True:
+                        prefetching.append(self.prefetch_executor is not None) or close(self, wait))
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=TEST_ENDPOINT,
+        graph_traversal=graph_traversal,
+        use_selective_queries=selective,
+        work_in_parallel=True,
+        shape_workers=2
+    )
+    check_result(shape_schema.validate(),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+    assert prefetching and all(prefetching)
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+@pytest.mark.parametrize('graph_traversal', [GraphTraversal.DFS, GraphTraversal.BFS, GraphTraversal.COST])
+@pytest.mark.parametrize('endpoint', [TEST_ENDPOINT, TEST_GRAPH])
+def test_case_components(file, selective, graph_traversal, endpoint):
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=endpoint,
+        graph_traversal=graph_traversal,
+        use_selective_queries=selective,
+        component_workers=2
+    )
+    check_result(shape_schema.validate(),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+
+
+@pytest.mark.parametrize('save_outputs', [True, False])
+def test_components_output_dir(save_outputs, tmp_path):
+    # the merged outputs of the components are saved like the outputs of a validation in one process
+    with open('./tests/cases/components/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+    for component_workers in [1, 2]:
+        ShapeSchema(
+            schema_dir=test_definition['schemaDir'],
+            endpoint=TEST_GRAPH,
+            output_dir=str(tmp_path / str(component_workers)),
+            save_outputs=save_outputs,
+            report_format='nt',
+            component_workers=component_workers
+        ).validate()
+    assert (tmp_path / '2' / 'component1' / 'validation.log').exists()
+    assert (tmp_path / '2' / 'component2' / 'validation.log').exists()
+    files = ['stats.txt', 'validationReport.nt'] + (['targets_valid.log', 'targets_violated.log'] if save_outputs else [])
+    # the validation log and the traces are only saved per component
+    assert {f.name for f in (tmp_path / '2').iterdir() if f.is_file()} == \
+        {f.name for f in (tmp_path / '1').iterdir() if f.is_file()} - {'validation.log', 'traces.csv'}
+    for name in files:
+        with open(tmp_path / '1' / name, 'r') as f1, open(tmp_path / '2' / name, 'r') as f2:
+            lines1, lines2 = f1.read().splitlines(), f2.read().splitlines()
+        if name == 'stats.txt':  # the number of targets
+            assert lines2[:6] == lines1[:6]
+        elif name == 'validationReport.nt':
+            assert len(Graph().parse(data='\n'.join(lines2), format='nt')) == \
+                len(Graph().parse(data='\n'.join(lines1), format='nt'))
+        else:
+            assert sorted(lines2) == sorted(lines1)
+
+
+def test_components_client_registry():
+    # the worker processes validate the components with connections of their own
+    with open('./tests/cases/components/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+    registry = ClientRegistry()
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=TEST_ENDPOINT,
+        use_selective_queries=False,
+        client_registry=registry,
+        component_workers=2
+    )
+    check_result(shape_schema.validate(),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+    registry.close()
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+@pytest.mark.parametrize('shape_format', ['JSON', 'SHACL'])
+def test_case_schema_cache(file, selective, shape_format, tmp_path):
+    if 'sparql' in file and shape_format == 'JSON':
+        pytest.skip('SPARQL constraints in JSON format are not implemented.')
+    if 'or_constraint' in file and shape_format == 'JSON':
+        pytest.skip('OR constraints in JSON format are not implemented.')
+
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    for _ in range(2):  # the first run compiles the shape schema, the second one loads it from the cache
+        shape_schema = ShapeSchema(
+            schema_dir=test_definition['schemaDir'],
+            schema_format=shape_format,
+            endpoint=TEST_GRAPH,
+            use_selective_queries=selective,
+            schema_cache_dir=str(tmp_path)
+        )
+        check_result(shape_schema.validate(),
+                     sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_schema_cache_key_version(monkeypatch):
+    files = glob('./tests/cases/two_shapes/case1/shapes/*.ttl')
+    key = SchemaCache.key(files, {'selective': True})
+    assert SchemaCache.key(files, {'selective': True}) == key
+    assert SchemaCache.key(files, {'selective': False}) != key
+    assert schema_cache.PACKAGE_VERSION is not None
+    monkeypatch.setattr(schema_cache, 'PACKAGE_VERSION', schema_cache.PACKAGE_VERSION + '.post1')
+    assert SchemaCache.key(files, {'selective': True}) != key
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('shape_format', ['JSON', 'SHACL'])
+def test_case_parse_workers(file, shape_format, tmp_path):
+    if 'sparql' in file and shape_format == 'JSON':
+        pytest.skip('SPARQL constraints in JSON format are not implemented.')
+    if 'or_constraint' in file and shape_format == 'JSON':
+        pytest.skip('OR constraints in JSON format are not implemented.')
+
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        schema_format=shape_format,
+        endpoint=TEST_GRAPH,
+        output_dir=str(tmp_path),
+        parse_workers=2
+    )
+    sequential_parser = ShapeParser()
+    shapes = sequential_parser.parse_shapes_from_dir(test_definition['schemaDir'], shape_format, True, 256, False)
+    assert [s.get_id() for s in shape_schema.shapes] == [s.get_id() for s in shapes]
+    for s in shapes:
+        s.compute_constraint_queries()
+    for s in shape_schema.shapes:
+        s.compute_constraint_queries()
+    # the shapes parsed in the worker processes have the same queries as the ones parsed one after another
+    assert [(s.targetQuery, s.minQuery.sparql if s.minQuery is not None else None, [q.sparql for q in s.maxQueries])
+            for s in shape_schema.shapes] == \
+        [(s.targetQuery, s.minQuery.sparql if s.minQuery is not None else None, [q.sparql for q in s.maxQueries])
+         for s in shapes]
+    assert list(shape_schema.parseTimes.keys()) == list(sequential_parser.parse_times.keys())
+    assert (tmp_path / 'parse_times.csv').exists()
+    check_result(shape_schema.validate(),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+def test_case_iter_validate(file, selective):
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=TEST_GRAPH,
+        use_selective_queries=selective
+    )
+    events = list(shape_schema.iter_validate())
+    assert all(event.result in ('valid', 'violated') for event in events)
+    assert all(event.classified_by is not None or event.result == 'valid' for event in events)
+    assert len({(event.shape, event.focus_node) for event in events}) == len(events)  # each target only once
+    assert sorted(event.focus_node for event in events if event.result == 'valid') == \
+        sorted(test_definition['groundTruth']['valid'])
+    assert sorted(event.focus_node for event in events if event.result == 'violated') == \
+        sorted(test_definition['groundTruth']['invalid'])
+
+
+def test_iter_validate_stopped():
+    shape_schema = ShapeSchema(schema_dir='./tests/cases/two_shapes/case1/shapes', endpoint=TEST_GRAPH)
+    events = shape_schema.iter_validate(buffer_size=1)
+    first = next(events)
+    events.close()  # stops the validation
+    assert first.result in ('valid', 'violated')
+
+
+def test_validate_on_event():
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=TEST_GRAPH, component_workers=2)
+    events = []
+    result = shape_schema.validate(on_event=events.append)
+    check_result(result,
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+    assert sorted(event.focus_node for event in events) == \
+        sorted(test_definition['groundTruth']['valid'] + test_definition['groundTruth']['invalid'])
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+@pytest.mark.parametrize('max_violations', [1, 2])
+def test_case_max_violations(file, selective, max_violations):
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=TEST_GRAPH,
+        use_selective_queries=selective,
+        max_violations=max_violations
+    )
+    result = shape_schema.validate()
+    gt_valid = sorted(test_definition['groundTruth']['valid'])
+    gt_invalid = sorted(test_definition['groundTruth']['invalid'])
+    if len(gt_invalid) < max_violations:
+        assert 'unclassified' not in result  # the limit is never reached, hence, the result is complete
+        check_result(result, gt_valid, gt_invalid)
+        return
+
+    unclassified = result.pop('unclassified', None)
+    valid, invalid = classified_targets(result)
+    assert len(invalid) >= max_violations
+    assert set(valid) <= set(gt_valid)
+    assert set(invalid) <= set(gt_invalid)
+    if unclassified is None:
+        check_result(result, gt_valid, gt_invalid)
+    else:
+        assert result['unbound']['valid_instances'] == set()
+        pending = {target[1] for target in unclassified['pending_instances']}
+        assert pending <= set(gt_valid + gt_invalid) - set(valid + invalid)
+        assert unclassified['unevaluated_shapes'] <= set(shape_schema.shapesDict)
+
+
+@pytest.mark.parametrize('selective', [True, False])
+@pytest.mark.parametrize('stop_after_shape', ['<http://test.example.com/shapes/ClassB>',
+                                              '<http://test.example.com/shapes/ClassC>'])
+def test_stop_after_shape(selective, stop_after_shape):
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+
+    def shape_results(result):
+        return {(target[1], result_type) for value in result.values() for result_type, targets in value.items()
+                for target in targets if target[0] == stop_after_shape}
+
+    complete = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=TEST_GRAPH,
+                           use_selective_queries=selective).validate()
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=TEST_GRAPH,
+        use_selective_queries=selective,
+        stop_after_shape=stop_after_shape
+    )
+    result = shape_schema.validate()
+    unclassified = result.pop('unclassified', {'pending_instances': set(), 'unevaluated_shapes': set()})
+    assert stop_after_shape not in unclassified['unevaluated_shapes']
+    assert all(target[0] != stop_after_shape for target in unclassified['pending_instances'])
+    valid, invalid = classified_targets(result)
+    assert set(valid) <= set(test_definition['groundTruth']['valid'])
+    assert set(invalid) <= set(test_definition['groundTruth']['invalid'])
+    assert shape_results(result) == shape_results(complete)
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+def test_case_deadline(file, selective, monkeypatch):
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+    gt_valid = sorted(test_definition['groundTruth']['valid'])
+    gt_invalid = sorted(test_definition['groundTruth']['invalid'])
+
+    clock = [0.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+
+    def pass_deadline(event):  # the deadline passes while the first shape is evaluated
+        if event.classified_by is not None:
+            clock[0] = 20.0
+
+    shape_schema = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=TEST_GRAPH,
+                               use_selective_queries=selective)
+    result = shape_schema.validate(on_event=pass_deadline, deadline=10)
+    unclassified = result.pop('unclassified', None)
+    if unclassified is None:  # the deadline passed during the last shape
+        check_result(result, gt_valid, gt_invalid)
+        return
+    valid, invalid = classified_targets(result)
+    assert set(valid) <= set(gt_valid)
+    assert set(invalid) <= set(gt_invalid)
+    assert result['unbound']['valid_instances'] == set()
+    pending = {target[1] for target in unclassified['pending_instances']}
+    assert pending <= set(gt_valid + gt_invalid) - set(valid + invalid)
+    assert len(unclassified['unevaluated_shapes']) > 0
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+@pytest.mark.parametrize('selective', [True, False])
+def test_case_deadline_target_pages(file, selective, monkeypatch):
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+    gt_valid = sorted(test_definition['groundTruth']['valid'])
+    gt_invalid = sorted(test_definition['groundTruth']['invalid'])
+
+    clock = [0.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+    late_queries = []
+    run_query_rows = SPARQLEndpoint.run_query_rows
+
+    def pass_deadline(self, query_string, use_cache=True):  # the deadline passes after the second page of targets
+        if clock[0] > 10:
+            late_queries.append(query_string)
+        elif 'FILTER (STR(?x) >' in query_string:
+            clock[0] = 20.0
+        return run_query_rows(self, query_string, use_cache)
+    monkeypatch.setattr(SPARQLEndpoint, 'run_query_rows', pass_deadline)
+
+    shape_schema = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=TEST_GRAPH,
+                               use_selective_queries=selective, target_page_size=1)
+    result = shape_schema.validate(deadline=10)
+    assert late_queries == []
+    unclassified = result.pop('unclassified', None)
+    if unclassified is None:  # no target query with more than one target
+        check_result(result, gt_valid, gt_invalid)
+        return
+    valid, invalid = classified_targets(result)
+    assert set(valid) <= set(gt_valid)
+    assert set(invalid) <= set(gt_invalid)
+    pending = {target[1] for target in unclassified['pending_instances']}
+    assert pending <= set(gt_valid + gt_invalid) - set(valid + invalid)
+    assert len(unclassified['unevaluated_shapes']) > 0
+
+
+def test_deadline_passed():
+    shape_schema = ShapeSchema(schema_dir='./tests/cases/two_shapes/case1/shapes', endpoint=TEST_GRAPH)
+    result = shape_schema.validate(deadline=0)
+    assert result['unclassified']['unevaluated_shapes'] == set(shape_schema.shapesDict)
+    assert all(len(result[name]['valid_instances'] | result[name]['invalid_instances']) == 0
+               for name in shape_schema.shapesDict)
+    with pytest.raises(ValueError):
+        shape_schema.validate(deadline=-1)
+
+
+def test_early_termination_arguments():
+    with pytest.raises(ValueError):
+        ShapeSchema(schema_dir='./tests/cases/two_shapes/case1/shapes', endpoint=TEST_GRAPH, max_violations=-1)
+    with pytest.raises(ValueError):
+        ShapeSchema(schema_dir='./tests/cases/two_shapes/case1/shapes', endpoint=TEST_GRAPH,
+                    stop_after_shape='<http://example.org/Unknown>')
+
+
+@pytest.mark.parametrize('log_level', ['DEBUG', 'INFO', 'OFF'])
+@pytest.mark.parametrize('log_queries', [True, False])
+def test_validation_log(log_level, log_queries, tmp_path):
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=TEST_GRAPH,
+        output_dir=str(tmp_path),
+        log_level=log_level,
+        log_queries=log_queries
+    )
+    check_result(shape_schema.validate(),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+
+    if log_level == 'OFF':
+        assert not (tmp_path / 'validation.log').exists()
+        return
+    with open(tmp_path / 'validation.log', 'r') as f:
+        records = [json.loads(line) for line in f]
+    events = [record['event'] for record in records]
+    assert events[0] == 'node_order' and events[-1] == 'targets_classified'
+    assert {record['level'] for record in records} == ({'DEBUG', 'INFO'} if log_level == 'DEBUG' else {'INFO'})
+    queries = [record for record in records if record['event'] in ('target_query', 'constraint_query')]
+    assert queries and all(('query' in record) == log_queries for record in queries)
+
+
+def test_shape_schemas_with_different_endpoints():
+    # each shape schema keeps its own endpoint, even if several schemas are created before validating
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+    shape_schemas = [ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=endpoint)
+                     for endpoint in [TEST_GRAPH, Graph(), TEST_GRAPH]]
+    assert len({id(shape_schema.endpoint) for shape_schema in shape_schemas}) == 3
+    gt_valid = sorted(test_definition['groundTruth']['valid'])
+    gt_invalid = sorted(test_definition['groundTruth']['invalid'])
+    check_result(shape_schemas[0].validate(), gt_valid, gt_invalid)
+    check_result(shape_schemas[1].validate(), [], [])
+    check_result(shape_schemas[2].validate(), gt_valid, gt_invalid)
+
+
+def test_validation_log_level():
+    with pytest.raises(ValueError):
+        ShapeSchema(schema_dir='./tests/cases/two_shapes/case1/shapes', endpoint=TEST_GRAPH, log_level='TRACE')
+
+
+@pytest.mark.parametrize('trace_sampling', [0, 1, 3])
+def test_traces(trace_sampling, tmp_path):
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        endpoint=TEST_GRAPH,
+        output_dir=str(tmp_path),
+        trace_sampling=trace_sampling
+    )
+    check_result(shape_schema.validate(),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+
+    if trace_sampling == 0:
+        assert not (tmp_path / 'traces.csv').exists()
+        return
+    with open(tmp_path / 'traces.csv', 'r') as f:
+        lines = f.read().splitlines()
+    assert lines[0] == 'Shape,Result,Number,Time'
+    traces = [line.split(',') for line in lines[1:]]
+    classifications = len(test_definition['groundTruth']['valid']) + len(test_definition['groundTruth']['invalid'])
+    assert len(traces) == classifications // trace_sampling
+    assert [int(trace[2]) for trace in traces] == list(range(trace_sampling, classifications + 1, trace_sampling))
+    assert all(trace[1] in ('valid', 'violated') for trace in traces)
+    times = [float(trace[3]) for trace in traces]
+    assert times == sorted(times)
+
+
+@pytest.mark.parametrize('report_format', ['nt', 'ndjson', 'csv.gz'])
+@pytest.mark.parametrize('shape_format', ['JSON', 'SHACL'])
+def test_report_format(report_format, shape_format, tmp_path):
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+
+    shape_schema = ShapeSchema(
+        schema_dir=test_definition['schemaDir'],
+        schema_format=shape_format,
+        endpoint=TEST_GRAPH,
+        output_dir=str(tmp_path),
+        report_format=report_format
+    )
     result = shape_schema.validate()
+    check_result(result,
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+    violations = sorted((shape, focus_node) for shape, res in result.items() if shape != 'unbound'
+                        for _, focus_node, _ in res['invalid_instances'])
+
+    if report_format == 'nt':
+        report = Graph().parse(str(tmp_path / 'validationReport.nt'), format='nt')
+        sh = 'http://www.w3.org/ns/shacl#'
+        results = list(report.objects(None, URIRef(sh + 'result')))
+        assert sorted((str(report.value(r, URIRef(sh + 'sourceShape'))).strip('<>'),
+                       str(report.value(r, URIRef(sh + 'focusNode')))) for r in results) == \
+            sorted((shape.strip('<>'), focus_node) for shape, focus_node in violations)
+        assert not next(report.objects(None, URIRef(sh + 'conforms'))).toPython()
+    elif report_format == 'ndjson':
+        with open(tmp_path / 'validationReport.ndjson', 'r') as f:
+            records = [json.loads(line) for line in f]
+        assert sorted((record['sourceShape'], record['focusNode']) for record in records) == violations
+    else:
+        with gzip.open(tmp_path / 'validationReport.csv.gz', 'rt', newline='') as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ['FocusNode', 'SourceShape']
+        assert sorted((shape, focus_node) for focus_node, shape in rows[1:]) == violations
+
+
+def test_long_recursive_chain(tmp_path):
+    # each person needs to know a valid person, the last one of the chain knows nobody, hence, all are invalid;
+    # the saturation needs to propagate the violation through the whole chain
+    (tmp_path / 'Person.ttl').write_text(
+        '@prefix sh: <http://www.w3.org/ns/shacl#> .\n'
+        '@prefix ex: <http://example.com/> .\n'
+        'ex:PersonShape a sh:NodeShape ;\n'
+        '  sh:targetClass ex:Person ;\n'
+        '  sh:property [ sh:path ex:knows ; sh:qualifiedValueShape [ sh:node ex:PersonShape ] ;\n'
+        '                sh:qualifiedMinCount 1 ] .\n'
+    )
+    people = ['http://example.com/person' + str(i) for i in range(1500)]
+    graph = Graph()
+    for i, person in enumerate(people):
+        graph.add((URIRef(person), RDF.type, URIRef('http://example.com/Person')))
+        if i + 1 < len(people):
+            graph.add((URIRef(person), URIRef('http://example.com/knows'), URIRef(people[i + 1])))
+
+    shape_schema = ShapeSchema(schema_dir=str(tmp_path), endpoint=graph, use_selective_queries=False)
+    check_result(shape_schema.validate(), [], sorted(people))
+
+
+def changed_graph(graph):
+    """Returns a graph that changed to the given one, and the triples added and removed by the change."""
+    triples = sorted(graph)
+    added = Graph()
+    for triple in triples[::5]:
+        added.add(triple)
+    removed = Graph()
+    for (s, p, _), (_, _, o) in zip(triples[1::9], triples[2::9]):
+        if (s, p, o) not in graph:
+            removed.add((s, p, o))
+    before = Graph()
+    for triple in graph:
+        if triple not in added:
+            before.add(triple)
+    for triple in removed:
+        before.add(triple)
+    return before, added, removed
+
+
+@pytest.mark.parametrize('file', get_all_test_cases())
+def test_case_incremental(file, tmp_path):
+    with open(file, 'r') as f:
+        test_definition = json.load(f)
+    gt_valid = sorted(test_definition['groundTruth']['valid'])
+    gt_invalid = sorted(test_definition['groundTruth']['invalid'])
+
+    before, added, removed = changed_graph(TEST_GRAPH)
+    result = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=before).validate()
+    ValidationSnapshot.from_result(result).save(str(tmp_path / 'snapshot.json'))
+    shape_schema = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=TEST_GRAPH)
+    result = shape_schema.validate_incremental(str(tmp_path / 'snapshot.json'), added=added, removed=removed)
+    check_result(result, gt_valid, gt_invalid)
+
+
+def test_incremental_recursive_chain(tmp_path):
+    # closing the chain to a cycle changes the classification of all people,
+    # the focus nodes are found by following the references backwards through the whole chain
+    (tmp_path / 'Person.ttl').write_text(
+        '@prefix sh: <http://www.w3.org/ns/shacl#> .\n'
+        '@prefix ex: <http://example.com/> .\n'
+        'ex:PersonShape a sh:NodeShape ;\n'
+        '  sh:targetClass ex:Person ;\n'
+        '  sh:property [ sh:path ex:knows ; sh:qualifiedValueShape [ sh:node ex:PersonShape ] ;\n'
+        '                sh:qualifiedMinCount 1 ] .\n'
+    )
+    people = ['http://example.com/person' + str(i) for i in range(200)]
+    graph = Graph()
+    for i, person in enumerate(people):
+        graph.add((URIRef(person), RDF.type, URIRef('http://example.com/Person')))
+        if i + 1 < len(people):
+            graph.add((URIRef(person), URIRef('http://example.com/knows'), URIRef(people[i + 1])))
+    snapshot = ValidationSnapshot.from_result(ShapeSchema(schema_dir=str(tmp_path), endpoint=graph).validate())
+
+    added = Graph()
+    added.add((URIRef(people[-1]), URIRef('http://example.com/knows'), URIRef(people[0])))
+    for triple in added:
+        graph.add(triple)
+    shape_schema = ShapeSchema(schema_dir=str(tmp_path), endpoint=graph)
+    result = shape_schema.validate_incremental(snapshot, added=added)
+    valid, invalid = classified_targets(ShapeSchema(schema_dir=str(tmp_path), endpoint=graph).validate())
+    check_result(result, sorted(valid), sorted(invalid))
+
+
+def test_incremental_sequence_path(tmp_path):
+    # the changed triples are in the middle or at the end of the path, i.e., the focus node is not part of them
+    (tmp_path / 'Item.ttl').write_text(
+        '@prefix sh: <http://www.w3.org/ns/shacl#> .\n'
+        '@prefix ex: <http://example.com/> .\n'
+        'ex:ItemShape a sh:NodeShape ;\n'
+        '  sh:targetClass ex:Item ;\n'
+        '  sh:property [ sh:path ( ex:p ex:q ex:r ) ; sh:minCount 1 ] .\n'
+    )
+    ex = 'http://example.com/'
+    graph = Graph()
+    graph.add((URIRef(ex + 'a'), RDF.type, URIRef(ex + 'Item')))
+    graph.add((URIRef(ex + 'a'), URIRef(ex + 'p'), URIRef(ex + 'b')))
+    graph.add((URIRef(ex + 'b'), URIRef(ex + 'q'), URIRef(ex + 'c')))
+    changes = [Graph(), Graph()]
+    changes[0].add((URIRef(ex + 'c'), URIRef(ex + 'r'), URIRef(ex + 'd')))
+    changes[1].add((URIRef(ex + 'b'), URIRef(ex + 'q'), URIRef(ex + 'c')))
+
+    for added, removed in [(changes[0], None), (None, changes[1])]:
+        snapshot = ValidationSnapshot.from_result(ShapeSchema(schema_dir=str(tmp_path), endpoint=graph).validate())
+        for triple in added or []:
+            graph.add(triple)
+        for triple in removed or []:
+            graph.remove(triple)
+        result = ShapeSchema(schema_dir=str(tmp_path), endpoint=graph).validate_incremental(snapshot, added, removed)
+        valid, invalid = classified_targets(ShapeSchema(schema_dir=str(tmp_path), endpoint=graph).validate())
+        check_result(result, sorted(valid), sorted(invalid))
+    assert invalid == [ex + 'a']
+
+
+def test_incremental_focus_nodes(tmp_path):
+    with open('./tests/cases/two_shapes/case1/definitions/case1.json', 'r') as f:
+        test_definition = json.load(f)
+    shape_schema = ShapeSchema(schema_dir=test_definition['schemaDir'], endpoint=TEST_GRAPH)
+    snapshot = ValidationSnapshot.from_result(shape_schema.validate())
+    snapshot.save(str(tmp_path / 'snapshot.json'))
+    assert ValidationSnapshot.load(str(tmp_path / 'snapshot.json')).shapes == snapshot.shapes
+
+    # the change of a node of ClassC affects the nodes of ClassB referring to it
+    removed = Graph()
+    removed.add((URIRef('http://test.example.com/ClassC_Instance1'), URIRef('http://test.example.com/property0'),
+                 URIRef('http://test.example.com/unknown')))
+    (tmp_path / 'removed.nt').write_text(removed.serialize(format='nt'))
+    focus_nodes = ChangeSet(removed=str(tmp_path / 'removed.nt')).affected_focus_nodes(
+        shape_schema.shapesDict, snapshot, shape_schema.endpoint, shape_schema.queryPartitioner)
+    changed = {'http://test.example.com/ClassC_Instance1', 'http://test.example.com/unknown'}
+    referring = {str(s) for s, _ in TEST_GRAPH.subject_predicates(URIRef('http://test.example.com/ClassC_Instance1'))}
+    assert len(referring) > 0
+    assert focus_nodes['<http://test.example.com/shapes/ClassC>'] == changed
+    assert focus_nodes['<http://test.example.com/shapes/ClassB>'] == changed | referring
+    check_result(shape_schema.validate_incremental(snapshot),
+                 sorted(test_definition['groundTruth']['valid']), sorted(test_definition['groundTruth']['invalid']))
+
+
+def classified_targets(result):
+    valid = []
+    invalid = []
+    for value in result.values():
+        valid.extend(instance[1] for instance in value['valid_instances'])
+        invalid.extend(instance[1] for instance in value.get('invalid_instances', []))
+    return valid, invalid
+
 
+def check_result(result, gt_valid, gt_invalid):
     res_valid = []
     res_invalid = []
 
@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+from TravSHACL.core.GraphTraversal import GraphTraversal
+
+
+def random_network(number_of_shapes, number_of_refs, seed):
+    """Generates the dependencies of a random shape network, possibly with several connected components."""
+    rnd = random.Random(seed)
+    names = ['shape' + str(i) for i in range(number_of_shapes)]
+    dependencies = {name: [] for name in names}
+    reversed_dependencies = {name: [] for name in names}
+    for _ in range(number_of_refs):
+        source, target = rnd.choice(names), rnd.choice(names)
+        dependencies[source].append(target)
+        reversed_dependencies[target].append(source)
+    return dependencies, reversed_dependencies
+
+
+def recursive_traversal(graph_traversal, dependencies, reversed_dependencies, starting_point, one_component=False):
+    """The former recursive implementation of the traversal, used as reference for the visiting order."""
+    def dfs(visited, node):
+        if node not in visited:
+            visited.append(node)
+            for neighbour in dependencies[node]:
+                dfs(visited, neighbour)
+            if sorted(visited) != sorted(dependencies.keys()):
+                for neighbour in reversed_dependencies[node]:
+                    dfs(visited, neighbour)
+        elif node in visited and sorted(visited) != sorted(dependencies.keys()):
+            for neighbour in dependencies[node]:
+                if neighbour not in visited:
+                    dfs(visited, neighbour)
+            for neighbour in reversed_dependencies[node]:
+                if neighbour not in visited:
+                    dfs(visited, neighbour)
+
+    def bfs(visited, node):
+        edges = {k: dependencies[k] + reversed_dependencies[k] for k in dependencies.keys()}
+        queue = [node]
+        visited.append(node)
+        while queue:
+            node = queue.pop(0)
+            for neighbour in edges[node]:
+                if neighbour not in visited:
+                    visited.append(neighbour)
+                    queue.append(neighbour)
+
+    nodes = list(dependencies.keys())
+    visited = []
+    while len(nodes) > 0:
+        dfs(visited, starting_point) if graph_traversal == GraphTraversal.DFS else bfs(visited, starting_point)
+        if one_component:
+            nodes = []
+        else:
+            [nodes.remove(v) for v in visited if v in nodes]
+            starting_point = nodes[0] if len(nodes) > 0 else None
+    return visited
+
+
+@pytest.mark.parametrize('seed', range(20))
+@pytest.mark.parametrize('size', [(1, 0), (5, 3), (20, 15), (50, 80), (120, 100)])
+@pytest.mark.parametrize('one_component', [False, True])
+@pytest.mark.parametrize('graph_traversal', [GraphTraversal.DFS, GraphTraversal.BFS])
+def test_same_order_as_recursive_traversal(graph_traversal, one_component, size, seed):
+    dependencies, reversed_dependencies = random_network(size[0], size[1], seed)
+    starting_point = random.Random(seed).choice(list(dependencies.keys()))
+    expected = recursive_traversal(graph_traversal, dependencies, reversed_dependencies, starting_point, one_component)
+    assert graph_traversal.traverse_graph(dependencies, reversed_dependencies, starting_point, one_component) == expected
+
+
+@pytest.mark.parametrize('graph_traversal', [GraphTraversal.DFS, GraphTraversal.BFS])
+def test_large_chain(graph_traversal):
+    names = ['shape' + str(i) for i in range(10000)]
+    dependencies = {name: names[i + 1:i + 2] for i, name in enumerate(names)}
+    reversed_dependencies = {name: names[i - 1:i] if i > 0 else [] for i, name in enumerate(names)}
+    assert graph_traversal.traverse_graph(dependencies, reversed_dependencies, names[0]) == names
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+from TravSHACL.core.ShapeSchema import ShapeSchema
+from TravSHACL.sparql.ClientRegistry import ClientRegistry
+from TravSHACL.sparql.HTTPTransport import HTTPTransport, RESULTS_JSON
+from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
+from tests.conftest import RESULT, url
+
+
+def test_connection_reuse(server):
+    transport = HTTPTransport(url(server), pool_size=2)
+    for i in range(5):
+        assert transport.query('SELECT ?x WHERE { ?x ?p ' + str(i) + ' }') == RESULT
+    transport.close()
+    assert len(server.requests) == 5
+    assert len({client for client, _, _ in server.requests}) == 1  # all queries were sent over one connection
+
+
+def test_retry_on_stale_connection(server):
+    class CountingTransport(HTTPTransport):
+        sent = 0
+
+        def _send(self, connection, body, headers):
+            self.sent += 1
+            return super()._send(connection, body, headers)
+
+    transport = CountingTransport(url(server), pool_size=1)
+    server.drop_connections = True
+    for _ in range(3):
+        assert transport.query('SELECT ?x WHERE { ?x ?p ?o }') == RESULT
+    transport.close()
+    assert len(server.requests) == 3
+    assert transport.sent == 5  # the second and third query failed on the stale connection first
+    assert len({client for client, _, _ in server.requests}) == 3  # each stale connection was replaced
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate', 'raw-deflate'])
+def test_response_decoding(server, encoding):
+    server.response_encoding = encoding
+    transport = HTTPTransport(url(server))
+    assert transport.query('SELECT ?x WHERE { ?x ?p ?o }') == RESULT
+    with transport.open('SELECT ?x WHERE { ?x ?p ?o }', RESULTS_JSON) as stream:
+        assert json.loads(stream.read()) == RESULT
+    transport.close()
+
+
+def test_compressed_requests(server):
+    query = 'SELECT ?x WHERE { ?x ?p "' + 'ä' * 1000 + '" }'
+    endpoint = SPARQLEndpoint(url(server), compress_requests=True, timeout=5)
+    assert endpoint.transport.compress_requests
+    assert endpoint.transport.timeout == 5
+    variables, rows = endpoint.run_query_rows(query)
+    assert variables == ['x']
+    assert list(rows) == [('http://example.com/a',)]
+    endpoint.close()
+    assert server.requests[0][1:] == (query, 'gzip')
+
+
+def test_registry_transport_options(server):
+    registry = ClientRegistry()
+    endpoint = SPARQLEndpoint(url(server), registry=registry, timeout=5, compress_requests=True)
+    assert endpoint.transport.timeout == 5
+    assert endpoint.transport.compress_requests
+    assert endpoint.run_query('SELECT ?x WHERE { ?x ?p ?o }') == RESULT
+    registry.close()
+
+
+def test_shape_schema_transport_options(server):
+    shape_schema = ShapeSchema(schema_dir='./tests/cases/two_shapes/case1/shapes', endpoint=url(server),
+                               endpoint_timeout=5, compress_requests=True)
+    assert shape_schema.endpoint.transport.timeout == 5
+    assert shape_schema.endpoint.transport.compress_requests
+    shape_schema.endpoint.close()
+
+
+def test_registry_shares_transports(server):
+    registry = ClientRegistry()
+    first = SPARQLEndpoint(url(server), registry=registry)
+    second = SPARQLEndpoint(url(server), registry=registry)
+    other = SPARQLEndpoint(url(server).replace('127.0.0.1', 'localhost'), registry=registry)
+    private = SPARQLEndpoint(url(server), registry=registry, user='user', pwd='secret')
+    assert first.transport is second.transport
+    assert other.transport is not first.transport
+    assert private.transport is not first.transport
+    assert SPARQLEndpoint(url(server)).transport is not first.transport  # without a registry, each has its own
+
+    first.run_query('SELECT ?x WHERE { ?x ?p ?o }')
+    first.close()  # a shared transport is not closed by a single endpoint
+    second.run_query('SELECT ?x WHERE { ?x ?p ?o }')
+    assert len({client for client, _, _ in server.requests}) == 1
+    registry.close()
+    assert registry.get_transport(url(server)) is not first.transport
+
+
+def test_shape_schemas_share_registry(server):
+    registry = ClientRegistry()
+    schemas = [ShapeSchema(schema_dir='./tests/cases/two_shapes/case1/shapes', endpoint=url(server),
+                           client_registry=registry) for _ in range(2)]
+    assert schemas[0].endpoint.transport is schemas[1].endpoint.transport
+    registry.close()
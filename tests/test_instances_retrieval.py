@@ -0,0 +1,158 @@
+import threading
+import time
+
+import pytest
+from rdflib import Graph
+from SPARQLWrapper import SPARQLWrapper
+
+import TravSHACL.rule_based_validation.InstancesRetrieval as instances_retrieval
+from TravSHACL.rule_based_validation.InstancesRetrieval import InstancesRetrieval
+from TravSHACL.sparql.QueryPartitioner import QueryPartitioner
+from TravSHACL.utils.ValidationStats import ValidationStats
+
+ROWS = 5000
+
+
+class CountingEndpoint:
+    """Endpoint answering 'partition<i>' queries with ROWS solution mappings each, produced lazily and counted."""
+
+    def __init__(self, endpoint_type=Graph, rows=ROWS):
+        self.endpoint_type = endpoint_type
+        self.number_of_rows = rows
+        self.produced = {}
+        self.executed = []
+        self.lock = threading.Lock()
+
+    def get_endpoint_type(self):
+        return self.endpoint_type
+
+    def run_query_rows(self, query_string, use_cache=True):
+        with self.lock:
+            self.executed.append(query_string)
+            self.produced[query_string] = 0
+        if query_string == 'failing':
+            raise ValueError('query failed')
+
+        def rows():
+            for i in range(self.number_of_rows):
+                self.produced[query_string] += 1
+                yield query_string, str(i)
+        return ['p', 'x'], rows()
+
+
+class Query:
+    @staticmethod
+    def get_id():
+        return 'q'
+
+    @staticmethod
+    def get_sparql():
+        return 'SELECT ?x (COUNT(DISTINCT ?inst) AS ?cnt) WHERE { VALUES ?inst { $instances_to_add$ } } GROUP BY ?x'
+
+
+class Shape:
+    def __init__(self, name, valid=(), invalid=()):
+        self.name = name
+        self.valid = set(valid)
+        self.invalid = set(invalid)
+        self.queriesFilters = {'filtering': {'constraint': None, 'query_valid': Query(), 'query_invalid': Query()}}
+
+    def get_id(self):
+        return self.name
+
+    def get_valid_targets(self):
+        return self.valid
+
+    def get_invalid_targets(self):
+        return self.invalid
+
+
+def test_partitions_are_streamed():
+    endpoint = CountingEndpoint()
+    retrieval = InstancesRetrieval(endpoint, {}, ValidationStats(), query_workers=2)
+    queries = ['partition' + str(i) for i in range(3)]
+    partitions = retrieval.run_constraint_queries(Query(), iter(queries))
+
+    variables, rows = next(partitions)
+    assert variables == ['p', 'x']
+    first = next(rows)
+    # the workers wait for the validation, hence, only a few chunks of each partition are held in memory
+    buffered = (instances_retrieval._CHUNKS_PER_PARTITION + 2) * instances_retrieval._ROWS_PER_CHUNK
+    assert all(produced <= buffered for produced in endpoint.produced.values())
+
+    answers = {first}
+    answers.update(rows)
+    for _, rows in partitions:
+        answers.update(rows)
+    assert answers == {(query, str(i)) for query in queries for i in range(ROWS)}
+    assert retrieval.stats.number_of_queries == 3
+    assert retrieval.stats.total_sol_mappings == 3 * ROWS
+    retrieval.close()
+
+
+def test_partition_error():
+    retrieval = InstancesRetrieval(CountingEndpoint(), {}, ValidationStats(), query_workers=2)
+    with pytest.raises(ValueError):
+        for _, rows in retrieval.run_constraint_queries(Query(), iter(['partition0', 'failing'])):
+            for _ in rows:
+                pass
+    retrieval.close()
+
+
+def test_stopped_partitions_are_released():
+    endpoint = CountingEndpoint()
+    retrieval = InstancesRetrieval(endpoint, {}, ValidationStats(), query_workers=2)
+    partitions = retrieval.run_constraint_queries(Query(), iter(['partition0', 'partition1']))
+    _, rows = next(partitions)
+    next(rows)
+    partitions.close()  # the validation stopped, e.g., because of early termination
+    retrieval.close()  # the workers are not blocked by the unread partitions
+    assert all(produced < ROWS for produced in endpoint.produced.values())
+
+
+@pytest.mark.parametrize('rows', [5, 20])
+def test_prefetched_answers_are_bounded(rows, monkeypatch):
+    monkeypatch.setattr(instances_retrieval, '_PREFETCH_MAX_ROWS', 10)
+    endpoint = CountingEndpoint(SPARQLWrapper, rows)
+    retrieval = InstancesRetrieval(endpoint, {}, ValidationStats(), prefetch_workers=1)
+    retrieval.prefetch('shape', ['partition0'])
+    _, answers = retrieval.run_constraint_query(Query(), 'partition0')
+    assert len(list(answers)) == rows
+    # answers exceeding the limit are not kept, the query is sent again instead
+    assert len(endpoint.executed) == (1 if rows <= 10 else 2)
+    retrieval.close()
+
+
+@pytest.mark.parametrize('query_workers', [1, 2])
+def test_sparql_constraint_deadline(query_workers, monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+    endpoint = CountingEndpoint(rows=1)
+    run_query_rows = endpoint.run_query_rows
+
+    def pass_deadline(query_string, use_cache=True):  # the deadline passes with the first query
+        clock[0] = 20.0
+        return run_query_rows(query_string, use_cache)
+    endpoint.run_query_rows = pass_deadline
+
+    retrieval = InstancesRetrieval(endpoint, {}, ValidationStats(), query_workers=query_workers, deadline=10)
+    violations = retrieval.execute_sparql_constraint('c', 'ASK { $this ?p ?o }', ['a', 'b', 'c'])
+    # the queries already taken by a worker are sent, the focus nodes of the others are not reported as violations
+    assert 1 <= len(endpoint.executed) <= query_workers
+    assert violations == ['a', 'b', 'c'][:len(endpoint.executed)]
+    retrieval.close()
+
+
+@pytest.mark.parametrize('max_query_size, filtered', [(8192, True), (100, False)])
+def test_filtered_target_query_is_not_partitioned(max_query_size, filtered):
+    filtering_shape = Shape('filtering', ['<v' + str(i) + '>' for i in range(10)],
+                            ['<i' + str(i) + '>' for i in range(20)])
+    retrieval = InstancesRetrieval(CountingEndpoint(), {}, ValidationStats(),
+                                   query_partitioner=QueryPartitioner(max_query_size))
+    queries = retrieval.filtered_target_queries(Shape('shape'), filtering_shape)
+    # the counts of partial instance lists cannot be compared with the cardinality of the constraint
+    if filtered:
+        assert len(queries[1]) == 1 and all('<v' + str(i) + '>' in queries[1][0] for i in range(10))
+    else:
+        assert queries is None
+    retrieval.close()
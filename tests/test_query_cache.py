@@ -0,0 +1,97 @@
+import os
+
+from TravSHACL.sparql.QueryCache import ENTRY_SUFFIX, QueryCache, normalize_query
+from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
+from tests.conftest import RESULT, url
+
+QUERY = 'SELECT ?x WHERE { ?x a <http://example.com/C> . }'
+ROWS = [('http://example.com/a',)]
+
+
+def test_normalize_query():
+    query = 'SELECT  ?x\n  WHERE {  # a comment\n ?x <http://example.com/p#q> "a  # b" .\n}'
+    assert normalize_query(query) == ('SELECT ?x WHERE { ?x <http://example.com/p#q> "a  # b" . }', {})
+    assert normalize_query('SELECT $x ?y WHERE { ?y ?p ?x }', rename_variables=True) == \
+        ('SELECT ?v0 ?v1 WHERE { ?v1 ?v2 ?v0 }', {'x': 'v0', 'y': 'v1', 'p': 'v2'})
+    assert normalize_query("SELECT ?x WHERE { ?x ?p '''a\n  b''' }")[0] == "SELECT ?x WHERE { ?x ?p '''a\n  b''' }"
+
+
+def test_key(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    key = cache.key('http://example.com/sparql', QUERY)
+    assert cache.key('http://example.com/sparql', '  SELECT ?y\nWHERE { ?y a <http://example.com/C> . }').digest == \
+        key.digest
+    assert cache.key('http://example.com/sparql', QUERY.replace('/C>', '/D>')).digest != key.digest
+    assert cache.key('http://example.org/sparql', QUERY).digest != key.digest
+    assert cache.key('http://example.com/sparql', QUERY, 'json').digest != key.digest
+    other_version = QueryCache(str(tmp_path), data_version='2')
+    assert other_version.key('http://example.com/sparql', QUERY).digest != key.digest
+
+
+def test_rows_round_trip(server, tmp_path):
+    endpoint = SPARQLEndpoint(url(server), cache=QueryCache(str(tmp_path)))
+    variables, rows = endpoint.run_query_rows(QUERY)
+    assert (variables, list(rows)) == (['x'], ROWS)
+    # a query differing in its layout and variable names is answered from the cache with its own variable names
+    variables, rows = endpoint.run_query_rows(QUERY.replace('?x', '?y').replace(' ', '  '))
+    assert (variables, list(rows)) == (['y'], ROWS)
+    assert len(server.requests) == 1
+    assert (endpoint.cache.hits, endpoint.cache.misses) == (1, 1)
+    # single queries can skip the cache, e.g., the probe queries of the query size
+    variables, rows = endpoint.run_query_rows(QUERY, use_cache=False)
+    assert list(rows) == ROWS
+    assert len(server.requests) == 2
+    endpoint.close()
+
+
+def test_incomplete_rows_are_not_stored(server, tmp_path):
+    endpoint = SPARQLEndpoint(url(server), cache=QueryCache(str(tmp_path)))
+    _, rows = endpoint.run_query_rows(QUERY)
+    rows.close()  # not consumed
+    _, rows = endpoint.run_query_rows(QUERY)
+    assert list(rows) == ROWS
+    assert len(server.requests) == 2
+    endpoint.close()
+
+
+def test_json_round_trip(server, tmp_path):
+    endpoint = SPARQLEndpoint(url(server), cache=QueryCache(str(tmp_path)))
+    assert endpoint.run_query(QUERY) == RESULT
+    assert endpoint.run_query(QUERY) == RESULT
+    assert len(server.requests) == 1
+    endpoint.close()
+
+
+def test_data_version(server, tmp_path):
+    for data_version, requests in [('1', 1), ('1', 1), ('2', 2), (None, 3), ('2', 3)]:
+        endpoint = SPARQLEndpoint(url(server), cache=QueryCache(str(tmp_path), data_version=data_version))
+        _, rows = endpoint.run_query_rows(QUERY)
+        assert list(rows) == ROWS
+        assert len(server.requests) == requests
+        endpoint.close()
+
+
+def test_bypass(server, tmp_path):
+    for bypass, requests in [(False, 1), (True, 2), (True, 3), (False, 3)]:
+        endpoint = SPARQLEndpoint(url(server), cache=QueryCache(str(tmp_path), bypass=bypass))
+        _, rows = endpoint.run_query_rows(QUERY)
+        assert list(rows) == ROWS
+        assert len(server.requests) == requests
+        endpoint.close()
+
+
+def test_lru_eviction(tmp_path):
+    cache = QueryCache(str(tmp_path))
+    keys = [cache.key('http://example.com/sparql', QUERY.replace('/C>', '/C' + str(i) + '>')) for i in range(4)]
+    paths = [os.path.join(str(tmp_path), key.digest[:2], key.digest + ENTRY_SUFFIX) for key in keys]
+    result = {'head': {'vars': ['x']}, 'results': {'bindings': [{'x': {'value': os.urandom(2000).hex()}}]}}
+    for i, key in enumerate(keys[:3]):
+        cache.store_result(key, result)
+        os.utime(paths[i], (1000 + i, 1000 + i))
+    assert cache.get_result(keys[0]) == result  # the oldest entry is used again, i.e., it becomes the newest one
+
+    cache.max_size = 3.5 * os.path.getsize(paths[0])  # the fourth entry exceeds the size of the cache
+    cache.store_result(keys[3], result)
+    assert [os.path.exists(path) for path in paths] == [True, False, True, True]
+    assert cache.get_result(keys[1]) is None
+    assert cache.misses == 1
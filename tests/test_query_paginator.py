@@ -0,0 +1,112 @@
+import time
+
+import pytest
+from rdflib import Graph, RDF, URIRef
+
+from TravSHACL.sparql.QueryPaginator import QueryPaginator
+from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
+
+EX = 'http://example.com/'
+TARGETS = {EX + 'target' + str(i) for i in range(137)} | {EX + 'quote"\\target'}
+QUERY = 'PREFIX ex: <' + EX + '>\n# SELECT in a comment\nSELECT DISTINCT ?x WHERE { ?x a ex:C . }'
+
+
+class CappedGraph(Graph):
+    """Graph truncating the answers of each SELECT query, like an endpoint capping the number of results."""
+
+    def __init__(self, cap=None):
+        super().__init__()
+        self.cap = cap
+        self.queries = []
+
+    def query(self, query_object, *args, **kwargs):
+        self.queries.append(query_object)
+        result = super().query(query_object, *args, **kwargs)
+        if self.cap is not None and result.type == 'SELECT':
+            result.bindings = result.bindings[:self.cap]
+        return result
+
+
+def capped_endpoint(cap):
+    graph = CappedGraph(cap)
+    for target in TARGETS:
+        graph.add((URIRef(target), RDF.type, URIRef(EX + 'C')))
+    return SPARQLEndpoint(graph)
+
+
+def run(paginator, endpoint):
+    variables, rows = paginator.run_query_rows(endpoint, QUERY)
+    assert variables == ['x']
+    rows = [x for x, in rows]
+    assert len(rows) == len(set(rows))
+    return set(rows)
+
+
+def test_cap_truncates_without_pagination():
+    _, rows = capped_endpoint(20).run_query_rows(QUERY)
+    assert len(list(rows)) == 20
+
+
+@pytest.mark.parametrize('mode', ['keyset', 'offset'])
+@pytest.mark.parametrize('page_size, cap', [(50, 20), (50, 50), (10, 20), (1000, 20), (50, None)])
+def test_all_targets(mode, page_size, cap):
+    endpoint = capped_endpoint(cap)
+    paginator = QueryPaginator(page_size, mode)
+    assert run(paginator, endpoint) == TARGETS
+    # the cap is only detected if it is smaller than the page size, a filled page shows that there is no lower cap
+    capped = cap is not None and cap < page_size
+    assert paginator.result_cap == (cap if capped else page_size if len(TARGETS) >= page_size else None)
+    if capped:
+        # later queries use the cap as page size, hence, only the first truncated page is requested again
+        queries = len(endpoint.endpoint.queries)
+        assert run(paginator, endpoint) == TARGETS
+        assert len(endpoint.endpoint.queries) - queries == len(TARGETS) // cap + 1
+
+
+def test_uncapped_endpoint_queries():
+    endpoint = capped_endpoint(None)
+    paginator = QueryPaginator(100)
+    assert run(paginator, endpoint) == TARGETS
+    # the short second page is the last one, since the first page was filled
+    assert len(endpoint.endpoint.queries) == 2
+    assert paginator.result_cap == 100
+    assert run(paginator, endpoint) == TARGETS
+    assert len(endpoint.endpoint.queries) == 4
+
+    endpoint = capped_endpoint(None)
+    paginator = QueryPaginator(1000)
+    assert run(paginator, endpoint) == TARGETS
+    # without a filled page, a short page might be truncated, hence, the next page is requested
+    assert len(endpoint.endpoint.queries) == 2
+    assert paginator.result_cap is None
+
+
+def test_page_queries():
+    endpoint = capped_endpoint(None)
+    run(QueryPaginator(100, 'keyset'), endpoint)
+    assert endpoint.endpoint.queries[0].startswith('PREFIX ex: <' + EX + '>\n# SELECT in a comment\nSELECT * WHERE {')
+    assert 'FILTER (STR(?x) > "' + EX + 'target' in endpoint.endpoint.queries[1]
+    assert 'OFFSET' not in ''.join(endpoint.endpoint.queries)
+    endpoint = capped_endpoint(None)
+    run(QueryPaginator(100, 'offset'), endpoint)
+    assert endpoint.endpoint.queries[1].endswith('LIMIT 100\nOFFSET 100')
+
+
+def test_deadline(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: clock[0])
+    endpoint = capped_endpoint(None)
+    variables, rows = QueryPaginator(50).run_query_rows(endpoint, QUERY, deadline=10)
+    first_page = [next(rows) for _ in range(50)]
+    clock[0] = 20.0  # the deadline passes while the first page is read
+    assert len(first_page + list(rows)) == 50
+    assert len(endpoint.endpoint.queries) == 1
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        QueryPaginator(0)
+    with pytest.raises(ValueError):
+        QueryPaginator(10, 'cursor')
+    with pytest.raises(ValueError):
+        QueryPaginator(10).run_query_rows(capped_endpoint(None), 'ASK { ?x a <' + EX + 'C> }')
@@ -0,0 +1,99 @@
+import math
+
+import pytest
+from rdflib import Graph
+
+import TravSHACL.sparql.QueryPartitioner as query_partitioner
+from TravSHACL.sparql.QueryPartitioner import QueryPartitioner
+from TravSHACL.sparql.SPARQLEndpoint import SPARQLEndpoint
+from tests.conftest import url
+
+TEMPLATE = 'SELECT ?x WHERE { VALUES ?x { $instances_to_add$ } ?x ?p ?o . }'
+INSTANCES = ['<http://example.com/instance' + str(i) + '>' for i in range(1000)]
+
+
+def instances_of(query):
+    return query[query.index('{ VALUES ?x { ') + 14:query.index(' } ?x ?p')].split(' ')
+
+
+def test_all_instances_are_kept():
+    # the partitions contain each instance exactly once and in order, i.e., not only the first sublist
+    # like the split into partitions of equal length, which iterated over range(0, inst_count, inst_count)
+    for max_query_size in [100, 500, 8192, 10 ** 6]:
+        queries = list(QueryPartitioner(max_query_size).partition(TEMPLATE, INSTANCES))
+        assert [instance for query in queries for instance in instances_of(query)] == INSTANCES
+    queries = list(QueryPartitioner(10 ** 6).partition(TEMPLATE, INSTANCES, max_instances=300))
+    assert [len(instances_of(query)) for query in queries] == [300, 300, 300, 100]
+
+
+@pytest.mark.parametrize('max_query_size', [100, 500, 2000, 8192])
+def test_size_budget(max_query_size):
+    partitioner = QueryPartitioner(max_query_size)
+    queries = list(partitioner.partition(TEMPLATE, INSTANCES))
+    assert all(len(query) <= max_query_size for query in queries)
+    # as few queries as possible, i.e., the next instance would exceed the budget
+    for query, next_query in zip(queries, queries[1:]):
+        assert len(query) + 1 + len(instances_of(next_query)[0]) > max_query_size
+    assert len(queries) >= math.ceil(len(' '.join(INSTANCES)) / (max_query_size - len(TEMPLATE) + 18))
+
+
+def test_size_budget_in_bytes():
+    instances = ['"' + 'ä' * i + '"' for i in range(1, 60)]
+    for unit, size in [('chars', len), ('bytes', lambda query: len(query.encode('utf-8')))]:
+        queries = list(QueryPartitioner(500, unit).partition(TEMPLATE, instances))
+        assert all(size(query) <= 500 for query in queries)
+        assert [instance for query in queries for instance in instances_of(query)] == instances
+    assert max(len(query.encode('utf-8')) for query in QueryPartitioner(500).partition(TEMPLATE, instances)) > 500
+
+
+def test_several_placeholders():
+    template = 'SELECT ?x WHERE { VALUES ?x { $instances_to_add$ } FILTER(?x NOT IN ($instances_to_add$)) }'
+    queries = list(QueryPartitioner(300).partition(template, INSTANCES[:50], separator=', '))
+    assert all(len(query) <= 300 for query in queries)
+    assert len(queries) > 1
+
+
+def test_oversized_instance_and_no_placeholder():
+    instance = '<http://example.com/' + 'x' * 200 + '>'
+    queries = list(QueryPartitioner(130).partition(TEMPLATE, INSTANCES[:2] + [instance] + INSTANCES[2:4]))
+    assert [instances_of(query) for query in queries] == [INSTANCES[:2], [instance], INSTANCES[2:4]]
+    assert list(QueryPartitioner(100).partition('SELECT ?x WHERE { ?x ?p ?o }', INSTANCES)) == \
+        ['SELECT ?x WHERE { ?x ?p ?o }']
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        QueryPartitioner(0)
+    with pytest.raises(ValueError):
+        QueryPartitioner(100, 'lines')
+
+
+@pytest.mark.parametrize('limit', [1500, 3000, 5000, 7900])
+def test_probe(server, limit, monkeypatch):
+    monkeypatch.setattr(query_partitioner, '_probed_sizes', {})
+    server.max_query_size = limit
+    endpoint = SPARQLEndpoint(url(server))
+    partitioner = QueryPartitioner(8192).probe(endpoint)
+    # the binary search stops within the resolution below the limit of the endpoint
+    assert limit - query_partitioner._PROBE_RESOLUTION < partitioner.max_query_size <= limit
+    sizes = [len(query) for _, query, _ in server.requests]
+    assert sizes[:2] == [query_partitioner._PROBE_LOWER_BOUND, 8192]  # the exact sizes of the probe queries
+    assert len(sizes) <= 2 + math.ceil(math.log2((8192 - query_partitioner._PROBE_LOWER_BOUND) /
+                                                 query_partitioner._PROBE_RESOLUTION))
+    # the probed size is kept for the endpoint
+    assert QueryPartitioner(8192).probe(endpoint).max_query_size == partitioner.max_query_size
+    assert len(server.requests) == len(sizes)
+    endpoint.close()
+
+
+def test_probe_accepted_and_skipped(server, monkeypatch):
+    monkeypatch.setattr(query_partitioner, '_probed_sizes', {})
+    endpoint = SPARQLEndpoint(url(server))
+    assert QueryPartitioner(8192).probe(endpoint).max_query_size == 8192
+    assert len(server.requests) == 2
+    partitioner = QueryPartitioner(1000)
+    assert partitioner.probe(endpoint) is partitioner  # not above the size of the smallest probe query
+    partitioner = QueryPartitioner(8192)
+    assert partitioner.probe(SPARQLEndpoint(Graph())) is partitioner  # in-memory graphs are not restricted
+    assert len(server.requests) == 2
+    endpoint.close()
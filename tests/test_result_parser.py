@@ -0,0 +1,128 @@
+import io
+import json
+
+import pytest
+
+from TravSHACL.sparql import ResultParser
+from TravSHACL.sparql.ResultParser import parse_rows
+
+XSD_INTEGER = 'http://www.w3.org/2001/XMLSchema#integer'
+
+
+class TrickleStream(io.RawIOBase):
+    """Binary stream returning at most one byte per read, i.e., every value is split across chunks."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.pos >= len(self.data):
+            return 0
+        buffer[0] = self.data[self.pos]
+        self.pos += 1
+        return 1
+
+
+def parse(data, result_format, trickle):
+    stream = TrickleStream(data) if trickle else io.BytesIO(data)
+    variables, rows = parse_rows(stream, result_format)
+    return variables, list(rows)
+
+
+def json_result(bindings, head_first=True, variables=('x', 'y')):
+    head = '"head": {"vars": ' + json.dumps(list(variables)) + '}'
+    results = '"results": {"bindings": [' + ', '.join(bindings) + ']}'
+    return ('{' + (head + ', ' + results if head_first else results + ', ' + head) + '}').encode('utf-8')
+
+
+JSON_BINDINGS = [
+    '{"x": {"type": "uri", "value": "http://example.com/\\u00e4"}, '
+    '"y": {"type": "literal", "value": "say \\"hi\\"\\n\\\\ \\ud83d\\ude00 \\u00fc"}}',
+    '{"x": {"type": "bnode", "value": "b0"}, '
+    '"y": {"type": "literal", "datatype": "' + XSD_INTEGER + '", "value": "42"}}',
+    '{"x": {"type": "uri", "value": "http://example.com/ö"}, '
+    '"y": {"type": "literal", "xml:lang": "fr", "value": "chat"}}',
+    '{"y": {"type": "literal", "value": ""}}'
+]
+JSON_ROWS = [
+    ('http://example.com/ä', 'say "hi"\n\\ \U0001F600 ü'),
+    ('b0', '42'),
+    ('http://example.com/ö', 'chat'),
+    (None, '')
+]
+
+
+@pytest.fixture(params=[False, True], ids=['buffered', 'trickled'])
+def trickle(request, monkeypatch):
+    if request.param:
+        monkeypatch.setattr(ResultParser, 'CHUNK_SIZE', 1)
+    return request.param
+
+
+@pytest.mark.parametrize('head_first', [True, False])
+def test_json(head_first, trickle):
+    assert parse(json_result(JSON_BINDINGS, head_first), 'json', trickle) == (['x', 'y'], JSON_ROWS)
+
+
+def test_json_empty(trickle):
+    assert parse(json_result([]), 'json', trickle) == (['x', 'y'], [])
+    assert parse(b'{"head": {"vars": ["x"]}}', 'json', trickle) == (['x'], [])
+    assert parse(b'{"head": {"vars": []}, "results": {"bindings": []}}', 'json', trickle) == ([], [])
+
+
+def test_json_additional_members(trickle):
+    data = b'{"head": {"vars": ["x"], "link": []}, "results": {"distinct": false, "ordered": true, ' \
+           b'"bindings": [{"x": {"type": "literal", "value": "1"}}]}}'
+    assert parse(data, 'json', trickle) == (['x'], [('1',)])
+
+
+def test_json_malformed():
+    with pytest.raises(ValueError):
+        parse(b'["x"]', 'json', False)
+
+
+def test_tsv(trickle):
+    data = '\n'.join([
+        '?x\t?y',
+        '<http://example.com/ä>\t"say \\"hi\\"\\n\\\\ \\u00fc \\U0001F600"',
+        '_:b0\t"42"^^<' + XSD_INTEGER + '>',
+        '<http://example.com/c>\t"chat"@fr',
+        '\t42',
+        '<http://example.com/d>\t',
+        ''
+    ]).encode('utf-8')
+    assert parse(data, 'tsv', trickle) == (['x', 'y'], [
+        ('http://example.com/ä', 'say "hi"\n\\ ü \U0001F600'),
+        ('_:b0', '42'),
+        ('http://example.com/c', 'chat'),
+        (None, '42'),
+        ('http://example.com/d', None)
+    ])
+
+
+def test_tsv_empty(trickle):
+    assert parse(b'?x\t?y\n', 'tsv', trickle) == (['x', 'y'], [])
+    assert parse(b'', 'tsv', trickle) == ([], [])
+
+
+def test_csv(trickle):
+    data = 'x,y\r\nhttp://example.com/ä,"a, ""quoted""\r\nmulti-line value"\r\n_:b0,\r\n,42\r\n'.encode('utf-8')
+    assert parse(data, 'csv', trickle) == (['x', 'y'], [
+        ('http://example.com/ä', 'a, "quoted"\r\nmulti-line value'),
+        ('_:b0', None),
+        (None, '42')
+    ])
+
+
+def test_csv_empty(trickle):
+    assert parse(b'x,y\r\n', 'csv', trickle) == (['x', 'y'], [])
+    assert parse(b'', 'csv', trickle) == ([], [])
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        parse(b'', 'xml', False)
@@ -0,0 +1,50 @@
+from glob import glob
+
+import pytest
+from rdflib import Graph
+
+from TravSHACL.core.ShapeParser import ShapeParser
+
+
+def describe(value):
+    """Plain representation of the constraints and queries of the parsed shapes, used to compare two parses."""
+    if hasattr(value, '__dict__'):  # constraints, queries, rule patterns, and variable generators
+        return type(value).__name__, describe(vars(value))
+    if isinstance(value, dict):
+        return {describe(k): describe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [describe(v) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(repr(describe(v)) for v in value)
+    return value
+
+
+def parse(path, use_index, selective):
+    shapes = ShapeParser(use_index=use_index).parse_ttl(Graph().parse(path), selective, 256, False)
+    for shape in shapes:
+        shape.compute_constraint_queries()
+    return [(shape.get_id(), shape.targetDef, shape.targetType, shape.targetQuery,
+             describe(shape.constraints), describe(shape.minQuery), describe(shape.maxQueries),
+             describe(shape.rulePattern), describe(shape.referencedShapes)) for shape in shapes]
+
+
+@pytest.mark.parametrize('path', sorted(glob('./tests/cases/**/shapes/*.ttl', recursive=True)))
+@pytest.mark.parametrize('selective', [True, False])
+def test_index_lookups_equal_sparql_queries(path, selective):
+    assert parse(path, True, selective) == parse(path, False, selective)
+
+
+@pytest.mark.parametrize('use_index', [True, False])
+def test_several_or_constraints(use_index):
+    shapes_graph = Graph().parse(data='''
+        @prefix sh: <http://www.w3.org/ns/shacl#> .
+        @prefix ex: <http://example.com/> .
+        ex:Shape a sh:NodeShape ;
+          sh:targetClass ex:C ;
+          sh:or ( [ sh:path ex:p ; sh:minCount 1 ] [ sh:path ex:q ; sh:minCount 1 ] ) ;
+          sh:or ( [ sh:path ex:r ; sh:minCount 1 ] [ sh:path ex:s ; sh:minCount 1 ] ) .
+    ''', format='turtle')
+    shape, = ShapeParser(use_index=use_index).parse_ttl(shapes_graph, True, 256, False)
+    options = [sorted(option.path for option in c.options) for c in shape.constraints if c.options is not None]
+    assert sorted(options) == [['<http://example.com/p>', '<http://example.com/q>'],
+                               ['<http://example.com/r>', '<http://example.com/s>']]
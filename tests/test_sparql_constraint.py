@@ -0,0 +1,74 @@
+import pytest
+from rdflib import Graph
+
+from TravSHACL.constraints.SPARQLConstraint import SPARQLConstraint, _rewrite_for_batches
+
+VALUES = '\nVALUES ?trav_this { $instances_to_add$ }\n'
+DATA = '''
+@prefix ex: <http://example.com/> .
+ex:a ex:p ex:b, ex:c .
+ex:b ex:p ex:a ; ex:q ex:a .
+ex:c ex:q ex:d ; ex:r ex:a .
+ex:d ex:p ex:d .
+'''
+INSTANCES = ['http://example.com/' + name for name in 'abcde']
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('SELECT $this WHERE { $this <http://example.com/p> ?o . }',
+     'SELECT ?trav_this WHERE {' + VALUES + ' ?trav_this <http://example.com/p> ?o . }'),
+    ('SELECT ?o WHERE { $this <http://example.com/p> ?o . FILTER(?o != $this) }',
+     'SELECT ?trav_this ?o WHERE {' + VALUES + ' ?trav_this <http://example.com/p> ?o . FILTER(?o != ?trav_this) }'),
+    ('SELECT DISTINCT * WHERE { $this ?p ?o . OPTIONAL { ?o ?q ?v FILTER(?v = $this) } }',
+     'SELECT DISTINCT * WHERE {' + VALUES + ' ?trav_this ?p ?o . OPTIONAL { ?o ?q ?v FILTER(?v = ?trav_this) } }'),
+    ('SELECT ?o WHERE { ?o ?p ?x . FILTER NOT EXISTS { ?x ?q $this } }',
+     'SELECT ?trav_this ?o WHERE {' + VALUES + ' ?o ?p ?x . FILTER NOT EXISTS { ?x ?q ?trav_this } }'),
+    # literals and comments are not analyzed
+    ('SELECT ?o WHERE { $this ?p "LIMIT 1 $this" # COUNT\n }',
+     'SELECT ?trav_this ?o WHERE {' + VALUES + ' ?trav_this ?p "LIMIT 1 $this" # COUNT\n }'),
+])
+def test_values_rewrite(query, expected):
+    assert _rewrite_for_batches(query) == (expected, 'trav_this')
+
+
+def test_batch_variable_is_fresh():
+    query = 'SELECT ?trav_this WHERE { $this ?p ?trav_this }'
+    assert _rewrite_for_batches(query) == \
+        ('SELECT ?trav_this_ ?trav_this WHERE {\nVALUES ?trav_this_ { $instances_to_add$ }\n ?trav_this_ ?p ?trav_this }',
+         'trav_this_')
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT (COUNT(?o) AS ?c) WHERE { $this ?p ?o }',
+    'SELECT ?o WHERE { ?o ?p ?x . FILTER(?x = $this) } GROUP BY ?o',
+    'SELECT ?o WHERE { ?o ?p ?x . FILTER(?x = $this) } LIMIT 1',
+    'SELECT ?o WHERE { ?o ?p ?x . FILTER(?x = $this) } OFFSET 1',
+    'SELECT ?o WHERE { $this ?p ?o . { SELECT ?o WHERE { ?o ?q $this } } }',
+    'SELECT ?o WHERE { ?o ?p ?x . MINUS { ?o ?q $this } }',
+    'SELECT ?o WHERE { SERVICE <http://example.com/sparql> { $this ?p ?o } }',
+    'SELECT ?o WHERE { ?o ?p ?x . { ?x ?q ?y FILTER(?y = $this) } }',  # the filter is evaluated before the join
+    'ASK { $this ?p ?o }',
+    'SELECT ?o WHERE { $this ?p ?o ',
+])
+def test_rejected_forms(query):
+    assert _rewrite_for_batches(query) is None
+    constraint = SPARQLConstraint('c', True, query)
+    assert constraint.get_batch_query() is None
+    assert constraint.batch_var is None
+
+
+@pytest.mark.parametrize('query', [
+    'SELECT ?o WHERE { $this <http://example.com/p> ?o . FILTER(?o != $this) }',
+    'SELECT ?o WHERE { $this ?p ?o . OPTIONAL { ?o ?q ?v FILTER(?v = $this) } FILTER(!BOUND(?v)) }',
+    'SELECT ?o WHERE { $this ?p ?o . FILTER EXISTS { ?o <http://example.com/q> $this } }',
+    'SELECT ?o WHERE { { ?o <http://example.com/p> ?x } UNION { ?o <http://example.com/r> ?x } FILTER(?x = $this) }',
+])
+def test_batch_query_is_equivalent(query):
+    graph = Graph().parse(data=DATA, format='turtle')
+    constraint = SPARQLConstraint('c', True, query)
+    batch_query = constraint.get_batch_query().replace(
+        '$instances_to_add$', ' '.join('<' + instance + '>' for instance in INSTANCES))
+    batch_answers = {str(row[constraint.batch_var]) for row in graph.query(batch_query)}
+    single_answers = {instance for instance in INSTANCES
+                      if len(graph.query(query.replace('$this', '<' + instance + '>'))) > 0}
+    assert batch_answers == single_answers
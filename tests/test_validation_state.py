@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from TravSHACL.rule_based_validation.TermDictionary import TermDictionary
+from TravSHACL.rule_based_validation.Validation import ValidationState
+
+
+def new_state():
+    return ValidationState({}, TermDictionary([]))
+
+
+def expected_heads(state):
+    """The heads of the rules each body atom occurs in, computed from the rule map."""
+    heads = {}
+    for head, bodies in state.rule_map.items():
+        for body in bodies:
+            for a in body:
+                heads.setdefault(a, set()).add(head)
+    return heads
+
+
+def check_index(state):
+    expected = expected_heads(state)
+    assert set(state.body_index) == set(expected)
+    for a, heads in expected.items():
+        assert set(state.heads_of(a)) == heads
+        assert type(state.body_index[a]) is (int if len(heads) == 1 else set)
+    assert set(state.rule_order) == set(state.rule_map)
+
+
+def test_body_index_same_head_in_several_bodies():
+    state = new_state()
+    assert state.add_rule(10, frozenset([1, 2]))
+    assert state.add_rule(10, frozenset([2, 3]))
+    assert not state.add_rule(10, frozenset([1, 2]))  # the rule is already known
+    assert state.body_index[2] == 10  # the atom refers to the same head twice, hence, no set is created
+    check_index(state)
+
+    assert state.add_rule(11, frozenset([2]))
+    assert state.body_index[2] == {10, 11}
+    check_index(state)
+
+    state.drop_rule(10)
+    assert state.body_index == {2: 11}  # a set with a single head is replaced by the head
+    assert tuple(state.heads_of(1)) == ()
+    check_index(state)
+
+    state.drop_rule(11)
+    assert state.body_index == {}
+    assert state.rule_map == {}
+    check_index(state)
+
+
+def test_body_index_head_in_own_body():
+    state = new_state()
+    state.add_rule(4, frozenset([4, 5]))
+    state.add_rule(6, frozenset([4]))
+    check_index(state)
+    state.drop_rule(4)
+    assert state.body_index == {4: 6}
+    check_index(state)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_body_index_random_sequences(seed):
+    rnd = random.Random(seed)
+    state = new_state()
+    for _ in range(300):
+        if state.rule_map and rnd.random() < 0.3:
+            state.drop_rule(rnd.choice(sorted(state.rule_map)))
+        else:
+            state.add_rule(rnd.randrange(8), frozenset(rnd.sample(range(12), rnd.randint(1, 3))))
+        check_index(state)